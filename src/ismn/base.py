@@ -22,6 +22,7 @@
 # SOFTWARE.
 
 import os
+import posixpath
 import numpy as np
 import zipfile
 from collections import OrderedDict
@@ -29,7 +30,7 @@ import glob
 import fnmatch
 import warnings
 from pathlib import Path, PurePosixPath
-from typing import Union, List
+from typing import Union, List, IO
 
 
 def zip(func):
@@ -81,6 +82,10 @@ class IsmnRoot:
         self.__cont = None
         self.__isopen = False
 
+        self.__members = None
+        self.__dir_index = None
+        self.__subdirs = None
+
         self.open()
 
     @property
@@ -110,7 +115,7 @@ class IsmnRoot:
         """Check if files exists in archive"""
         if self.zip:
             filepath = PurePosixPath(filepath)
-            return str(filepath) in self.zip.namelist()
+            return str(filepath) in self.__members
         else:
             path = self.path / filepath
             return path.exists()
@@ -138,6 +143,49 @@ class IsmnRoot:
             self.__cont = self.scan()
         return self.__cont
 
+    @zip
+    def __index_zip(self):
+        """
+        Build the member index of the zip archive, i.e. a set of all members
+        and a mapping of each folder to the members it contains directly.
+        This is done once when the archive is opened, so that file lookups
+        don't have to go through the full list of members again.
+        """
+        self.__members = set()
+        self.__dir_index = OrderedDict([("", [])])
+        self.__subdirs = {}
+
+        for name in self.zip.namelist():
+            self.__members.add(name)
+            if name.endswith("/"):  # folder entry, assigned to folder itself
+                d = name.rstrip("/")
+            else:
+                d = posixpath.dirname(name)
+            self.__register_dir(d)
+            self.__dir_index[d].append(name)
+
+    def __register_dir(self, d: str):
+        # add a folder (and its parents) to the member index
+        if d in self.__dir_index:
+            return
+        self.__dir_index[d] = []
+        parent = posixpath.dirname(d)
+        self.__register_dir(parent)
+        if parent not in self.__subdirs:
+            self.__subdirs[parent] = []
+        self.__subdirs[parent].append(d)
+
+    @zip
+    def __members_in_dir(self, subdir: str) -> list:
+        """
+        Get all members in a folder of the zip archive (incl. members in
+        subfolders) from the member index.
+        """
+        members = list(self.__dir_index.get(subdir, []))
+        for d in self.__subdirs.get(subdir, []):
+            members += self.__members_in_dir(d)
+        return members
+
     @zip
     def __scan_zip(self, station_subdirs: bool = True) -> OrderedDict:
         """
@@ -147,23 +195,20 @@ class IsmnRoot:
         """
         cont = {}
 
-        file_list = self.zip.namelist()
-
-        for f in file_list:
-            relpath = os.path.split(f)[0]
-            if relpath == "":
+        # folders in the index are unique, no need to check for duplicates
+        for relpath, members in self.__dir_index.items():
+            if (relpath == "") or (len(members) == 0):
                 continue
-            net, stat = os.path.split(relpath)
+            net, stat = posixpath.split(relpath)
             if net == "":
                 continue
             if station_subdirs:
                 stat = relpath
-            if net not in cont.keys():
-                cont[net] = np.array([])
-            if not np.isin([stat], cont[net])[0]:
-                cont[net] = np.append(cont[net], stat)
+            if net not in cont:
+                cont[net] = []
+            cont[net].append(stat)
 
-        self.__cont = OrderedDict(sorted(cont.items()))
+        self.__cont = self.__to_cont(cont)
 
         return self.cont
 
@@ -184,18 +229,31 @@ class IsmnRoot:
                     continue
                 for stat in os.scandir(f.path):
                     if stat.is_dir():
-                        if net not in cont.keys():
-                            cont[net] = np.array([])
+                        if net not in cont:
+                            cont[net] = []
                         if station_subdirs:
-                            cont[net] = np.append(cont[net],
-                                                  Path(net, stat.name))
+                            cont[net].append(Path(net, stat.name))
                         else:
-                            cont[net] = np.append(cont[net], stat.name)
+                            cont[net].append(stat.name)
 
-        self.__cont = OrderedDict(sorted(cont.items()))
+        self.__cont = self.__to_cont(cont)
 
         return self.cont
 
+    @staticmethod
+    def __to_cont(cont: dict) -> OrderedDict:
+        # sort networks and convert the collected station lists to arrays
+        arrays = []
+        for net, stats in sorted(cont.items()):
+            if isinstance(stats[0], Path):
+                arr = np.empty(len(stats), dtype=object)
+                arr[:] = stats
+            else:
+                arr = np.array(stats)
+            arrays.append((net, arr))
+
+        return OrderedDict(arrays)
+
     @dir
     def __find_files_dir(self,
                          subpath: str = None,
@@ -225,13 +283,16 @@ class IsmnRoot:
 
         subpath = self.clean_subpath(subpath)
 
-        all_files = np.array(self.zip.namelist())
+        if str(subpath) in self.__dir_index:
+            all_files = self.__members_in_dir(str(subpath))
+        else:  # a pattern, e.g. '**', check all members
+            all_files = self.zip.namelist()
 
         filterlist = list(
             filter(
                 lambda f: fnmatch.fnmatch(f, f"{subpath}/{fn_templ}"),
                 all_files,
-            )).copy()
+            ))
 
         return filterlist
 
@@ -280,6 +341,40 @@ class IsmnRoot:
         else:
             return self.__find_files_dir(subpath, fn_templ)
 
+    def file_fingerprints(self) -> dict:
+        """
+        Get a fingerprint for each file in the station folders of the
+        archive, that changes when the file is replaced or modified. For zip
+        archives this is the size and CRC of the member (stored in the zip
+        directory, no need to read the file), for extracted archives the size
+        and modification time of the file.
+
+        Returns
+        -------
+        fingerprints : dict
+            Relative paths (network/station/filename, with linux slashes) of
+            files and their fingerprint strings.
+        """
+        fingerprints = {}
+
+        if self.zip:
+            for info in self.zip.infolist():
+                if info.is_dir() or info.filename.count("/") < 2:
+                    continue
+                fingerprints[info.filename] = \
+                    f"{info.file_size}-{info.CRC:08x}"
+        else:
+            for stat_dirs in self.cont.values():
+                for stat_dir in stat_dirs:
+                    for f in os.scandir(self.path / stat_dir):
+                        if not f.is_file():
+                            continue
+                        st = f.stat()
+                        name = str(PurePosixPath(Path(stat_dir, f.name)))
+                        fingerprints[name] = f"{st.st_size}-{st.st_mtime_ns}"
+
+        return fingerprints
+
     @zip
     def extract_file(self, file_in_archive, out_path):
         """
@@ -303,14 +398,37 @@ class IsmnRoot:
 
         file_in_archive = self.clean_subpath(file_in_archive)
 
-        ls = np.array(self.zip.namelist())
-
         ext = None
-        if str(file_in_archive) in ls:  # single file was passed
+        if str(file_in_archive) in self.__members:  # single file was passed
             ext = self.zip.extract(member=str(file_in_archive), path=out_path)
 
         return Path(ext)
 
+    def open_member(self, file_in_archive) -> IO[bytes]:
+        """
+        Open a file in the archive for reading, without extracting it to
+        disk first. For zip archives the member is decompressed on the fly
+        while it is read.
+
+        Parameters
+        ----------
+        file_in_archive : Path or str
+            Relative path in the archive (network/station/filename).
+            Use linux slashes '/' (no leading '/') to define a subpath.
+
+        Returns
+        -------
+        stream : IO[bytes]
+            File object in binary mode, should be closed after reading
+            (e.g. by using it as a context manager).
+        """
+        file_in_archive = self.clean_subpath(file_in_archive)
+
+        if self.zip:
+            return self.zip.open(str(file_in_archive), mode="r")
+        else:
+            return open(self.path / file_in_archive, mode="rb")
+
     @zip
     def extract_dir(self, subdir_in_archive, out_path):
         """
@@ -333,10 +451,7 @@ class IsmnRoot:
         subdir_in_archive = PurePosixPath(subdir_in_archive)
         subdir_in_archive = self.clean_subpath(subdir_in_archive)
 
-        ls = np.array(self.zip.namelist())
-
-        filterlist = list(
-            filter(lambda x: x.startswith(str(subdir_in_archive)), ls)).copy()
+        filterlist = self.__members_in_dir(str(subdir_in_archive))
 
         self.zip.extractall(members=filterlist, path=out_path)
 
@@ -347,6 +462,7 @@ class IsmnRoot:
         if zipfile.is_zipfile(self.path):
             self.zip = zipfile.ZipFile(self.path, mode="r")
             self.name = self.path.with_suffix("").name
+            self.__index_zip()
         else:
             self.zip = None
             self.name = self.path.name
@@ -359,6 +475,9 @@ class IsmnRoot:
             self.zip.close()
             self.zip = None
             self.isopen = False
+            self.__members = None
+            self.__dir_index = None
+            self.__subdirs = None
 
     def __enter__(self):
         return self
@@ -14,7 +14,18 @@ from ismn.interface import ISMN_Interface
               help="Pass this flag to activate parallel metadata collection "
                    "(recommended for large archives). Deactivated by default."
               )
-def collect_metadata(data_path, meta_path, parallel):
+@click.option('--meta_format', type=click.Choice(['csv', 'parquet']),
+              default='csv', show_default=True,
+              help="Format of the metadata file that is created. 'parquet' "
+                   "requires the optional dependency pyarrow.")
+@click.option('--incremental', is_flag=True, show_default=True,
+              default=False,
+              help="Pass this flag to only read station folders with files "
+                   "that changed since the last metadata collection in "
+                   "META_PATH. Metadata of all other stations is taken from "
+                   "the existing metadata file.")
+def collect_metadata(data_path, meta_path, parallel, meta_format,
+                     incremental):
     """
     Command line program to initialise ISMN metadata collection.
     THIS WILL OVERWRITE ANY EXISTING METADATA!
@@ -33,7 +44,8 @@ def collect_metadata(data_path, meta_path, parallel):
     if meta_path is not None:
         os.makedirs(meta_path, exist_ok=True)
     _ = ISMN_Interface(data_path, force_metadata_collection=True,
-                       meta_path=meta_path, parallel=parallel)
+                       meta_path=meta_path, parallel=parallel,
+                       meta_format=meta_format, incremental=incremental)
 
 @click.command("export_geojson", short_help="Export ISMN sensors to geojson.")
 @click.argument('data_path', type=click.STRING)
@@ -96,9 +108,50 @@ def export_geojson(data_path, file_out, field, variable):
 
     ds.collection.export_geojson(file_out, **kwargs)
 
+@click.command("create_ts_store",
+               short_help="Convert ISMN time series to a binary store.")
+@click.argument('data_path', type=click.STRING)
+@click.argument('store_path', type=click.Path(writable=True))
+@click.option('--meta_path', type=click.Path(writable=True), default=None,
+              help="Directory where the metadata is stored (or created if "
+                   "it does not exist). If not specified, we use DATA_PATH.")
+@click.option('--network', '-n', multiple=True,
+              help="Only store the time series of this network. This option "
+                   "can be called multiple times with different networks. "
+                   "By default, all networks are stored.")
+@click.option('--n_workers', type=click.INT, default=1, show_default=True,
+              help="Number of processes that read data files at the same "
+                   "time.")
+def create_ts_store(data_path, store_path, meta_path, network, n_workers):
+    """
+    Command line program to convert the time series in an ISMN archive into
+    a binary, columnar store, that can be read much faster than the text
+    files, e.g. with `ISMN_Interface(DATA_PATH, ts_store=STORE_PATH)`.
+    AN EXISTING STORE IN STORE_PATH WILL BE REPLACED!
+
+    \b
+    DATA_PATH: string
+        Path where the downloaded ISMN archive is stored. This is either
+        - The downloaded ISMN ZIP archive or
+        - A directory with network folders extracted from the ZIP archive.
+        ISMN data can be downloaded from https://ismn.earth after registration.
+    STORE_PATH: string
+        Directory where the store is created.
+    """
+    # The docstring above is slightly different to the normal python one to
+    # display it properly on the command line.
+    if not os.path.exists(data_path):
+        raise ValueError("The passed DATA_PATH does not exist.")
+    ds = ISMN_Interface(data_path, meta_path=meta_path,
+                        network=list(network) if len(network) > 0 else None)
+    store = ds.create_ts_store(store_path, n_workers=n_workers,
+                               backend="multiprocessing")
+    print(f"Created {store}")
+
 @click.group(short_help="ISMN Command Line Programs.")
 def ismn():
     pass
 
 ismn.add_command(collect_metadata)
 ismn.add_command(export_geojson)
+ismn.add_command(create_ts_store)
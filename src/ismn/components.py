@@ -23,11 +23,13 @@
 import os.path
 import sys
 from pygeogrids import CellGrid
+from scipy.spatial import cKDTree
 from typing import Union
 
 import numpy as np
 import warnings
 from collections import OrderedDict
+from collections.abc import MutableMapping
 import pandas as pd
 from tqdm import tqdm
 
@@ -39,6 +41,8 @@ import json
 
 
 class IsmnComponent:
+    __slots__ = ()
+
     def _eval_xarray_installed(self):
         if not xarray_available:
             raise ImportError(
@@ -68,6 +72,9 @@ class Sensor(IsmnComponent):
         Container for data in memory (if it is being kept)
     """
 
+    __slots__ = ("instrument", "variable", "depth", "name", "filehandler",
+                 "keep_loaded_data", "_data")
+
     def __init__(
         self,
         instrument,
@@ -206,11 +213,17 @@ class Sensor(IsmnComponent):
 
         return cov
 
-    def read_data(self):
+    def read_data(self, start=None, end=None):
         """
         Load data from filehandler for this Sensor by calling
         :func:`ismn.filehandlers.DataFile.read_data`.
 
+        Parameters
+        ----------
+        start, end : str or datetime, optional (default: None)
+            Only read data between these (included) time stamps. By default,
+            all data is read.
+
         Returns
         -------
         data : pandas.DataFrame
@@ -221,14 +234,16 @@ class Sensor(IsmnComponent):
             ismnlog.warning(f"No filehandler found for sensor {self.name}")
         else:
             if self._data is None:
-                data = self.filehandler.read_data()
+                data = self.filehandler.read_data(start=start, end=end)
 
-                if self.keep_loaded_data:
+                if self.keep_loaded_data and (start is None) and (end is None):
                     self._data = data
 
                 return data
-            else:
+            elif (start is None) and (end is None):
                 return self._data
+            else:
+                return self._data.loc[start:end]
 
     def eval(
         self,
@@ -236,6 +251,8 @@ class Sensor(IsmnComponent):
         depth=None,
         filter_meta_dict=None,
         check_only_sensor_depth_from=False,
+        period=None,
+        cover_period=False,
     ):
         """
         Evaluate whether the sensor complies with the passed metadata
@@ -259,6 +276,14 @@ class Sensor(IsmnComponent):
         check_only_sensor_depth_from : bool, optional (default: False)
             Ignores the sensors depth_to value and only checks if depth_from of
             the sensor is in the passed depth (e.g. for cosmic ray probes).
+        period : tuple, optional (default: None)
+            (start, end) of a period, e.g. ('2015-01-01', '2020-12-31').
+            Check if the time range of the sensor (timerange_from,
+            timerange_to in the metadata) overlaps with the period. None
+            means that the period is open on this side.
+        cover_period : bool, optional (default: False)
+            Check if the time range of the sensor contains the whole period
+            instead (never the case for a period that is open on one side).
 
         Returns
         -------
@@ -290,7 +315,7 @@ class Sensor(IsmnComponent):
         if not depth.encloses(d):
             flag = False
 
-        if flag and filter_meta_dict:
+        if flag and (filter_meta_dict or (period is not None)):
             if self.filehandler is None:
                 warnings.warn("No filehandle found, can't filter by metadata.")
             else:
@@ -300,6 +325,8 @@ class Sensor(IsmnComponent):
                     allowed_depth=depth,
                     filter_meta_dict=filter_meta_dict,
                     check_only_sensor_depth_from=check_only_sensor_depth_from,
+                    period=period,
+                    cover_period=cover_period,
                 )
 
         return flag
@@ -829,6 +856,65 @@ class Network(IsmnComponent):
         return refs
 
 
+class LazyNetworks(MutableMapping):
+    """
+    Ordered mapping of network names and Networks, where each Network is
+    only created when it is accessed for the first time.
+
+    Attributes
+    ----------
+    names : list[str]
+        Names of all networks in the mapping (also of not created ones).
+    """
+
+    def __init__(self, names, load_network):
+        """
+        Parameters
+        ----------
+        names : list[str]
+            Names of the networks, in order.
+        load_network : Callable
+            Function that takes a network name and returns the Network.
+        """
+        self.names = list(names)
+        self._load_network = load_network
+        self._networks = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.names})"
+
+    def __getitem__(self, name) -> Network:
+        if name not in self._networks:
+            if name not in self.names:
+                raise KeyError(name)
+            self._networks[name] = self._load_network(name)
+        return self._networks[name]
+
+    def __setitem__(self, name, network: Network):
+        if name not in self.names:
+            self.names.append(name)
+        self._networks[name] = network
+
+    def __delitem__(self, name):
+        self.names.remove(name)
+        self._networks.pop(name, None)
+
+    def __contains__(self, name) -> bool:
+        return name in self.names
+
+    def __iter__(self):
+        return iter(list(self.names))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def is_loaded(self, name) -> bool:
+        """
+        Check if the Network of the passed name was already created.
+        """
+        return name in self._networks
+
+
 class NetworkCollection(IsmnComponent):
     """
     A NetworkCollection holds multiple networks and provides functionality
@@ -837,38 +923,82 @@ class NetworkCollection(IsmnComponent):
 
     Attributes
     ----------
-    networks : OrderedDict
+    networks : OrderedDict or LazyNetworks
         Collection of network names and Networks
     grid : CellGrid
         Grid that contains one point for each station in all networks.
+        Created when it is accessed for the first time.
     """
 
-    def __init__(self, networks):
+    def __init__(self, networks, coords=None, station_names=None):
         """
         Create network collection from previously created Networks.
 
         Parameters
         ----------
-        networks : list[Network]
-            List of Networks that build the collection.
+        networks : list[Network] or LazyNetworks
+            List of Networks that build the collection, or a mapping that
+            creates the Networks on demand.
+        coords : tuple[np.ndarray, np.ndarray], optional (default: None)
+            Longitudes and latitudes of all stations in the collection (in
+            order of the stations in the networks). If None is passed,
+            the coordinates are taken from the Networks (which requires
+            creating all of them) when the grid is used for the first time.
+        station_names : tuple[np.ndarray, np.ndarray], optional (default: None)
+            Network and station name of each point in coords. Must be passed
+            together with coords.
         """
         super().__init__()
 
-        self.networks = OrderedDict([])
+        if isinstance(networks, LazyNetworks):
+            self.networks = networks
+        else:
+            self.networks = OrderedDict([])
+            for net in networks:
+                self.networks[net.name] = net
 
-        lons = []
-        lats = []
-        for net in networks:
-            self.networks[net.name] = net
-            net_lons, net_lats = net.coords
-            lons += net_lons
-            lats += net_lats
+        if (coords is None) != (station_names is None):
+            raise ValueError("coords and station_names must be passed "
+                             "together")
 
-        if (len(lons) > 0) and (len(lats) > 0):
-            # Should be CellGrid
-            self.grid: CellGrid = CellGrid(lons, lats, cells=np.full(len(lons), 0))
-        else:
-            self.grid = None
+        self._coords = coords
+        self._station_names = station_names
+        self._stations = None
+        self._station_tree = None
+        self._grid = None
+        self._grid_loaded = False
+
+    @property
+    def grid(self) -> CellGrid:
+        """
+        Grid that contains one point for each station in all networks.
+        """
+        if not self._grid_loaded:
+            if self._coords is not None:
+                lons, lats = self._coords
+            else:
+                lons, lats = [], []
+                for net in self.networks.values():
+                    net_lons, net_lats = net.coords
+                    lons += net_lons
+                    lats += net_lats
+
+            if (len(lons) > 0) and (len(lats) > 0):
+                # Should be CellGrid
+                self._grid = CellGrid(lons, lats, cells=np.full(len(lons), 0))
+            else:
+                self._grid = None
+
+            self._grid_loaded = True
+
+        return self._grid
+
+    @grid.setter
+    def grid(self, grid: CellGrid):
+        # gpi i of the grid must be the i-th station in the networks
+        self._grid = grid
+        self._grid_loaded = True
+        self._station_tree = None
 
     def __repr__(self, indent: str = ""):
         return ",\n".join([
@@ -920,7 +1050,9 @@ class NetworkCollection(IsmnComponent):
 
     def station4gpi(self, gpi):
         """
-        Get the Station for the passed gpi in the grid.
+        Get the Station for the passed gpi in the grid. Stations are looked
+        up by their position in the grid, only the Networks of the passed
+        gpis are created (for lazy collections).
 
         Parameters
         ----------
@@ -939,17 +1071,33 @@ class NetworkCollection(IsmnComponent):
             raise ValueError(
                 f"Index not found in loaded grid: {idxs[~in_grid]}")
 
-        lon, lat = self.grid.gpi2lonlat(idxs)
-
-        stations = []
-        for net, stat in self.iter_stations():
-            if (stat.lon == lon) and (stat.lat == lat):
-                stations.append(stat)
-                if len(stations) == len(idxs):
-                    break  # stop when all indices are found
+        stations = list(self.__stations4gpis(idxs))
 
         return stations[0] if len(stations) == 1 else stations
 
+    def __station_names(self) -> tuple:
+        # network and station name of each grid point
+        if self._station_names is None:
+            nets, stats = [], []
+            for net in self.networks.values():
+                nets += [net.name] * net.n_stations
+                stats += list(net.stations.keys())
+            self._station_names = (np.array(nets, dtype=object),
+                                   np.array(stats, dtype=object))
+        return self._station_names
+
+    def __stations4gpis(self, gpis: np.ndarray) -> np.ndarray:
+        # Stations at (valid) gpis, taken from the gpi -> Station array
+        nets, stats = self.__station_names()
+        if self._stations is None:
+            self._stations = np.full(len(nets), None, dtype=object)
+
+        for i in np.unique(gpis):
+            if self._stations[i] is None:
+                self._stations[i] = self.networks[nets[i]].stations[stats[i]]
+
+        return self._stations[gpis]
+
     def get_nearest_station(self, lon, lat, max_dist=np.inf):
         """
         Get nearest station for given longitude/latitude coordinates.
@@ -976,6 +1124,143 @@ class NetworkCollection(IsmnComponent):
 
         return station, dist
 
+    def get_nearest_stations(self, lons, lats, k=1, max_dist=np.inf):
+        """
+        Get the k nearest stations for many coordinates at once. Points are
+        searched in the kd-tree (of 3D cartesian coordinates) of the grid.
+
+        Parameters
+        ----------
+        lons : np.ndarray
+            Longitude coordinates.
+        lats : np.ndarray
+            Latitude coordinates.
+        k : int, optional (default: 1)
+            Number of stations to find for each point.
+        max_dist : float, optional (default: np.inf)
+            Maximum search distance in meter.
+
+        Returns
+        -------
+        stations : np.ndarray
+            Nearest Stations for each point, of shape (n,) for k=1 or (n, k).
+            None where no station is within max_dist.
+        dist : np.ndarray
+            Distance in meter between the passed coordinates and the
+            stations (inf where no station was found), same shape as
+            stations.
+        """
+        lons, lats = np.atleast_1d(lons), np.atleast_1d(lats)
+        stations = np.full((len(lons), k), None, dtype=object)
+        dist = np.full((len(lons), k), np.inf)
+
+        if (self.grid is not None) and (len(lons) > 0):
+            k_grid = min(k, self.grid.n_gpi)
+            with warnings.catch_warnings():
+                # less than k points within max_dist is not an error here
+                warnings.simplefilter("ignore", UserWarning)
+                gpis, d = self.grid.find_k_nearest_gpi(
+                    lons, lats, max_dist=max_dist, k=k_grid)
+            gpis, d = gpis.reshape(len(lons), k_grid), d.reshape(
+                len(lons), k_grid)
+            found = np.isfinite(d)
+            stations[:, :k_grid][found] = self.__stations4gpis(gpis[found])
+            dist[:, :k_grid] = d
+
+        if k == 1:
+            return stations[:, 0], dist[:, 0]
+        else:
+            return stations, dist
+
+    def gpis4stations(self, networks, stations) -> np.ndarray:
+        """
+        Get the grid point index of stations by their network and name.
+
+        Parameters
+        ----------
+        networks : np.ndarray
+            Network name of each station.
+        stations : np.ndarray
+            Name of each station.
+
+        Returns
+        -------
+        gpis : np.ndarray
+            Grid point index of each station, -1 for unknown stations.
+        """
+        index = pd.MultiIndex.from_arrays(self.__station_names())
+        return index.get_indexer(
+            pd.MultiIndex.from_arrays([np.asarray(networks),
+                                       np.asarray(stations)]))
+
+    def stations_within(self, lons, lats, radius, **filter_kwargs):
+        """
+        Find all stations within a radius around many points at once. The
+        points and the stations are put into kd-trees (of 3D cartesian
+        coordinates) and all pairs within the radius are found in one query.
+        The result is returned in compressed sparse row format, i.e. the
+        stations around point i are gpis[offsets[i]:offsets[i+1]]
+        (sorted by distance).
+
+        Parameters
+        ----------
+        lons : np.ndarray
+            Longitude coordinates of the points.
+        lats : np.ndarray
+            Latitude coordinates of the points.
+        radius : float
+            Search radius in meter (straight line distance, close to the
+            great circle distance for radii of up to a few hundred km).
+
+        Other Parameters
+        ----------------
+        filter_kwargs :
+            Only stations that have at least one sensor that complies with
+            these conditions are returned,
+            see :func:`ismn.components.Sensor.eval`
+
+        Returns
+        -------
+        offsets : np.ndarray
+            Start of the stations of each point in gpis and dist, and the
+            end of the last one (length: number of points + 1).
+        gpis : np.ndarray
+            Grid point index of the stations around all points.
+        dist : np.ndarray
+            Distance in meter between each point and station.
+        """
+        lons = np.atleast_1d(lons).astype(np.float64)
+        lats = np.atleast_1d(lats).astype(np.float64)
+
+        if (self.grid is None) or (len(lons) == 0):
+            return (np.zeros(len(lons) + 1, dtype=np.int64),
+                    np.array([], dtype=np.int64), np.array([]))
+
+        if self._station_tree is None:
+            self._station_tree = cKDTree(np.column_stack(
+                self.grid.geodatum.toECEF(self.grid.activearrlon,
+                                          self.grid.activearrlat)))
+        points = cKDTree(np.column_stack(
+            self.grid.geodatum.toECEF(lons, lats)))
+        pairs = points.sparse_distance_matrix(self._station_tree, radius,
+                                              output_type="ndarray")
+        point, pos, dist = pairs["i"], pairs["j"], pairs["v"]
+
+        if filter_kwargs:
+            stations = self.__stations4gpis(np.arange(self.grid.n_gpi))
+            valid = np.array(
+                [any(True for _ in stat.iter_sensors(**filter_kwargs))
+                 for stat in stations], dtype=bool)
+            keep = valid[pos]
+            point, pos, dist = point[keep], pos[keep], dist[keep]
+
+        order = np.lexsort((dist, point))
+        point, pos, dist = point[order], pos[order], dist[order]
+        offsets = np.searchsorted(point, np.arange(len(lons) + 1))
+
+        return (offsets.astype(np.int64),
+                self.grid.activegpis[pos].astype(np.int64), dist)
+
     def export_citations(self, out_file=None):
         """
         Returns the references for all networks in the collection.
@@ -38,6 +38,13 @@ except ImportError:
     dask = None
     xarray_available = False
 
+try:
+    import pyarrow
+    pyarrow_available = True
+except ImportError:
+    pyarrow = None
+    pyarrow_available = False
+
 ismnlog = logging.getLogger('ismn')
 ch = logging.StreamHandler()
 ch.setLevel(logging.INFO)
@@ -23,6 +23,7 @@
 import logging
 
 import os
+import posixpath
 from tempfile import gettempdir
 from pathlib import Path, PurePosixPath
 import numpy as np
@@ -31,15 +32,44 @@ from operator import itemgetter
 import time
 from typing import List, Tuple
 import pandas as pd
+import ast
 from collections import OrderedDict
+from types import MappingProxyType
 from repurpose.process import parallel_process
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import traceback
 
 from ismn.base import IsmnRoot
 import ismn.const as const
-from ismn.const import ismnlog
+from ismn.const import ismnlog, pyarrow_available
 from ismn.filehandlers import DataFile, StaticMetaFile
-from ismn.meta import MetaData, MetaVar, Depth
+from ismn.meta import (MetaData, MetaVar, Depth, TimeRangeIndex, in_bbox,
+                       in_polygon, in_period)
+
+
+# Archives opened in a worker process, reused for all stations / files
+# processed there
+_worker_roots = {}
+
+
+def _get_worker_root(path: Union[Path, str]) -> IsmnRoot:
+    """
+    Open the archive in a worker process only once. Workers can be reused,
+    so the archive is opened again if it changed. Only the last opened
+    archive is kept open.
+    """
+    key = (str(path), os.path.getmtime(path))
+    if key not in _worker_roots:
+        _close_worker_roots()
+        _worker_roots[key] = IsmnRoot(path)
+    return _worker_roots[key]
+
+
+def _close_worker_roots():
+    # close all archives that were opened by _get_worker_root
+    for root in _worker_roots.values():
+        root.close()
+    _worker_roots.clear()
 
 
 def _read_station_dir(
@@ -47,15 +77,27 @@ def _read_station_dir(
     stat_dir: Union[Path, str],
     temp_root: Path,
     custom_meta_reader: list,
+    keep_root_open: bool = False,
 ) -> Tuple[List, List]:
     """
-    Parallelizable function to read metadata for files in station dir
+    Parallelizable function to read metadata for files in station dir.
+    Returns only picklable objects, i.e. for each file a tuple of network
+    name, station name, file path, file type and the metadata as a list of
+    tuples (see :func:`ismn.meta.MetaVar.from_tuple`), so that it can also
+    be used with a process pool. Use :func:`_datafile_from_result` to
+    create the filehandler.
+    If keep_root_open is True and a path is passed as root, the archive is
+    opened once per process and kept open for the next call.
     """
     logger = logging.getLogger('ismn_meta_collector')
 
     if not isinstance(root, IsmnRoot):
-        proc_root = True
-        root = IsmnRoot(root)
+        if keep_root_open:
+            proc_root = False
+            root = _get_worker_root(root)
+        else:
+            proc_root = True
+            root = IsmnRoot(root)
     else:
         proc_root = False
 
@@ -122,7 +164,8 @@ def _read_station_dir(
         network = f.metadata["network"].val
         station = f.metadata["station"].val
 
-        filelist.append((network, station, f))
+        filelist.append((network, station, str(PurePosixPath(f.file_path)),
+                         f.file_type, [tuple(v) for v in f.metadata]))
 
         logger.info(f"Processed file {file_path}")
 
@@ -132,6 +175,74 @@ def _read_station_dir(
     return filelist, erroneous_files
 
 
+def _datafile_from_result(
+    root: IsmnRoot,
+    file_path: str,
+    file_type: str,
+    metadata: list,
+    temp_root=gettempdir(),
+) -> DataFile:
+    """
+    Create a filehandler from the results of :func:`_read_station_dir`
+    """
+    f = DataFile(
+        root=root,
+        file_path=Path(file_path),
+        load_metadata=False,
+        temp_root=temp_root,
+        verify_filepath=False,
+        verify_temp_root=False,
+    )
+    f.metadata = MetaData([MetaVar.from_tuple(m) for m in metadata])
+    f.file_type = file_type
+
+    return f
+
+
+def _station_fingerprints(fingerprints: dict) -> dict:
+    """
+    Group file fingerprints (see :func:`ismn.base.IsmnRoot.file_fingerprints`)
+    by station dir. Returns the sorted (file, fingerprint) pairs for each dir.
+    """
+    stations = {}
+    for file_path, fingerprint in fingerprints.items():
+        stat_dir = posixpath.dirname(file_path)
+        if stat_dir not in stations:
+            stations[stat_dir] = []
+        stations[stat_dir].append((file_path, fingerprint))
+
+    return {d: sorted(files) for d, files in stations.items()}
+
+
+def _read_data_file(
+    root: Union[Path, str],
+    file_path: str,
+    file_type: str,
+    variable: str,
+    compact_dtypes: bool = False,
+    start: pd.Timestamp = None,
+    end: pd.Timestamp = None,
+) -> pd.DataFrame:
+    """
+    Read the data of a single file (in a time window) in a worker process.
+    Only picklable arguments are passed, i.e. the path to the archive (which
+    is opened once per process) and the file type and variable name from the
+    metadata that are needed to parse the file.
+    """
+    f = DataFile(
+        root=_get_worker_root(root),
+        file_path=Path(file_path),
+        load_metadata=False,
+        verify_filepath=False,
+        verify_temp_root=False,
+        compact_dtypes=compact_dtypes,
+    )
+    f.file_type = file_type
+    f.metadata = MetaData([MetaVar("variable", variable)])
+
+    return f.read_data(start=start, end=end)
+
+
 def _load_metadata_df(meta_csv_file: Union[str, Path]) -> pd.DataFrame:
     """
     Load metadata data frame from csv file
@@ -164,6 +275,207 @@ def _load_metadata_df(meta_csv_file: Union[str, Path]) -> pd.DataFrame:
     return metadata_df
 
 
+def _eval_pyarrow_installed():
+    if not pyarrow_available:
+        raise ImportError(
+            "Optional dependency missing: `pyarrow`. "
+            "Please run `conda install -c conda-forge pyarrow` to use the "
+            "parquet metadata format.")
+
+
+def _write_metadata_parquet(
+        metadata_df: pd.DataFrame,
+        meta_parquet_file: Union[str, Path],
+):
+    """
+    Write a metadata data frame to a parquet file, so that it can be read
+    with :func:`_load_metadata_parquet`.
+    """
+    dfs = metadata_df.copy()
+
+    # parquet columns need a single type, store mixed values (e.g. from
+    # custom metadata) as strings, as they would be read from csv.
+    for c in dfs.columns:
+        if dfs[c].dtype == object:
+            inferred = pd.api.types.infer_dtype(dfs[c], skipna=True)
+            if inferred.startswith("mixed"):
+                dfs[c] = dfs[c].where(dfs[c].isna(), dfs[c].astype(str))
+
+    dfs.index = range(len(dfs.index))
+    # multiindex columns are stored as str(tuple), labels must be plain
+    # str (not np.str_) to find the columns again when reading
+    dfs.columns = pd.MultiIndex.from_tuples(
+        [(str(c[0]), str(c[1])) for c in dfs.columns],
+        names=dfs.columns.names)
+
+    os.makedirs(Path(os.path.dirname(meta_parquet_file)), exist_ok=True)
+    dfs.to_parquet(meta_parquet_file)
+
+
+def _load_metadata_parquet(
+        meta_parquet_file: Union[str, Path],
+        network=None,
+        variables=None,
+) -> pd.DataFrame:
+    """
+    Load metadata data frame from parquet file. Data types are stored in
+    the file, so no parsing is necessary. Only rows for the passed networks
+    and columns for the passed variables are read from disk.
+    """
+    _eval_pyarrow_installed()
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    columns, filters = None, None
+
+    if variables is not None:
+        variables = list(np.atleast_1d(variables)) + ["file_path", "file_type"]
+        # multiindex columns are stored as str(tuple) in parquet files
+        columns = [
+            c for c in pq.read_schema(meta_parquet_file).names
+            if c.startswith("(") and ast.literal_eval(c)[0] in variables
+        ]
+
+    if network is not None:
+        network = pa.array(np.atleast_1d(network).astype(str), pa.string())
+        filters = pc.field(str(("network", "val"))).isin(network)
+
+    metadata_df = pd.read_parquet(
+        meta_parquet_file, columns=columns, filters=filters)
+
+    metadata_df.index.name = "idx"
+
+    return metadata_df
+
+
+def _metadata_df_layout(metadata_df: pd.DataFrame) -> tuple:
+    """
+    Find the variables in the metadata frame and the (positional) column
+    indices of their values and depths. -1 is used for missing columns.
+    Python lists are returned, so that all MetaVars share the same name
+    objects.
+    """
+    columns = list(metadata_df.columns)
+    pos = {c: i for i, c in enumerate(columns)}
+
+    vars = sorted(set(str(c[0]) for c in columns
+                      if c[0] not in ["file_path", "file_type"]))
+
+    val_idx = [pos.get((v, "val"), -1) for v in vars]
+    from_idx = [pos.get((v, "depth_from"), -1) for v in vars]
+    to_idx = [pos.get((v, "depth_to"), -1) for v in vars]
+
+    return vars, val_idx, from_idx, to_idx
+
+
+def _metadata_df_mask(
+    metadata_df: pd.DataFrame,
+    variable=None,
+    allowed_depth: Depth = None,
+    filter_meta_dict: dict = None,
+    check_only_sensor_depth_from=False,
+    bbox: tuple = None,
+    polygon: list = None,
+    period: tuple = None,
+    cover_period=False,
+    timerange_index: TimeRangeIndex = None,
+) -> np.ndarray:
+    """
+    Vectorized version of :func:`ismn.filehandlers.IsmnFile.check_metadata`
+    that evaluates the conditions for all rows in the metadata frame.
+    Returns a boolean mask (one value per row). Keys in filter_meta_dict that
+    are not in the metadata frame don't match any row. If a timerange_index
+    of the frame is passed, it is used to find the rows in the period.
+    """
+    mask = np.full(len(metadata_df.index), True)
+
+    if variable is not None:
+        variable = np.atleast_1d(variable)
+        mask &= np.isin(metadata_df["variable"]["val"].values, variable)
+
+    if allowed_depth is not None:
+        # sensor depth is the instrument depth, or the variable depth
+        depth_from = metadata_df["instrument"]["depth_from"].values
+        depth_to = metadata_df["instrument"]["depth_to"].values
+        missing = pd.isnull(depth_from) | pd.isnull(depth_to)
+        if np.any(missing):
+            depth_from = np.where(
+                missing, metadata_df["variable"]["depth_from"].values,
+                depth_from)
+            depth_to = np.where(
+                missing, metadata_df["variable"]["depth_to"].values, depth_to)
+
+        if check_only_sensor_depth_from:
+            depth_to = depth_from
+
+        mask &= allowed_depth.encloses_arrays(depth_from, depth_to)
+
+    if filter_meta_dict:
+        for k in filter_meta_dict.keys():
+            if (k, "val") not in metadata_df.columns:
+                mask &= False
+                continue
+            ref_list = np.atleast_1d(filter_meta_dict[k]).tolist()
+            mask &= metadata_df[k]["val"].isin(ref_list).values
+
+    if period is not None:
+        if timerange_index is None:
+            mask &= in_period(metadata_df["timerange_from"]["val"].values,
+                              metadata_df["timerange_to"]["val"].values,
+                              period, cover_period)
+        else:
+            if cover_period:
+                rows = timerange_index.covering(*period)
+            else:
+                rows = timerange_index.overlapping(*period)
+            in_window = np.full(len(mask), False)
+            in_window[rows] = True
+            mask &= in_window
+
+    if (bbox is not None) or (polygon is not None):
+        # only the coordinates of rows that passed so far are tested
+        rows = np.flatnonzero(mask)
+        lons = metadata_df["longitude"]["val"].values[rows]
+        lats = metadata_df["latitude"]["val"].values[rows]
+        inside = np.full(len(rows), True)
+        if bbox is not None:
+            inside &= in_bbox(lons, lats, bbox)
+        if polygon is not None:
+            inside[inside] = in_polygon(lons[inside], lats[inside], polygon)
+        mask[rows] = inside
+
+    return mask
+
+
+class _MetaRowLoader:
+    """
+    Create the MetaData for a single row of the metadata frame on demand,
+    see :func:`ismn.filehandlers.DataFile.set_metadata_loader`
+    """
+
+    def __init__(self, vars, val_idx, from_idx, to_idx, row):
+        self.vars = vars
+        self.val_idx = val_idx
+        self.from_idx = from_idx
+        self.to_idx = to_idx
+        self.row = row
+
+    def __call__(self) -> MetaData:
+        row = self.row
+        metavars = []
+        for var, iv, ifr, ito in zip(self.vars, self.val_idx,
+                                     self.from_idx, self.to_idx):
+            val = row[iv] if iv >= 0 else np.nan
+            if (ifr >= 0) and (ito >= 0):
+                metavars.append(
+                    MetaVar.from_tuple((var, val, row[ifr], row[ito])))
+            else:
+                metavars.append(MetaVar.from_tuple((var, val)))
+
+        return MetaData(metavars)
+
+
 class IsmnFileCollection(object):
     """
     The IsmnFileCollection class contains a list of file handlers to access data
@@ -176,10 +488,22 @@ class IsmnFileCollection(object):
     ----------
     root : IsmnRoot
         Root object where data is stored.
-    filelist : collections.OrderedDict
-        A collection of filehandlers and network names
+    filelist : MappingProxyType
+        Read-only view of the filehandlers (tuples) with network name as key.
+        To change it, a new filelist must be assigned, then the flat index
+        of filehandlers is built again.
     temp_root : Path
         Temporary root dir.
+    metadata_df : pd.DataFrame or None
+        Metadata frame that the collection was loaded from, None if the
+        collection was not created from a metadata frame.
+    timerange_index : TimeRangeIndex or None
+        Index of the time ranges of the sensors in the metadata frame,
+        built on first use.
+    fingerprints : dict or None
+        Fingerprints of the files in the archive at the time when the
+        metadata was collected, see
+        :func:`ismn.base.IsmnRoot.file_fingerprints`.
     """
 
     def __init__(self, root, filelist, temp_root=gettempdir()):
@@ -195,14 +519,84 @@ class IsmnFileCollection(object):
             will be created (and deleted).
         """
         self.root = root
-        self.filelist = filelist
+        self.filelist = filelist  # also builds the flat index
         self.temp_root = Path(temp_root)
+        self.metadata_df = None
+        self.fingerprints = None
 
         os.makedirs(self.temp_root, exist_ok=True)
 
     def __repr__(self):
         return f"{self.__class__.__name__} for {len(self.filelist.keys())} Networks"
 
+    @property
+    def metadata_df(self) -> Union[pd.DataFrame, None]:
+        return self.__metadata_df
+
+    @metadata_df.setter
+    def metadata_df(self, metadata_df: Union[pd.DataFrame, None]):
+        # the time range index is built again for the new frame
+        self.__metadata_df = metadata_df
+        self.__timerange_index = None
+
+    @property
+    def timerange_index(self) -> Union[TimeRangeIndex, None]:
+        # rows of the metadata frame by timerange_from and timerange_to
+        if (self.__timerange_index is None) and \
+                (self.metadata_df is not None):
+            self.__timerange_index = TimeRangeIndex(
+                self.metadata_df["timerange_from"]["val"].values,
+                self.metadata_df["timerange_to"]["val"].values)
+        return self.__timerange_index
+
+    @property
+    def filelist(self) -> MappingProxyType:
+        # filehandlers in tuples with network name as key, read-only so that
+        # the flat index can't get out of sync
+        return self.__filelist
+
+    @filelist.setter
+    def filelist(self, filelist: OrderedDict):
+        """
+        Store all filehandlers in a flat array (in order of the networks in
+        the filelist) and the range of positions for each network, so that
+        filehandlers are found by their id without going through networks.
+        """
+        n = sum(len(files) for files in filelist.values())
+        filehandlers = np.empty(n, dtype=object)
+        net_slices = OrderedDict()
+        start = 0
+        for net, files in filelist.items():
+            filehandlers[start:start + len(files)] = files
+            net_slices[net] = slice(start, start + len(files))
+            start += len(files)
+
+        self.__filelist = MappingProxyType(OrderedDict(
+            (net, tuple(files)) for net, files in filelist.items()))
+        self.__filehandlers = filehandlers
+        self.__net_slices = net_slices
+
+    def network_ids(self, network) -> range:
+        """
+        Ids of all filehandlers of a network. Filehandlers of a network
+        always have consecutive ids.
+
+        Parameters
+        ----------
+        network: str
+            Name of the network
+
+        Returns
+        -------
+        ids : range
+            Ids of filehandlers of the network, empty if the network is not
+            in the collection.
+        """
+        if network not in self.__net_slices:
+            return range(0)
+        s = self.__net_slices[network]
+        return range(s.start, s.stop)
+
     @classmethod
     def build_from_scratch(
             cls,
@@ -211,6 +605,9 @@ class IsmnFileCollection(object):
             log_path=None,
             temp_root=gettempdir(),
             custom_meta_readers=None,
+            backend="threading",
+            n_proc=None,
+            previous=None,
     ):
         """
         Parameters
@@ -220,7 +617,7 @@ class IsmnFileCollection(object):
             i.e. path to the downloaded zip file or the extracted zip directory (faster)
             or a file list that contains these infos already.
         parallel : bool, optional (default: True)
-            Speed up metadata collecting with multiple processes.
+            Speed up metadata collecting with multiple threads / processes.
         log_path : str or Path, optional (default: None)
             Path where the log file is created. If None is set, no log file
             will be written.
@@ -228,7 +625,23 @@ class IsmnFileCollection(object):
             Temporary folder where extracted data is copied during reading from
             zip archive.
         custom_meta_readers: tuple, optional (default: None)
-            Custom metadata readers
+            Custom metadata readers. Must be picklable when a process based
+            backend is used.
+        backend: str, optional (default: 'threading')
+            Backend for parallel metadata collection, one of 'threading',
+            'multiprocessing' or 'loky' (process pools, each process opens
+            the archive once and custom metadata readers must be picklable).
+            Only used if parallel is True.
+        n_proc: int, optional (default: None)
+            Number of parallel processes to use (if parallel is True).
+            By default, all available CPUs are used.
+        previous: IsmnFileCollection, optional (default: None)
+            Collection from an earlier metadata collection for the same
+            archive, with file fingerprints (see
+            :func:`IsmnFileCollection.load_fingerprints_csv`). Only station
+            dirs with added, removed or changed files are read again, the
+            metadata of all other files is taken from this collection.
+            This assumes that the same custom metadata readers are used.
         """
         t0 = time.time()
         if isinstance(data_root, IsmnRoot):
@@ -240,7 +653,10 @@ class IsmnFileCollection(object):
 
         log_filename = f"{root.name}.log"
 
-        n_proc = 1 if not parallel else os.cpu_count()
+        if not parallel:
+            n_proc = 1
+        elif n_proc is None:
+            n_proc = os.cpu_count()
 
         ismnlog.info(f"Collecting metadata with {n_proc} processes.")
 
@@ -256,31 +672,73 @@ class IsmnFileCollection(object):
             f"This may take a few minutes, but is only done once...\n{hint}"
         )
 
+        fingerprints = root.file_fingerprints()
+
+        if (previous is not None) and (previous.fingerprints is not None):
+            unchanged = _station_fingerprints(fingerprints)
+            prev_fingerprints = _station_fingerprints(previous.fingerprints)
+            for d in list(unchanged.keys()):
+                if prev_fingerprints.get(d, None) != unchanged[d]:
+                    unchanged.pop(d)
+        else:
+            unchanged = {}
+
+        elements = []
+        if len(unchanged) > 0:
+            for f in previous.iter_filehandlers():
+                file_path = str(PurePosixPath(f.file_path))
+                if posixpath.dirname(file_path) in unchanged:
+                    elements.append(
+                        (str(f.metadata["network"].val),
+                         str(f.metadata["station"].val), file_path,
+                         f.file_type, [tuple(v) for v in f.metadata]))
+
         process_stat_dirs = []
         for net_dir, stat_dirs in root.cont.items():
-            process_stat_dirs += list(stat_dirs)
+            for stat_dir in stat_dirs:
+                if str(PurePosixPath(stat_dir)) not in unchanged:
+                    process_stat_dirs.append(stat_dir)
+
+        if len(unchanged) > 0:
+            ismnlog.info(f"Metadata for {len(unchanged)} unchanged station "
+                         f"dirs is taken from the previous collection, "
+                         f"{len(process_stat_dirs)} dirs are read.")
+
+        if n_proc == 1:
+            proc_root, keep_root_open = root, False
+        elif backend == 'threading':
+            # each thread opens its own zip handle
+            proc_root, keep_root_open = (root.path if root.zip else root), False
+        else:
+            # each process opens the archive once
+            proc_root, keep_root_open = str(root.path), True
 
         STATIC_KWARGS = {
-            'root': root.path if root.zip else root,
+            'root': proc_root,
             'temp_root': temp_root,
             'custom_meta_reader': custom_meta_readers,
+            'keep_root_open': keep_root_open,
         }
 
         ITER_KWARGS = {
             'stat_dir': process_stat_dirs
         }
 
-        res = parallel_process(
-            _read_station_dir, ITER_KWARGS=ITER_KWARGS,
-            STATIC_KWARGS=STATIC_KWARGS,
-            n_proc=n_proc, show_progress_bars=True,
-            ignore_errors=True, log_path=log_path,
-            log_filename=log_filename, logger_name='ismn_meta_collector',
-            loglevel='INFO', progress_bar_label="Stations Processed",
-            backend='threading', verbose=False,
-        )
+        if len(process_stat_dirs) > 0:
+            res = parallel_process(
+                _read_station_dir, ITER_KWARGS=ITER_KWARGS,
+                STATIC_KWARGS=STATIC_KWARGS,
+                n_proc=n_proc, show_progress_bars=True,
+                ignore_errors=True, log_path=log_path,
+                log_filename=log_filename, logger_name='ismn_meta_collector',
+                loglevel='INFO', progress_bar_label="Stations Processed",
+                backend=backend, verbose=False,
+            )
+            # in case stations were processed in this process
+            _close_worker_roots()
+        else:
+            res = []
 
-        elements = []
         errors = []
         for r in res:
             elements += r[0]
@@ -290,10 +748,11 @@ class IsmnFileCollection(object):
         elements.sort(key=itemgetter(0, 1))  # sort by net name, stat name
 
         filelist = OrderedDict([])
-        for net, stat, fh in elements:
+        for net, stat, file_path, file_type, metadata in elements:
             if net not in filelist.keys():
                 filelist[net] = []
-            filelist[net].append(fh)
+            filelist[net].append(_datafile_from_result(
+                root, file_path, file_type, metadata, temp_root))
 
         t1 = time.time()
         info = f"Metadata collection finished after {int(t1-t0)} Seconds."
@@ -317,13 +776,20 @@ class IsmnFileCollection(object):
         ismnlog.info(info)
         print(info)
 
-        return cls(root, filelist=filelist)
+        coll = cls(root, filelist=filelist)
+        coll.fingerprints = fingerprints
+
+        return coll
 
     @classmethod
-    def from_metadata_df(cls, data_root, metadata_df, temp_root=gettempdir()):
+    def from_metadata_df(cls, data_root, metadata_df, temp_root=gettempdir(),
+                         data_cache=None, compact_dtypes=False):
         """
         Load a previously created and stored filelist from
         :func:`ismn.filecollection.IsmnFileCollection.to_metadata_csv`
+        The MetaData of each filehandler is only created from the
+        according row in the metadata frame when it is first accessed.
+
         Parameters
         ----------
         data_root : IsmnRoot or str or Path
@@ -333,6 +799,12 @@ class IsmnFileCollection(object):
         temp_root : str or Path, optional (default: gettempdir())
             Temporary folder where extracted data is copied during reading from
             zip archive.
+        data_cache : DataCache, optional (default: None)
+            Cache that is shared by all filehandlers to keep data after
+            reading, see :class:`ismn.filehandlers.DataCache`.
+        compact_dtypes : bool, optional (default: False)
+            Filehandlers return values as float32 and flags as categoricals,
+            see :class:`ismn.filehandlers.DataFile`.
         """
         if isinstance(data_root, IsmnRoot):
             root = data_root
@@ -341,48 +813,50 @@ class IsmnFileCollection(object):
 
         filelist = OrderedDict([])
 
-        columns = np.array(list(metadata_df.columns))
-
-        for i, row in enumerate(metadata_df.values):
-            # this_nw = row.loc['network', 'val']
-            vars = np.unique(columns[:-2][:, 0])
-            vals = row[:-2].reshape(-1, 3)
-
-            metadata = MetaData([
-                MetaVar.from_tuple(
-                    (vars[i], vals[i][2], vals[i][0], vals[i][1]))
-                for i in range(len(vars))
-            ])
+        # the column layout is the same for all rows, find the position of
+        # the value and depths of each variable only once.
+        vars, val_idx, from_idx, to_idx = _metadata_df_layout(metadata_df)
+        values = metadata_df.values
+        file_paths = metadata_df[("file_path", "val")].values
+        file_types = metadata_df[("file_type", "val")].values
+        networks = metadata_df[("network", "val")].values
 
+        for i in range(len(values)):
             f = DataFile(
                 root=root,
-                file_path=Path(str(PurePosixPath(row[-2]))),
+                file_path=Path(file_paths[i]),
                 load_metadata=False,
                 temp_root=temp_root,
                 verify_filepath=False,
                 verify_temp_root=False,
+                data_cache=data_cache,
+                compact_dtypes=compact_dtypes,
             )
+            # MetaData is only created when the file's metadata is accessed
+            f.set_metadata_loader(
+                _MetaRowLoader(vars, val_idx, from_idx, to_idx, values[i]))
+            f.file_type = file_types[i]
 
-            f.metadata = metadata
-            f.file_type = row[-1]
-
-            this_nw = f.metadata["network"].val
+            this_nw = networks[i]
 
             if this_nw not in filelist.keys():
                 filelist[this_nw] = []
 
             filelist[this_nw].append(f)
 
-        cls.metadata_df = metadata_df
+        coll = cls(root, filelist=filelist, temp_root=temp_root)
+        coll.metadata_df = metadata_df
 
-        return cls(root, filelist=filelist)
+        return coll
 
     @classmethod
     def from_metadata_csv(cls,
                           data_root,
                           meta_csv_file,
                           network=None,
-                          temp_root=gettempdir()):
+                          temp_root=gettempdir(),
+                          data_cache=None,
+                          compact_dtypes=False):
         """
         Load a previously created and stored filelist from
         :func:`ismn.filecollection.IsmnFileCollection.to_metadata_csv`
@@ -398,6 +872,12 @@ class IsmnFileCollection(object):
         temp_root : str or Path, optional (default: gettempdir())
             Temporary folder where extracted data is copied during reading from
             zip archive.
+        data_cache : DataCache, optional (default: None)
+            Cache that is shared by all filehandlers to keep data after
+            reading, see :class:`ismn.filehandlers.DataCache`.
+        compact_dtypes : bool, optional (default: False)
+            Filehandlers return values as float32 and flags as categoricals,
+            see :class:`ismn.filehandlers.DataFile`.
         """
         if network is not None:
             network = np.atleast_1d(network)
@@ -416,21 +896,66 @@ class IsmnFileCollection(object):
         metadata_df.index = range(len(metadata_df.index))
 
         return cls.from_metadata_df(
-            data_root, metadata_df, temp_root=temp_root)
+            data_root, metadata_df, temp_root=temp_root,
+            data_cache=data_cache, compact_dtypes=compact_dtypes)
 
-    def to_metadata_csv(self, meta_csv_file):
+    @classmethod
+    def from_metadata_parquet(cls,
+                              data_root,
+                              meta_parquet_file,
+                              network=None,
+                              temp_root=gettempdir(),
+                              data_cache=None,
+                              compact_dtypes=False):
         """
-        Write filehandle metadata from filelist to metdata csv that contains
-        ALL metadata / variables of the filehander.
-        Can be read back in as filelist with filehandlers using
-        :func:`ismn.filecollection.IsmnFileCollection.from_metadata_csv`.
+        Load a previously created and stored filelist from
+        :func:`ismn.filecollection.IsmnFileCollection.to_metadata_parquet`.
+        Requires the optional dependency `pyarrow`.
 
         Parameters
         ----------
-        meta_csv_file : Path or str, optional (default: None)
-            Directory where the csv file with the correct name is crated
+        data_root : IsmnRoot or str or Path
+            Path where the ismn data is stored, can also be a zip file
+        meta_parquet_file : str or Path
+            Parquet file where the metadata is stored.
+        network : list, optional (default: None)
+            List of networks that are considered.
+            Filehandlers for other networks are set to None.
+        temp_root : str or Path, optional (default: gettempdir())
+            Temporary folder where extracted data is copied during reading from
+            zip archive.
+        data_cache : DataCache, optional (default: None)
+            Cache that is shared by all filehandlers to keep data after
+            reading, see :class:`ismn.filehandlers.DataCache`.
+        compact_dtypes : bool, optional (default: False)
+            Filehandlers return values as float32 and flags as categoricals,
+            see :class:`ismn.filehandlers.DataFile`.
+        """
+        print(f"Using the existing ismn metadata in {meta_parquet_file} to "
+              f"set up ISMN_Interface. \n"
+              "If there are issues with the data reader, you can remove "
+              "the metadata parquet file to repeat metadata collection.")
+
+        metadata_df = _load_metadata_parquet(meta_parquet_file, network)
+
+        metadata_df.index = range(len(metadata_df.index))
+
+        return cls.from_metadata_df(
+            data_root, metadata_df, temp_root=temp_root,
+            data_cache=data_cache, compact_dtypes=compact_dtypes)
+
+    def to_metadata_df(self) -> pd.DataFrame:
         """
+        Collect the metadata of all filehandlers in the filelist in a
+        data frame that contains ALL metadata / variables of the filehandlers
+        (one row per filehandler).
 
+        Returns
+        -------
+        metadata_df : pd.DataFrame
+            Metadata of all filehandlers, with the file path and type in the
+            last columns.
+        """
         dfs = []
 
         for i, filehandler in enumerate(self.iter_filehandlers()):
@@ -450,9 +975,275 @@ class IsmnFileCollection(object):
                   [c for c in dfs.columns if c[0] in cols_end]]
         dfs = dfs.infer_objects().fillna(np.nan)
 
+        return dfs
+
+    def to_metadata_csv(self, meta_csv_file):
+        """
+        Write filehandle metadata from filelist to metdata csv that contains
+        ALL metadata / variables of the filehander.
+        Can be read back in as filelist with filehandlers using
+        :func:`ismn.filecollection.IsmnFileCollection.from_metadata_csv`.
+
+        Parameters
+        ----------
+        meta_csv_file : Path or str, optional (default: None)
+            Directory where the csv file with the correct name is crated
+        """
+        dfs = self.to_metadata_df()
+
         os.makedirs(Path(os.path.dirname(meta_csv_file)), exist_ok=True)
         dfs.to_csv(meta_csv_file)
 
+    def to_metadata_parquet(self, meta_parquet_file):
+        """
+        Write filehandle metadata from filelist to a (binary, columnar)
+        parquet file. Compared to the csv format, data types are preserved
+        and loading the file is much faster for large archives.
+        Can be read back in as filelist with filehandlers using
+        :func:`ismn.filecollection.IsmnFileCollection.from_metadata_parquet`.
+        Requires the optional dependency `pyarrow`.
+
+        Parameters
+        ----------
+        meta_parquet_file : Path or str
+            Path to the parquet file that is created.
+        """
+        _eval_pyarrow_installed()
+
+        _write_metadata_parquet(self.to_metadata_df(), meta_parquet_file)
+
+    def to_fingerprints_csv(self, fingerprints_file):
+        """
+        Write the file fingerprints of the collection to a csv file, so that
+        the next metadata collection for the archive only has to read changed
+        station dirs (see the `previous` keyword of
+        :func:`IsmnFileCollection.build_from_scratch`).
+
+        Parameters
+        ----------
+        fingerprints_file : Path or str
+            Path to the csv file that is created.
+        """
+        if self.fingerprints is None:
+            raise ValueError("No fingerprints available for this collection.")
+
+        df = pd.DataFrame(
+            {"fingerprint": pd.Series(self.fingerprints, dtype=str)})
+        df.index.name = "file_path"
+
+        os.makedirs(Path(os.path.dirname(fingerprints_file)), exist_ok=True)
+        df.to_csv(fingerprints_file)
+
+    def load_fingerprints_csv(self, fingerprints_file):
+        """
+        Load file fingerprints that were stored with
+        :func:`IsmnFileCollection.to_fingerprints_csv` for the collection.
+
+        Parameters
+        ----------
+        fingerprints_file : Path or str
+            Csv file where the fingerprints are stored.
+        """
+        df = pd.read_csv(fingerprints_file, index_col=0, dtype=str)
+        self.fingerprints = df["fingerprint"].to_dict()
+
+    def _metadata_rows(self) -> np.ndarray:
+        """
+        Position of the row in the metadata frame for each filehandler
+        (in order of :func:`IsmnFileCollection.iter_filehandlers`).
+        """
+        net_codes = pd.factorize(self.metadata_df["network"]["val"].values)[0]
+        return np.argsort(net_codes, kind="stable")
+
+    def filter_ids(
+        self,
+        variable=None,
+        allowed_depth=None,
+        filter_meta_dict=None,
+        check_only_sensor_depth_from=False,
+        groupby=None,
+        bbox=None,
+        polygon=None,
+        period=None,
+        cover_period=False,
+    ) -> Union[list, dict]:
+        """
+        Find the ids (position in :func:`IsmnFileCollection.iter_filehandlers`)
+        of all filehandlers that comply with the passed metadata requirements.
+        If the collection was loaded from a metadata frame, the conditions
+        are evaluated for all filehandlers at once on the columns of the frame,
+        otherwise :func:`ismn.filehandlers.IsmnFile.check_metadata` is
+        called for each filehandler.
+
+        Parameters
+        ----------
+        variable : str or list[str], optional (default: None)
+            Name of the required variable(s) measured, e.g. soil_moisture
+        allowed_depth : Depth, optional (default: None)
+            Depth range that is allowed, depth in metadata must be within this
+            range.
+        filter_meta_dict: dict, optional (default: None)
+            Additional metadata keys and values for which the file list is
+            filtered e.g. {'lc_2010': 10} to filter for a landcover class.
+            If there are multiple conditions, ALL have to be fulfilled.
+        check_only_sensor_depth_from : bool, optional (default: False)
+            Ignores the sensors depth_to value and only checks if depth_from of
+            the sensor is in the passed depth (e.g. for cosmic ray probes).
+        groupby : str, optional (default: None)
+            A metadata field name that is used to group sensors, e.g. network
+        bbox : tuple, optional (default: None)
+            (min_lon, min_lat, max_lon, max_lat), only sensors in this
+            bounding box are used, see :func:`ismn.meta.in_bbox`.
+        polygon : list[tuple], optional (default: None)
+            (lon, lat) vertices of a polygon, only sensors in this polygon
+            are used, see :func:`ismn.meta.in_polygon`.
+        period : tuple, optional (default: None)
+            (start, end) of a period, only sensors whose time range
+            (timerange_from, timerange_to) overlaps with the period are used.
+            The rows are found with the :attr:`timerange_index`.
+        cover_period : bool, optional (default: False)
+            Only use sensors whose time range contains the whole period.
+
+        Returns
+        -------
+        ids : list or dict
+            Ids of the filehandlers that comply with the conditions. If
+            groupby is used, a dict of the group values and ids in each group.
+        """
+        if self.metadata_df is None:
+            return self.__filter_filehandlers(
+                variable, allowed_depth, filter_meta_dict,
+                check_only_sensor_depth_from, groupby, bbox, polygon, period,
+                cover_period)
+
+        rows = self._metadata_rows()
+        mask = _metadata_df_mask(
+            self.metadata_df, variable, allowed_depth, filter_meta_dict,
+            check_only_sensor_depth_from, bbox, polygon, period,
+            cover_period, None if period is None else self.timerange_index,
+        )[rows]
+
+        ids = np.flatnonzero(mask)
+
+        if groupby is None:
+            return ids.tolist()
+        else:
+            groupvals = self.metadata_df[groupby]["val"].values[rows[ids]]
+            grouped = {}
+            for id, groupval in zip(ids.tolist(), groupvals):
+                if groupval not in grouped.keys():
+                    grouped[groupval] = []
+                grouped[groupval].append(id)
+            return grouped
+
+    def __filter_filehandlers(
+        self,
+        variable=None,
+        allowed_depth=None,
+        filter_meta_dict=None,
+        check_only_sensor_depth_from=False,
+        groupby=None,
+        bbox=None,
+        polygon=None,
+        period=None,
+        cover_period=False,
+    ) -> Union[list, dict]:
+        # check the metadata of each filehandler, see filter_ids
+        if groupby is None:
+            ids = []
+        else:
+            ids = {}
+
+        for id, filehandler in enumerate(self.iter_filehandlers()):
+            eval = filehandler.check_metadata(
+                variable=variable,
+                allowed_depth=allowed_depth,
+                filter_meta_dict=filter_meta_dict,
+                check_only_sensor_depth_from=check_only_sensor_depth_from,
+                bbox=bbox,
+                polygon=polygon,
+                period=period,
+                cover_period=cover_period,
+            )
+
+            if eval:
+                if groupby is not None:
+                    groupval = filehandler.metadata[groupby].val
+                    if groupval not in ids.keys():
+                        ids[groupval] = []
+                    ids[groupval].append(id)
+                else:
+                    ids.append(id)
+
+        return ids
+
+    def aggregate_metadata(self, agg=None, by=None, **filter_kwargs):
+        """
+        Aggregate metadata values of all filehandlers that comply with the
+        passed conditions at once on the columns of the metadata frame,
+        e.g. count sensors per network and climate class, or find the first
+        and last time stamp.
+
+        Parameters
+        ----------
+        agg : dict, optional (default: None)
+            Metadata variable names and the aggregation that is applied to
+            their values, e.g. {'timerange_from': 'min', 'station': 'nunique'}
+            (passed to :func:`pandas.DataFrame.agg`).
+            If None is passed, the filehandlers are counted.
+        by : str or list[str], optional (default: None)
+            Metadata variable name(s) to group the filehandlers by, e.g.
+            ['network', 'climate_KG']. If None is passed, all filehandlers
+            are aggregated together.
+
+        Other Parameters
+        ----------------
+        filter_kwargs :
+            Only filehandlers that comply with these conditions are used,
+            see :func:`IsmnFileCollection.filter_ids`
+
+        Returns
+        -------
+        result : pd.DataFrame or pd.Series or int
+            Aggregated values for each group (index: group values).
+            Without agg, the number of filehandlers in each group
+            (or in total, if by is None).
+        """
+        if filter_kwargs.get("groupby", None) is not None:
+            raise ValueError("Use `by` to group the aggregated values.")
+
+        ids = np.array(self.filter_ids(**filter_kwargs), dtype=int)
+
+        if self.metadata_df is None:
+            metadata_df = self.to_metadata_df()
+            rows = ids
+        else:
+            metadata_df = self.metadata_df
+            rows = self._metadata_rows()[ids]
+
+        if by is None:
+            by = []
+        elif isinstance(by, str):
+            by = [by]
+        else:
+            by = list(by)
+
+        names = by + [k for k in (agg or {}).keys() if k not in by]
+        values = {}
+        for name in names:
+            if (name, "val") not in metadata_df.columns:
+                raise ValueError(f"{name} is not in the metadata.")
+            values[name] = metadata_df[(name, "val")].values[rows]
+
+        df = pd.DataFrame(values, index=pd.Index(ids, name="idx"))
+
+        if len(by) == 0:
+            return len(df.index) if agg is None else df.agg(agg)
+        elif agg is None:
+            return df.groupby(by).size().rename("count")
+        else:
+            return df.groupby(by).agg(agg)
+
     def get_filehandler(self, idx):
         """
         Get the nth filehandler in a list of all filehandlers for all networks.
@@ -466,16 +1257,105 @@ class IsmnFileCollection(object):
 
         Returns
         -------
-        filehandler : DataFile
-            nth filehandler of all filehandlers in the sorted list.
-        """
-        fs = 0
-        for net, files in self.filelist.items():
-            l = len(files)
-            if fs + l > idx:
-                return files[idx - fs]
-            else:
-                fs += l
+        filehandler : DataFile or None
+            nth filehandler of all filehandlers in the sorted list, None if
+            there is no filehandler with this index (also for negative
+            indices).
+        """
+        if not 0 <= idx < len(self.__filehandlers):
+            return None
+        return self.__filehandlers[idx]
+
+    def get_filehandlers(self, ids) -> List[DataFile]:
+        """
+        Get the filehandlers for multiple ids at once.
+
+        Parameters
+        ----------
+        ids: list[int]
+            Indices of filehandlers, see
+            :func:`IsmnFileCollection.get_filehandler`
+
+        Returns
+        -------
+        filehandlers : list[DataFile]
+            Filehandlers in the order of the passed ids.
+        """
+        return list(self.__filehandlers[np.asarray(ids, dtype=int)])
+
+    def read_data(self, ids, n_workers=1, backend="threading", start=None,
+                  end=None) -> list:
+        """
+        Read the data of multiple filehandlers, optionally in parallel.
+        Data is taken from / added to the data cache of the filehandlers.
+
+        Parameters
+        ----------
+        ids: list[int]
+            Indices of filehandlers to read, see
+            :func:`IsmnFileCollection.get_filehandler`
+        n_workers: int, optional (default: 1)
+            Number of threads / processes that read files at the same time.
+        backend: str, optional (default: 'threading')
+            Either 'threading' (all threads share the opened archive) or
+            'multiprocessing' (each process opens the archive once, the
+            data is sent back to the main process).
+        start, end: str or datetime, optional (default: None)
+            Only read data in this time window,
+            see :func:`ismn.filehandlers.DataFile.read_data`
+
+        Returns
+        -------
+        data : list[pd.DataFrame]
+            Time series in the order of the passed ids.
+        """
+        if backend not in ["threading", "multiprocessing"]:
+            raise ValueError(f"Unknown backend: {backend}. "
+                             f"Choose one of 'threading', 'multiprocessing'.")
+
+        filehandlers = self.get_filehandlers(ids)
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+
+        def read(f: DataFile) -> pd.DataFrame:
+            return f.read_data(start=start, end=end)
+
+        if n_workers == 1 or len(filehandlers) <= 1:
+            return [read(f) for f in filehandlers]
+
+        if backend == "threading":
+            # reading from the same zip archive in multiple threads is safe
+            with ThreadPoolExecutor(n_workers) as executor:
+                return list(executor.map(read, filehandlers))
+
+        data = [None] * len(filehandlers)
+        to_read = []
+        for i, f in enumerate(filehandlers):
+            if not f.overlaps(start, end):  # the file is not read
+                data[i] = read(f)
+            elif f.data_cache is not None:
+                data[i] = f.data_cache.get(f.cache_key(start, end))
+            if data[i] is None:
+                to_read.append(i)
+
+        if len(to_read) > 0:
+            args = [(str(self.root.path),
+                     str(PurePosixPath(filehandlers[i].file_path)),
+                     filehandlers[i].file_type,
+                     filehandlers[i].metadata["variable"].val,
+                     filehandlers[i].compact_dtypes,
+                     start, end) for i in to_read]
+            with ProcessPoolExecutor(n_workers) as executor:
+                res = executor.map(
+                    _read_data_file, *zip(*args),
+                    chunksize=max(1, len(args) // (n_workers * 4)))
+                for i, d in zip(to_read, res):
+                    data[i] = d
+                    f = filehandlers[i]
+                    if f.data_cache is not None:
+                        f.data_cache.put(f.cache_key(start, end), d)
+
+        return data
 
     def iter_filehandlers(self, networks=None):
         """
@@ -491,11 +1371,12 @@ class IsmnFileCollection(object):
         file : DataFile
             Filehandler with metadata
         """
-        for net, files in self.filelist.items():
-            if (networks is None) or (net in networks):
-                for f in files:
-                    yield f
-        yield from ()  # in case networks is an empty list
+        if networks is None:
+            yield from self.__filehandlers
+        else:
+            for net, s in self.__net_slices.items():
+                if net in networks:
+                    yield from self.__filehandlers[s]
 
     def close(self):
         # close root and all filehandlers
@@ -21,21 +21,156 @@
 # SOFTWARE.
 
 import os
+import io
+import mmap
 import traceback
+import zipfile
 
 import pandas as pd
 import warnings
 import numpy as np
-from tempfile import gettempdir, TemporaryDirectory
-from pathlib import Path
-from typing import Tuple, Union
+from tempfile import gettempdir
+from pathlib import Path, PurePosixPath
+from typing import Tuple, Union, IO, Callable
+from collections import OrderedDict
+import threading
 import logging
 
 #warnings.simplefilter(action="ignore", category=UserWarning)
 from ismn.base import IsmnRoot
 from ismn import const
 from ismn.const import IsmnFileError, ismnlog
-from ismn.meta import MetaVar, MetaData, Depth
+from ismn.meta import (MetaVar, MetaData, Depth, in_bbox, in_polygon,
+                       in_period)
+
+# bytes that separate tokens in data files (same as for bytes.split())
+_SPACE = np.zeros(256, dtype=bool)
+_SPACE[[9, 10, 11, 12, 13, 32]] = True
+
+# tokens that pandas.read_csv reads as missing values by default
+_NA_TOKENS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN",
+              "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN",
+              "None", "n/a", "nan", "null"}
+
+
+class DataCache:
+    """
+    Size-bounded cache for time series read from data files. When the size
+    limit is reached, the least recently used time series are removed.
+    The same cache can be shared by multiple filehandlers (e.g. all files
+    in an :class:`ismn.interface.ISMN_Interface`) and threads.
+
+    Attributes
+    ----------
+    max_bytes : int or None
+        Maximum (deep) memory size of all cached time series. None means
+        that the size is not limited.
+    size_bytes : int
+        Current memory size of all cached time series.
+    hits : int
+        Number of time series that were taken from the cache.
+    misses : int
+        Number of time series that were not in the cache.
+    evictions : int
+        Number of time series that were removed from the cache to make
+        space for new ones.
+    """
+
+    def __init__(self, max_bytes=None):
+        """
+        Parameters
+        ----------
+        max_bytes : int, optional (default: None)
+            Maximum memory (in bytes) that the cached time series can use.
+            If None is passed, the size is not limited.
+        """
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__data = OrderedDict()  # key -> (data, size), in order of use
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}({len(self)} time series, "
+                f"{self.size_bytes} of {self.max_bytes} bytes)")
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key) -> bool:
+        return key in self.__data
+
+    @property
+    def stats(self) -> dict:
+        """
+        Cache statistics (hits, misses, evictions, number of cached time
+        series, current and max size in bytes).
+        """
+        with self.__lock:
+            return dict(hits=self.hits, misses=self.misses,
+                        evictions=self.evictions, n_items=len(self.__data),
+                        size_bytes=self.size_bytes, max_bytes=self.max_bytes)
+
+    def get(self, key) -> Union[pd.DataFrame, None]:
+        """
+        Get a copy of a cached time series.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the time series, e.g. the file path.
+
+        Returns
+        -------
+        data : pd.DataFrame or None
+            The cached data or None if it is not in the cache.
+        """
+        with self.__lock:
+            if key not in self.__data:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__data.move_to_end(key)
+            return self.__data[key][0].copy()
+
+    def put(self, key, data: pd.DataFrame):
+        """
+        Add (a copy of) a time series to the cache. The least recently used
+        time series are removed if the cache is full. Time series that are
+        larger than the cache are not added.
+
+        Parameters
+        ----------
+        key : Hashable
+            Key of the time series, e.g. the file path.
+        data : pd.DataFrame
+            Time series to cache.
+        """
+        size = int(data.memory_usage(index=True, deep=True).sum())
+
+        with self.__lock:
+            if key in self.__data:
+                self.size_bytes -= self.__data.pop(key)[1]
+            if (self.max_bytes is not None) and (size > self.max_bytes):
+                return
+            while (self.max_bytes is not None) and \
+                    (self.size_bytes + size > self.max_bytes):
+                _, (_, s) = self.__data.popitem(last=False)
+                self.size_bytes -= s
+                self.evictions += 1
+            self.__data[key] = (data.copy(), size)
+            self.size_bytes += size
+
+    def clear(self):
+        """
+        Remove all time series from the cache (statistics are kept).
+        """
+        with self.__lock:
+            self.__data.clear()
+            self.size_bytes = 0
 
 
 class IsmnFile(object):
@@ -59,6 +194,8 @@ class IsmnFile(object):
         Switch to activate temp root verification
     """
 
+    __slots__ = ("root", "file_path", "temp_root", "metadata")
+
     def __init__(self, root, file_path, temp_root=gettempdir(),
                  verify_filepath=True, verify_temp_root=True):
         """
@@ -109,6 +246,10 @@ class IsmnFile(object):
         allowed_depth=None,
         filter_meta_dict=None,
         check_only_sensor_depth_from=False,
+        bbox=None,
+        polygon=None,
+        period=None,
+        cover_period=False,
     ) -> bool:
         """
         Evaluate whether the file complies with the passed metadata requirements
@@ -126,6 +267,17 @@ class IsmnFile(object):
         check_only_sensor_depth_from : bool, optional (default: False)
             Ignores the sensors depth_to value and only checks if depth_from of
             the sensor is in the passed depth (e.g. for cosmic ray probes).
+        bbox : tuple, optional (default: None)
+            (min_lon, min_lat, max_lon, max_lat), check if the sensor is in
+            this bounding box.
+        polygon : list[tuple], optional (default: None)
+            (lon, lat) vertices of a polygon, check if the sensor is in this
+            polygon.
+        period : tuple, optional (default: None)
+            (start, end) of a period, check if the time range of the file
+            (timerange_from, timerange_to) overlaps with the period.
+        cover_period : bool, optional (default: False)
+            Check if the time range of the file contains the whole period.
 
         Returns
         -------
@@ -168,6 +320,21 @@ class IsmnFile(object):
             if not all(fil_lc_cl):
                 return False
 
+        if (bbox is not None) or (polygon is not None):
+            lon = [self.metadata["longitude"].val]
+            lat = [self.metadata["latitude"].val]
+            if (bbox is not None) and not in_bbox(lon, lat, bbox)[0]:
+                return False
+            if (polygon is not None) and not in_polygon(lon, lat, polygon)[0]:
+                return False
+
+        if period is not None:
+            t_from, t_to = (self.metadata[k] for k in
+                            ["timerange_from", "timerange_to"])
+            if (t_from is None) or (t_to is None) or not in_period(
+                    [t_from.val], [t_to.val], period, cover_period)[0]:
+                return False
+
         return True
 
     def close(self):
@@ -239,14 +406,15 @@ class StaticMetaFile(IsmnFile):
         return field_vars
 
     @staticmethod
-    def __read_csv(csvfile: Path) -> pd.DataFrame:
-        """Load static metadata data frame from csv"""
+    def __read_csv(csvfile: IO[bytes]) -> pd.DataFrame:
+        """Load static metadata data frame from csv stream"""
         try:
             data = pd.read_csv(csvfile, delimiter=";")
             data.set_index("quantity_name", inplace=True)
         except Exception:
             # set columns manually
             ismnlog.info("no header: {}".format(csvfile))
+            csvfile.seek(0)
             data = pd.read_csv(csvfile, delimiter=";", header=None)
             cols = list(data.columns)
             cols[:len(const.CSV_COLS)] = const.CSV_COLS  # todo: not safe
@@ -264,15 +432,11 @@ class StaticMetaFile(IsmnFile):
         metadata : MetaData
             Static metadata read from csv file.
         """
-        if self.root.zip:
-            if not self.root.isopen:
-                self.root.open()
-            with TemporaryDirectory(
-                    prefix="ismn", dir=self.temp_root) as tempdir:
-                extracted = self.root.extract_file(self.file_path, tempdir)
-                data = self.__read_csv(extracted)
-        else:
-            data = self.__read_csv(self.root.path / self.file_path)
+        if not self.root.isopen:
+            self.root.open()
+
+        with self.root.open_member(self.file_path) as f:
+            data = self.__read_csv(f)
 
         # read landcover classifications
         lc = data.loc[["land cover classification"
@@ -364,14 +528,23 @@ class DataFile(IsmnFile):
     See :class:`ismn.filehandlers.IsmnFile`
     file_type : str
         File type information (e.g. ceop).
+    data_cache : DataCache or None
+        Cache for the data read from this file.
+    compact_dtypes : bool
+        Return values as float32 and flags as categorical columns.
     """
 
+    __slots__ = ("file_type", "posix_path", "data_cache", "compact_dtypes",
+                 "_metadata", "_metadata_loader")
+
     def __init__(self,
                  root,
                  file_path,
                  load_metadata=True,
                  temp_root=gettempdir(),
                  *args,
+                 data_cache=None,
+                 compact_dtypes=False,
                  **kwargs):
         """
         Parameters
@@ -389,6 +562,14 @@ class DataFile(IsmnFile):
             Check if subpath is a valid path and adapt to archive format and os
         verify_temp_root: bool, optional (default: True)
             Check if temp_root is a valid path and create if if necessary
+        data_cache : DataCache, optional (default: None)
+            Cache (can be shared with other files) where data is kept
+            after reading. If None is passed, data is read from file every
+            time.
+        compact_dtypes : bool, optional (default: False)
+            Return values as float32 and the (original) flags as pandas
+            categoricals instead of float64 and object (str) columns,
+            which uses much less memory.
         """
 
         super(DataFile, self).__init__(root, file_path, temp_root,
@@ -396,29 +577,72 @@ class DataFile(IsmnFile):
 
         self.file_type = "undefined"
         self.posix_path = file_path
+        self.data_cache = data_cache
+        self.compact_dtypes = compact_dtypes
 
         self.metadata = None
 
         if load_metadata:
             self.metadata = self.read_metadata(best_meta_for_sensor=True)
 
-    @staticmethod
-    def __read_lines(filename: Path) -> Tuple[list, list, list]:
+    @property
+    def metadata(self) -> MetaData:
+        # create metadata from the loader (if any) when first accessed
+        if self._metadata_loader is not None:
+            self._metadata = self._metadata_loader()
+            self._metadata_loader = None
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, metadata: MetaData):
+        self._metadata = metadata
+        self._metadata_loader = None
+
+    def set_metadata_loader(self, loader: Callable[[], MetaData]):
         """
-        Read fist and last line from file as list, skips empty lines.
+        Set a function that creates the metadata of this file. It is called
+        when the metadata is accessed for the first time. Used to set up
+        many filehandlers at once (e.g. from the metadata csv file) without
+        creating all MetaData objects in advance.
+
+        Parameters
+        ----------
+        loader : Callable
+            Function without arguments that returns the MetaData of the file.
         """
-        with filename.open(mode="rb", newline=None) as f:
-            lines = f.read().splitlines()
-            headr = lines[0].split()
+        self._metadata = None
+        self._metadata_loader = loader
 
-            last, scnd = [], []
-            i = 1
-            while (not last) or (not scnd):
-                if not last:
-                    last = lines[-i].split()
-                if not scnd:
-                    scnd = lines[i].split()
-                i += 1
+    @staticmethod
+    def __read_lines(f: IO[bytes],
+                     blocksize: int = 4096) -> Tuple[list, list, list]:
+        """
+        Read fist, second and last line from file stream as list, skips empty
+        lines. Only the start and end of the file are read, the last line is
+        searched backwards from the end of the file.
+        """
+        head = b""
+        while True:
+            block = f.read(blocksize)
+            head += block
+            lines = head.splitlines(keepends=True)
+            if block:  # the last line can be incomplete
+                lines = lines[:-1]
+            start = 0
+            headr, scnd = None, []
+            for line in lines:
+                start += len(line)
+                if headr is None:
+                    headr = line.split()
+                elif line.split():
+                    scnd = line.split()
+                    break
+            if scnd:
+                break
+            if not block:
+                raise IOError("File does not contain any data lines.")
+
+        last = DataFile.__read_last_line(f, start, head[start:]) or scnd
 
         headr = [s.decode("ascii") for s in headr]
         scnd = [s.decode("ascii") for s in scnd]
@@ -426,6 +650,44 @@ class DataFile(IsmnFile):
 
         return headr, scnd, last
 
+    @staticmethod
+    def __read_last_line(f: IO[bytes], start: int, tail: bytes,
+                         blocksize: int = 4096) -> list:
+        """
+        Find the last non empty line after position start in the stream.
+        Files on disk are read backwards in blocks from the end. Compressed
+        zip members can not be read backwards (seeking would decompress the
+        member again from the start), so they are read forward in blocks
+        (after the already read tail) and only the last line is kept.
+        """
+        if isinstance(f, zipfile.ZipExtFile) or not f.seekable():
+            while True:
+                block = f.read(blocksize * 256)
+                tail += block
+                # keep only the last non empty (maybe incomplete) line
+                content = tail.rstrip()
+                if content:
+                    tail = tail[max(content.rfind(b"\n"),
+                                    content.rfind(b"\r")) + 1:]
+                if not block:
+                    break
+            return tail.split()
+
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        while pos > start:
+            n = min(blocksize, pos - start)
+            pos -= n
+            f.seek(pos)
+            tail = f.read(n) + tail
+            lines = tail.splitlines()
+            # the first line of the block can be incomplete
+            for line in reversed(lines if pos == start else lines[1:]):
+                if line.split():
+                    return line.split()
+
+        return []
+
     @staticmethod
     def __get_parent_path(filepath: Union[str, Path]):
         """
@@ -572,25 +834,18 @@ class DataFile(IsmnFile):
             secnd = None
             last = None
         else:
-            if self.root.zip:
-                if not self.root.isopen:
-                    self.root.open()
-
-                with TemporaryDirectory(
-                        prefix="ismn", dir=self.temp_root) as tempdir:
-                    filename = self.root.extract_file(self.file_path, tempdir)
-                    headr, secnd, last = self.__read_lines(filename)
+            if not self.root.isopen:
+                self.root.open()
 
-            else:
-                filename = self.root.path / self.file_path
-                headr, secnd, last = self.__read_lines(filename)
+            with self.root.open_member(self.file_path) as f:
+                headr, secnd, last = self.__read_lines(f)
 
-        path, basename = os.path.split(filename)
+        path, basename = os.path.split(self.file_path)
         file_basename_elements = basename.split(delim)
 
         return headr, secnd, last, file_basename_elements
 
-    def __read_format_ceop_sep(self) -> pd.DataFrame:
+    def __read_format_ceop_sep(self, start=None, end=None) -> pd.DataFrame:
         """
         Read data in the file format called CEOP in separate files.
         """
@@ -605,9 +860,25 @@ class DataFile(IsmnFile):
         ]
         usecols = [0, 1, 12, 13, 14]
 
-        return self.__read_csv(names, usecols)
+        if not self.root.zip:
+            data = self.__read_mapped(names, 15, 0, start, end)
+            if data is not None:
+                return data
+
+        content = self.__read_content(skiprows=0, start=start, end=end)
+        data = self.__read_fast(content, names, ncols=15)
+        if data is None:
+            if not content.strip():  # no data in the window
+                return self.__empty_data(names[2:])
+            if (start is not None) or (end is not None):
+                # irregular layout, pandas needs the whole file
+                content = self.__read_content(skiprows=0)
+            data = self.__read_csv(content, names, usecols)
+
+        return data
 
-    def __read_format_header_values(self) -> pd.DataFrame:
+    def __read_format_header_values(self, start=None,
+                                    end=None) -> pd.DataFrame:
         """
         Read data file in the format called Header Values.
         """
@@ -621,20 +892,434 @@ class DataFile(IsmnFile):
             varname + "_orig_flag",
         ]
 
-        return self.__read_csv(
-            names=names,
-            usecols=[0, 1, 2, 3, 4],
-            skiprows=1,
-            sep=r'\s+',
-            low_memory=False,
-        )
+        if not self.root.zip:
+            data = self.__read_mapped(names, 5, 1, start, end)
+            if data is not None:
+                return data
+
+        content = self.__read_content(skiprows=1, start=start, end=end)
+        data = self.__read_fast(content, names, ncols=5)
+        if data is None:
+            if not content.strip():  # no data in the window
+                return self.__empty_data(names[2:])
+            if (start is not None) or (end is not None):
+                # irregular layout, pandas needs the whole file
+                content = self.__read_content(skiprows=1)
+            data = self.__read_csv(
+                content,
+                names=names,
+                usecols=[0, 1, 2, 3, 4],
+                sep=r'\s+',
+                low_memory=False,
+            )
+
+        return data
+
+    @staticmethod
+    def __parse_timestamps(dates: list, times: list) -> Union[np.ndarray, None]:
+        """
+        Convert date (YYYY/MM/DD) and time (HH:MM) tokens to datetime64
+        from the digits at their fixed positions. None is returned if any
+        token does not match the format or is not a valid date / time.
+        """
+        n = len(dates)
+        dates, times = b"".join(dates), b"".join(times)
+        if (len(dates) != n * 10) or (len(times) != n * 5):
+            return None
+
+        return DataFile.__timestamps_from_chars(
+            np.frombuffer(dates, dtype=np.uint8).reshape(n, 10),
+            np.frombuffer(times, dtype=np.uint8).reshape(n, 5))
+
+    @staticmethod
+    def __timestamps_from_chars(d: np.ndarray,
+                                t: np.ndarray) -> Union[np.ndarray, None]:
+        # characters of the date (n, 10) and time (n, 5) tokens to datetime64
+        # digits wrap around (uint8) if the character is smaller than '0'
+        dd, td = d - ord("0"), t - ord("0")
+        if not (np.all(d[:, [4, 7]] == ord("/")) and
+                np.all(t[:, 2] == ord(":")) and
+                np.all(dd[:, [0, 1, 2, 3, 5, 6, 8, 9]] <= 9) and
+                np.all(td[:, [0, 1, 3, 4]] <= 9)):
+            return None
+
+        dd, td = dd.astype(np.int32), td.astype(np.int32)
+        year = dd[:, 0] * 1000 + dd[:, 1] * 100 + dd[:, 2] * 10 + dd[:, 3]
+        month = dd[:, 5] * 10 + dd[:, 6]
+        day = dd[:, 8] * 10 + dd[:, 9]
+        hour = td[:, 0] * 10 + td[:, 1]
+        minute = td[:, 3] * 10 + td[:, 4]
+
+        if np.any((month < 1) | (month > 12)):
+            return None
+
+        leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        month_days = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31,
+                               30, 31])[month] + (leap & (month == 2))
+        if np.any((day < 1) | (day > month_days) | (hour > 23) |
+                  (minute > 59)):
+            return None
+
+        # days since 1970-01-01 in the proleptic gregorian calendar
+        y = year - (month <= 2)
+        era = y // 400
+        yoe = y - era * 400
+        doy = (153 * (month + np.where(month > 2, -3, 9)) + 2) // 5 + day - 1
+        days = era * 146097 + yoe * 365 + yoe // 4 - yoe // 100 + doy - 719468
+
+        minutes = days.astype(np.int64) * 1440 + hour * 60 + minute
+
+        return (minutes * 60 * 10**9).view("datetime64[ns]")
+
+    @staticmethod
+    def __parse_values(values: list) -> Union[np.ndarray, None]:
+        """
+        Convert value tokens to float. None is returned if a token is not
+        a number, or if all are integers (which pandas would read as an
+        integer column).
+        """
+        try:
+            parsed = np.array(values, dtype=np.float64)
+        except ValueError:
+            return None
+
+        if np.all(np.mod(parsed, 1) == 0):
+            joined = values.tobytes() if isinstance(values, np.ndarray) \
+                else b"".join(values)
+            if not any(c in joined for c in [b".", b"e", b"E", b"n", b"N"]):
+                return None
+
+        return parsed
 
-    def __read_csv(self, names=None, usecols=None, skiprows=0, **kwargs):
+    @staticmethod
+    def __parse_flags(flags: list) -> Union[tuple, None]:
+        """
+        Decode flag tokens. Returns the (sorted) flag strings and the
+        position of each token's flag in them, -1 for missing values (as
+        read by pandas, e.g. NaN). None is returned if all flags are
+        numbers or missing (which pandas would read as a numeric column).
+        """
+        if isinstance(flags, np.ndarray):  # fixed width bytes
+            unique, inverse = np.unique(flags, return_inverse=True)
+        else:
+            unique, inverse = sorted(set(flags)), None
+        tokens = [f.decode("utf-8") for f in unique]
+        categories = [f for f in tokens if f not in _NA_TOKENS]
+
+        numeric = True
+        for f in categories:
+            try:
+                float(f)
+            except ValueError:
+                numeric = False
+                break
+        if numeric:
+            return None
+
+        pos = {f: i for i, f in enumerate(categories)}
+        lut = {b: pos.get(f, -1) for b, f in zip(unique, tokens)}
+        if inverse is not None:
+            codes = np.array([lut[b] for b in unique],
+                             dtype=np.int32)[inverse.ravel()]
+        else:
+            codes = list(map(lut.__getitem__, flags))
+
+        return categories, np.asarray(codes, dtype=np.int32)
+
+    @staticmethod
+    def __skip_lines(content: bytes, skiprows: int) -> int:
+        # position after the first skiprows lines (\n, \r or \r\n)
+        start = 0
+        for _ in range(skiprows):
+            ends = [content.find(b"\n", start), content.find(b"\r", start)]
+            ends = [i for i in ends if i >= 0]
+            start = min(ends) + 1 if ends else len(content)
+            if content[start - 1:start + 1] == b"\r\n":
+                start += 1
+        return start
+
+    @staticmethod
+    def __time_key(t) -> Union[bytes, None]:
+        # time stamp as it is written at the start of each data line
+        return None if t is None else t.strftime("%Y/%m/%d %H:%M").encode()
+
+    @staticmethod
+    def __next_line(block: bytes, pos: int) -> int:
+        # start of the first non empty line in block that starts at / after pos
+        if (pos > 0) and (block[pos - 1:pos] not in (b"\n", b"\r")):
+            ends = [block.find(b"\n", pos), block.find(b"\r", pos)]
+            ends = [i for i in ends if i >= 0]
+            pos = min(ends) + 1 if ends else len(block)
+        while (pos < len(block)) and block[pos:pos + 1].isspace():
+            pos += 1
+        return pos
+
+    @staticmethod
+    def __bisect_lines(block: bytes, key: bytes, right=False, lo=0) -> int:
+        """
+        Binary search in a block of complete lines (sorted by time) for the
+        start of the first line (at / after lo) whose time stamp is >= key
+        (> key if right is selected). Returns the length of the block if
+        there is none.
+        """
+        hi = len(block)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line = DataFile.__next_line(block, mid)
+            k = block[line:line + 16]
+            if (line >= len(block)) or (k > key if right else k >= key):
+                hi = mid
+            else:
+                lo = mid + 1
+        return DataFile.__next_line(block, lo)
+
+    @staticmethod
+    def __lines_in_window(block: bytes, start_key, end_key) -> tuple:
+        """
+        Keep the complete lines of a block whose time stamp is in the window.
+        Returns the kept lines and whether a line after the window was found.
+        """
+        i0 = 0 if start_key is None else \
+            DataFile.__bisect_lines(block, start_key)
+        i1 = len(block) if end_key is None else \
+            DataFile.__bisect_lines(block, end_key, right=True)
+        return block[i0:max(i0, i1)], i1 < len(block)
+
+    def __read_content(self, skiprows=0, start=None, end=None,
+                       blocksize=2 ** 16) -> bytes:
+        """
+        Read the data lines of the file, without the first skiprows (header)
+        lines. If a time window is passed, only lines in the window are
+        returned (lines in the file are sorted by time): The file is read from
+        the start, but only lines in the window are kept. Reading stops after
+        the end of the window. Files on disk are searched for the window in a
+        memory map instead, see :func:`DataFile.__read_mapped`
+
+        Parameters
+        ----------
+        skiprows : int, optional (default: 0)
+            Number of lines at the start of the file that are skipped.
+        start, end : pd.Timestamp, optional (default: None)
+            First and last time stamp of the lines to read.
+        blocksize : int, optional (default: 65536)
+            Number of bytes read at once when a window is passed.
+
+        Returns
+        -------
+        content : bytes
+            Data lines.
+        """
+        with self.root.open_member(self.file_path) as f:
+            if (start is None) and (end is None):
+                content = f.read()
+                return content[self.__skip_lines(content, skiprows):]
+
+            # header lines are in the first block
+            head = f.read(blocksize)
+            pos = self.__skip_lines(head, skiprows)
+            start_key, end_key = self.__time_key(start), self.__time_key(end)
+            tail = head[pos:]
+
+            content = []
+            while True:
+                block = f.read(blocksize)
+                lines = tail + block
+                if block:
+                    # the last line can be incomplete, keep it for later
+                    cut = max(lines.rfind(b"\n"), lines.rfind(b"\r")) + 1
+                    lines, tail = lines[:cut], lines[cut:]
+                lines, done = self.__lines_in_window(lines, start_key, end_key)
+                content.append(lines)
+                if done or not block:
+                    break
+
+        return b"\n".join(content)
+
+    def __read_mapped(self, names, ncols=5, skiprows=0, start=None,
+                      end=None) -> Union[pd.DataFrame, None]:
+        """
+        Read data from a file in a directory archive via a memory map.
+        Tokens are parsed directly from the mapped file, i.e. the content
+        is not copied into a buffer first, and the operating system can
+        share the pages of the file between all processes that read it.
+        A time window is found with a binary search in the mapped lines.
+
+        Parameters
+        ----------
+        names : list
+            Names of the date, time, value, flag and original flag columns.
+        ncols : int, optional (default: 5)
+            Number of columns in each line.
+        skiprows : int, optional (default: 0)
+            Number of lines at the start of the file that are skipped.
+        start, end : pd.Timestamp, optional (default: None)
+            First and last time stamp of the lines to read.
+
+        Returns
+        -------
+        data : pd.DataFrame or None
+            Time series, None if the file does not match the fixed layout,
+            see :func:`DataFile.__read_fast`
+        """
+        with open(self.root.path / self.file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None  # empty files can't be mapped
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        content = None
+        try:
+            i0, i1 = self.__skip_lines(mm, skiprows), len(mm)
+            if start is not None:
+                i0 = self.__bisect_lines(mm, self.__time_key(start), lo=i0)
+            if end is not None:
+                i1 = max(i0, self.__bisect_lines(
+                    mm, self.__time_key(end), right=True, lo=i0))
+            content = np.frombuffer(mm, dtype=np.uint8, count=i1 - i0,
+                                    offset=i0)
+            data = self.__read_buffer(content, names, ncols)
+        finally:
+            content = None  # the map can only be closed without views
+            try:
+                mm.close()
+            except BufferError:
+                # the traceback of an error still references the buffer,
+                # the map is closed when it is released
+                pass
+
+        return data
+
+    def __read_fast(self, content: bytes, names, ncols=5):
+        """
+        Parser for the fixed ISMN data layouts, i.e. date and time in the
+        first two and value, flag and original flag in the last three of
+        ncols whitespace separated columns. Dates are converted from their
+        fixed positions, no format inference is necessary. None is
+        returned if the file content does not match this layout (e.g. if
+        a value is missing in a line).
+
+        Parameters
+        ----------
+        content : bytes
+            Data lines of the file, see :func:`DataFile.__read_content`
+        names : list
+            Names of the date, time, value, flag and original flag columns.
+        ncols : int, optional (default: 5)
+            Number of columns in each line.
+
+        Returns
+        -------
+        data : pd.DataFrame or None
+            Time series.
+        """
+        tokens = content.split()
+        n = len(tokens) // ncols
+        if (n == 0) or (n * ncols != len(tokens)):
+            return None
+
+        # a line with missing values shifts all following lines, this is
+        # detected as the first token is then no longer a date
+        date_time = DataFile.__parse_timestamps(tokens[0::ncols],
+                                                tokens[1::ncols])
+        if date_time is None:
+            return None
+
+        values = DataFile.__parse_values(tokens[ncols - 3::ncols])
+        flags = [DataFile.__parse_flags(tokens[i::ncols])
+                 for i in [ncols - 2, ncols - 1]]
+        if (values is None) or (flags[0] is None) or (flags[1] is None):
+            return None
+
+        return self.__to_frame(names, date_time, values, flags)
+
+    def __read_buffer(self, content: np.ndarray, names, ncols=5):
+        """
+        Same as :func:`DataFile.__read_fast`, but tokens are located and
+        converted with numpy in a (memory mapped) byte buffer, without
+        creating a bytes object for each token.
+
+        Parameters
+        ----------
+        content : np.ndarray
+            Data lines of the file as uint8.
+        names : list
+            Names of the date, time, value, flag and original flag columns.
+        ncols : int, optional (default: 5)
+            Number of columns in each line.
+
+        Returns
+        -------
+        data : pd.DataFrame or None
+            Time series.
+        """
+        # tokens start / end where a space is followed by a non-space / a
+        # non-space by a space (or the buffer start / end)
+        edges = np.diff(~_SPACE[content], prepend=False, append=False)
+        edges = np.flatnonzero(edges)
+        starts, ends = edges[0::2], edges[1::2]
+
+        n = len(starts) // ncols
+        if n == 0:
+            return self.__empty_data(names[2:]) if len(starts) == 0 else None
+        if n * ncols != len(starts):
+            return None
+
+        # date and time tokens have a fixed width, their characters are
+        # taken from the buffer at the token starts
+        lengths = ends - starts
+        if np.any(lengths[0::ncols] != 10) or np.any(lengths[1::ncols] != 5):
+            return None
+        date_time = DataFile.__timestamps_from_chars(
+            content[starts[0::ncols, np.newaxis] + np.arange(10)],
+            content[starts[1::ncols, np.newaxis] + np.arange(5)])
+        if date_time is None:
+            return None
+
+        tokens = [DataFile.__gather_tokens(content, starts[i::ncols],
+                                           ends[i::ncols])
+                  for i in range(ncols - 3, ncols)]
+        values = DataFile.__parse_values(tokens[0])
+        flags = [DataFile.__parse_flags(t) for t in tokens[1:]]
+        if (values is None) or (flags[0] is None) or (flags[1] is None):
+            return None
+
+        return self.__to_frame(names, date_time, values, flags)
+
+    @staticmethod
+    def __gather_tokens(content: np.ndarray, starts: np.ndarray,
+                        ends: np.ndarray) -> np.ndarray:
+        # tokens between starts and ends as fixed width bytes (null padded)
+        width = int(np.max(ends - starts))
+        pos = starts[:, np.newaxis] + np.arange(width)
+        chars = np.where(pos < ends[:, np.newaxis],
+                         content[np.minimum(pos, len(content) - 1)], 0)
+        return chars.astype(np.uint8).view(f"S{width}").ravel()
+
+    def __to_frame(self, names, date_time: np.ndarray, values: np.ndarray,
+                   flags: list) -> pd.DataFrame:
+        # data frame from parsed time stamps, values and flag codes
+        if self.compact_dtypes:
+            values = values.astype(np.float32)
+            flags = [pd.Categorical.from_codes(codes, categories)
+                     for categories, codes in flags]
+        else:
+            # all rows with the same flag share one string object, missing
+            # flags (code -1) are NaN
+            flags = [np.array(categories + [np.nan], dtype=object)[codes]
+                     for categories, codes in flags]
+
+        return pd.DataFrame(
+            {names[2]: values, names[3]: flags[0], names[4]: flags[1]},
+            index=pd.DatetimeIndex(date_time, name="date_time"))
+
+    def __read_csv(self, content: bytes, names=None, usecols=None,
+                   skiprows=0, **kwargs):
         """
         Read data from csv.
 
         Parameters
         ----------
+        content : bytes
+            Data lines of the file, see :func:`DataFile.__read_content`
         names : list, optional (default: None)
             List of column names to use.
         usecols : list, optional (default: None)
@@ -667,6 +1352,7 @@ class DataFile(IsmnFile):
                     **kwargs
                 )
             except pd.errors.ParserError:
+                f.seek(0)
                 df = pd.read_csv(
                     filepath_or_buffer=f,
                     skiprows=skiprows,
@@ -683,29 +1369,104 @@ class DataFile(IsmnFile):
 
             return df
 
-        if self.root.zip:
-            with TemporaryDirectory(
-                    prefix="ismn", dir=self.temp_root) as tempdir:
-                filename = self.root.extract_file(self.file_path, tempdir)
-                data = readf(filename, **kwargs)
-
-        else:
-            data = readf(self.root.path / self.file_path, **kwargs)
+        data = readf(io.BytesIO(content), **kwargs)
 
         data.set_index("date_time", inplace=True)
 
+        # same resolution as from the fixed layout parser, pandas >= 3 reads
+        # time stamps with a resolution that depends on the content
+        data.index = data.index.astype("datetime64[ns]")
+
         return data
 
-    def read_data(self) -> pd.DataFrame:
+    def cache_key(self, start=None, end=None) -> tuple:
+        """
+        Key of the data of this file (in the passed time window) in the
+        data cache.
+        """
+        key = (str(self.root.path), str(PurePosixPath(self.file_path)),
+               self.compact_dtypes)
+        if (start is not None) or (end is not None):
+            key += (start, end)
+        return key
+
+    def overlaps(self, start=None, end=None) -> bool:
         """
-        Read data in file. Load file if necessary.
+        Check if the time range of the file (from the metadata) overlaps with
+        the passed time window. If the time range is not in the metadata,
+        True is returned.
+
+        Parameters
+        ----------
+        start, end : str or datetime, optional (default: None)
+            First and last time stamp of the window. None means that the
+            window is open on this side.
+
+        Returns
+        -------
+        overlaps : bool
+            False if the file does not contain data in the window.
+        """
+        if (start is None) and (end is None):
+            return True
+        meta = self.metadata
+        if (end is not None) and ("timerange_from" in meta):
+            t = meta["timerange_from"].val
+            if not pd.isnull(t) and pd.Timestamp(t) > pd.Timestamp(end):
+                return False
+        if (start is not None) and ("timerange_to" in meta):
+            t = meta["timerange_to"].val
+            if not pd.isnull(t) and pd.Timestamp(t) < pd.Timestamp(start):
+                return False
+        return True
+
+    def read_data(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Read data in file. Load file if necessary. If a data cache is set,
+        data is taken from / added to the cache.
+
+        Parameters
+        ----------
+        start, end : str or datetime, optional (default: None)
+            Only read data between these (included) time stamps. Lines
+            outside the window are skipped while reading, and of files whose
+            time range (in the metadata) is outside the window only the first
+            lines are parsed (for the data types of the empty frame).
+            By default, all data is read.
 
         Returns
         -------
         data : pd.DataFrame
             File content.
         """
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+
+        if not self.overlaps(start, end):
+            varname = self.metadata["variable"].val
+            return self.__empty_data(
+                [varname, varname + "_flag", varname + "_orig_flag"])
+
+        if self.data_cache is None:
+            return self.__read_data(start, end)
+
+        if (start is not None or end is not None) and \
+                self.cache_key() in self.data_cache:
+            # all data is already cached, no need to read the window
+            data = self.data_cache.get(self.cache_key())
+            if data is not None:
+                return self.__in_window(data, start, end)
+
+        key = self.cache_key(start, end)
+        data = self.data_cache.get(key)
+        if data is None:
+            data = self.__read_data(start, end)
+            self.data_cache.put(key, data)
+
+        return data
 
+    def __read_data(self, start=None, end=None) -> pd.DataFrame:
+        # read data from file
         if not self.root.isopen:
             self.open()
 
@@ -715,12 +1476,84 @@ class DataFile(IsmnFile):
             raise NotImplementedError(
                 "Ceop (old) format is no longer supported")
         elif self.file_type == "ceop_sep":
-            return self.__read_format_ceop_sep()
+            data = self.__read_format_ceop_sep(start, end)
         elif self.file_type == "header_values":
-            return self.__read_format_header_values()
+            data = self.__read_format_header_values(start, end)
         else:
             raise IOError(f"Unknown file format found for: {self.file_path}")
 
+        # lines are selected by minute, time stamps can be more precise
+        data = self.__in_window(data, start, end)
+
+        if self.compact_dtypes:
+            data = self.__to_compact_dtypes(data)
+
+        return data
+
+    @staticmethod
+    def __in_window(data: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+        # select rows between start and end (included)
+        if (start is None) and (end is None):
+            return data
+        mask = np.ones(len(data.index), dtype=bool)
+        if start is not None:
+            mask &= data.index >= start
+        if end is not None:
+            mask &= data.index <= end
+        return data if mask.all() else data[mask]
+
+    def __empty_data(self, names, blocksize=2 ** 16) -> pd.DataFrame:
+        """
+        Data frame without rows, e.g. if there is no data in a time window.
+        The columns get the data types that the parsers return for the
+        first data lines of the file, so that they are the same as when the
+        file is read.
+        """
+        if self.file_type == "ceop_sep":
+            ncols, skiprows, kwargs = 15, 0, dict(usecols=[0, 1, 12, 13, 14])
+        else:
+            ncols, skiprows, kwargs = 5, 1, dict(
+                usecols=[0, 1, 2, 3, 4], sep=r'\s+', low_memory=False)
+        names = ["date", "time"] + list(names)
+
+        with self.root.open_member(self.file_path) as f:
+            head = f.read(blocksize)
+        content = head[self.__skip_lines(head, skiprows):]
+        if len(head) == blocksize:  # the last line can be incomplete
+            content = content[:max(content.rfind(b"\n"),
+                                   content.rfind(b"\r")) + 1]
+
+        if not content.strip():  # file without data
+            data = pd.DataFrame(
+                {names[2]: np.array([], dtype=np.float64),
+                 names[3]: np.array([], dtype=object),
+                 names[4]: np.array([], dtype=object)},
+                index=pd.DatetimeIndex([], name="date_time"))
+        else:
+            data = self.__read_fast(content, names, ncols)
+            if data is None:
+                data = self.__read_csv(content, names, **kwargs)
+            data = data.iloc[:0]
+
+        if self.compact_dtypes:
+            data = self.__to_compact_dtypes(data)
+            for c in data.columns:  # no rows, no flags
+                if isinstance(data[c].dtype, pd.CategoricalDtype):
+                    data[c] = data[c].cat.remove_unused_categories()
+        return data
+
+    @staticmethod
+    def __to_compact_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+        # float32 values and categorical flags
+        dtypes = {}
+        for c in data.columns:
+            if data[c].dtype == np.float64:
+                dtypes[c] = np.float32
+            elif pd.api.types.is_string_dtype(data[c].dtype):
+                dtypes[c] = "category"
+
+        return data.astype(dtypes) if len(dtypes) > 0 else data
+
     def read_metadata(self, best_meta_for_sensor=True) -> MetaData:
         """
         Read metadata from file name and first line of file.
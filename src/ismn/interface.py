@@ -34,8 +34,10 @@ from collections.abc import Iterable
 from typing import Union
 import warnings
 
-from ismn.components import NetworkCollection, Network
+from ismn.components import NetworkCollection, Network, LazyNetworks
 from ismn.filecollection import IsmnFileCollection
+from ismn.filehandlers import DataCache
+from ismn.store import TimeSeriesStore
 from ismn.meta import Depth
 from ismn.base import IsmnRoot
 from ismn.const import (
@@ -92,6 +94,13 @@ class ISMN_Interface:
         Keep data for a file in memory once it is loaded. This makes subsequent
         calls of data faster (if e.g. a station is accessed multiple times)
         but can fill up memory if multiple networks are loaded.
+        Deprecated, use `cache_size` instead (keep_loaded_data=True is the
+        same as a cache without size limit).
+    cache_size : int, optional (default: None)
+        Maximum memory (in bytes) for time series that are kept after loading
+        them. All sensors share this cache, when it is full the least
+        recently used time series are removed. Statistics can be found in
+        :attr:`.ISMN_Interface.data_cache`. By default, no data is kept.
     custom_meta_reader: tuple, optional (default: None)
         Additional readers to collect station/sensor metadata
         from external sources e.g. csv files.
@@ -99,6 +108,44 @@ class ISMN_Interface:
     force_metadata_collection: bool, optional (default: False)
         If true, will run metadata collection and replace any existing metadata
         that would otherwise be re-used.
+    meta_format: str, optional (default: 'csv')
+        Format of the python metadata file in meta_path, one of:
+            - csv : Text file, can be opened in other programs
+            - parquet : Binary, columnar file that preserves the data types
+              and loads much faster for large archives. Requires the
+              optional dependency `pyarrow`.
+    lazy: bool, optional (default: False)
+        Only create the Networks (with Stations and Sensors) in
+        :attr:`.ISMN_Interface.collection` and the station grid when they
+        are accessed for the first time. This speeds up the setup for large
+        archives when data is mainly accessed via the index in
+        :attr:`.ISMN_Interface.metadata` (e.g. with
+        :func:`ismn.interface.ISMN_Interface.read_ts`).
+    compact_dtypes: bool, optional (default: False)
+        Return time series with values as float32 and flags as pandas
+        categoricals (instead of float64 and str objects). This reduces the
+        memory of the data e.g. when many sensors are read with
+        :func:`ismn.interface.ISMN_Interface.read_ts`.
+    ts_store: str or Path or TimeSeriesStore, optional (default: None)
+        Time series store created with
+        :func:`ismn.interface.ISMN_Interface.create_ts_store`. If passed,
+        :func:`ismn.interface.ISMN_Interface.read_ts` reads the time series
+        of all files in the store from the memory mapped store instead of
+        parsing the data files. Files that are not in the store, or that
+        changed since they were stored, are still read from the archive
+        (with a warning). The store must be created again when the archive
+        is updated. To find changed files, all files of the archive are
+        checked once when the store is opened (for extracted archives this
+        is a stat of each file), see
+        :func:`ismn.store.TimeSeriesStore.validate`
+    incremental: bool, optional (default: False)
+        When metadata is collected (for the first time, or again with
+        force_metadata_collection), only read station folders where a file
+        was added, removed or changed since the last collection. Their
+        fingerprints are stored next to the metadata file
+        (`<name>_fingerprints.csv`). The metadata of all other stations is
+        taken from the existing metadata file, so this must only be used if
+        the same custom_meta_reader is passed as for the last collection.
 
     Raises
     ------
@@ -113,11 +160,24 @@ class ISMN_Interface:
         Contains all loaded networks with stations and sensors.
     keep_loaded_data : bool
         Switch to keep data in memory after loading (not recommended).
+    cache_size: int or None
+        See init
+    data_cache : DataCache or None
+        Cache for time series shared by all sensors
+        (if `cache_size` or `keep_loaded_data` are used).
     metadata : pandas.DataFrame
         Metadata for active networks, with idx that could also be passed
         to :func:`ismn.interface.read_metadata`
     meta_path: str
         See init
+    meta_format: str
+        See init
+    lazy: bool
+        See init
+    compact_dtypes: bool
+        See init
+    ts_store: TimeSeriesStore or None
+        Store that time series are read from, see init
     temp_root: str
         See init
     landcover : collections.OrderedDict
@@ -145,18 +205,49 @@ class ISMN_Interface:
             temp_root=gettempdir(),
             custom_meta_reader=None,
             force_metadata_collection=False,
+            meta_format="csv",
+            lazy=False,
+            cache_size=None,
+            compact_dtypes=False,
+            ts_store=None,
+            incremental=False,
     ):
+        if meta_format not in ["csv", "parquet"]:
+            raise ValueError(f"Unknown metadata format: {meta_format}. "
+                             f"Choose one of 'csv', 'parquet'.")
+
         self.climate, self.landcover = KOEPPENGEIGER, LANDCOVER
         self.parallel = parallel
 
         self.root = IsmnRoot(data_path)
 
         self.keep_loaded_data = keep_loaded_data
+        self.cache_size = cache_size
+
+        if keep_loaded_data:
+            warnings.warn(
+                "`keep_loaded_data` is deprecated and keeps all data in "
+                "memory, use `cache_size` to limit the memory instead.",
+                category=DeprecationWarning)
+
+        if (cache_size is not None) or keep_loaded_data:
+            self.data_cache = DataCache(max_bytes=cache_size)
+        else:
+            self.data_cache = None
 
         self.custom_meta_reader = custom_meta_reader
         self.force_metadata_collection = force_metadata_collection
+        self.incremental = incremental
 
         self.meta_path = meta_path
+        self.meta_format = meta_format
+        self.lazy = lazy
+        self.compact_dtypes = compact_dtypes
+        if ts_store is not None:
+            if not isinstance(ts_store, TimeSeriesStore):
+                ts_store = TimeSeriesStore(ts_store)
+            ts_store.validate(self.root)
+        self.ts_store = ts_store
         self.temp_root = temp_root
 
         self.activate_network(
@@ -174,41 +265,99 @@ class ISMN_Interface:
         Load (file) collection for specific file ids.
         """
 
-        meta_csv_filename = f"{self.root.name}.csv"
+        meta_filename = f"{self.root.name}.{self.meta_format}"
 
         if meta_path is None:
             meta_path = Path(self.root.root_dir) / "python_metadata"
         else:
             meta_path = Path(meta_path)
 
-        meta_csv_file = meta_path / meta_csv_filename
+        meta_file = meta_path / meta_filename
+        fingerprints_file = meta_path / f"{self.root.name}_fingerprints.csv"
+
+        if not os.path.isfile(meta_file) or self.force_metadata_collection:
+            previous = None
+            if self.incremental and os.path.isfile(meta_file) and \
+                    os.path.isfile(fingerprints_file):
+                # only read station dirs that changed since the last run
+                previous = self.__load_file_collection(meta_file)
+                previous.load_fingerprints_csv(fingerprints_file)
 
-        if not os.path.isfile(meta_csv_file) or self.force_metadata_collection:
             self.__file_collection = IsmnFileCollection.build_from_scratch(
                 self.root,
                 parallel=self.parallel,
                 log_path=meta_path,
                 temp_root=temp_root,
                 custom_meta_readers=self.custom_meta_reader,
+                previous=previous,
             )
-            self.__file_collection.to_metadata_csv(meta_csv_file)
-
-        self.__file_collection = IsmnFileCollection.from_metadata_csv(
-            self.root, meta_csv_file, network=network)
+            if self.meta_format == "parquet":
+                self.__file_collection.to_metadata_parquet(meta_file)
+            else:
+                self.__file_collection.to_metadata_csv(meta_file)
+            self.__file_collection.to_fingerprints_csv(fingerprints_file)
 
-        networks = self._collect()
-        self.collection = NetworkCollection(networks)
+        self.__file_collection = self.__load_file_collection(
+            meta_file, network=network)
 
         self.metadata = self.__file_collection.metadata_df.copy()
 
-    def _collect(self) -> list:
+        self.collection = self._build_collection()
+
+    def __load_file_collection(self, meta_file, network=None):
+        # set up the file collection from the stored metadata file
+        if self.meta_format == "parquet":
+            return IsmnFileCollection.from_metadata_parquet(
+                self.root, meta_file, network=network,
+                data_cache=self.data_cache,
+                compact_dtypes=self.compact_dtypes)
+        else:
+            return IsmnFileCollection.from_metadata_csv(
+                self.root, meta_file, network=network,
+                data_cache=self.data_cache,
+                compact_dtypes=self.compact_dtypes)
+
+    def _build_collection(self) -> NetworkCollection:
+        """
+        Create the collection of Networks for the filehandlers in the file
+        collection. In lazy mode, each Network is only created when it is
+        accessed and the grid is built from the station coordinates in the
+        metadata.
+        """
+        if not self.lazy:
+            return NetworkCollection(self._collect())
+
+        networks = LazyNetworks(
+            self.__file_collection.filelist.keys(),
+            lambda name: self._collect(network_names=[name])[0])
+
+        # one point per station, in the same order as in the networks
+        meta = self.metadata
+        nets, stats = meta["network"]["val"], meta["station"]["val"]
+        net_codes = pd.factorize(nets.values)[0]
+        first = np.flatnonzero(~pd.DataFrame(
+            {"net": nets.values, "stat": stats.values}).duplicated().values)
+        first = first[np.argsort(net_codes[first], kind="stable")]
+        coords = (meta["longitude"]["val"].values[first],
+                  meta["latitude"]["val"].values[first])
+        station_names = (nets.values[first], stats.values[first])
+
+        return NetworkCollection(networks, coords=coords,
+                                 station_names=station_names)
+
+    def _collect(self, network_names=None) -> list:
         """
         Build Networks and fill them with Stations and Sensors and apply
         according filehandlers from filelist for data reading.
+
+        Parameters
+        ----------
+        network_names : list, optional (default: None)
+            Only build these networks. By default, all networks are built.
         """
         networks = OrderedDict([])
 
-        for f in self.__file_collection.iter_filehandlers():  # network_names):
+        for f in self.__file_collection.iter_filehandlers(network_names):
             nw_name, st_name, instrument = (
                 f.metadata["network"].val,
                 f.metadata["station"].val,
@@ -233,7 +382,7 @@ class ISMN_Interface:
                 f.metadata["variable"].depth,
                 filehandler=f,  # todo: remove station meta from sensor
                 name=None,
-                keep_loaded_data=self.keep_loaded_data,
+                keep_loaded_data=False,  # data is kept in self.data_cache
             )
 
         return list(networks.values())
@@ -275,23 +424,35 @@ class ISMN_Interface:
             Another Interface, but only to the data of the selected ids
         """
 
+        # the subset shares the cache, no cache (and no deprecation warning
+        # for keep_loaded_data) is created for it
         subset = ISMN_Interface(
             data_path=self.root.path,
             meta_path=self.meta_path,
             network=[],
             parallel=False,
-            keep_loaded_data=self.keep_loaded_data,
+            keep_loaded_data=False,
             temp_root=self.temp_root,
             custom_meta_reader=self.custom_meta_reader,
+            meta_format=self.meta_format,
+            lazy=self.lazy,
+            cache_size=None,
+            compact_dtypes=self.compact_dtypes,
+            ts_store=self.ts_store,
         )
+        subset.keep_loaded_data = self.keep_loaded_data
+        subset.cache_size = self.cache_size
+        subset.data_cache = self.data_cache  # share cached data
         subset.__file_collection = IsmnFileCollection.from_metadata_df(
             self.root,
             metadata_df=self.metadata.loc[ids, :].copy(),
             temp_root=self.temp_root,
+            data_cache=subset.data_cache,
+            compact_dtypes=subset.compact_dtypes,
         )
         subset.metadata = subset.__file_collection.metadata_df.copy()
         subset.metadata.index = range(len(subset.metadata.index))
-        subset.collection = NetworkCollection(subset._collect())
+        subset.collection = subset._build_collection()
 
         return subset
 
@@ -426,6 +587,10 @@ class ISMN_Interface:
         filter_meta_dict=None,
         check_only_sensor_depth_from=False,
         groupby=None,
+        bbox=None,
+        polygon=None,
+        period=None,
+        cover_period=False,
     ):
         """
         Yield all sensors for a specific network and/or station and/or
@@ -450,34 +615,118 @@ class ISMN_Interface:
             the sensor is in the passed depth (e.g. for cosmic ray probes).
         groupby : str, optional (default: None)
             A metadata field name that is used to group sensors, e.g. network
+        bbox : tuple, optional (default: None)
+            (min_lon, min_lat, max_lon, max_lat), only sensors in this
+            bounding box are returned. If min_lon is larger than max_lon,
+            the box crosses the antimeridian.
+        polygon : list[tuple], optional (default: None)
+            (lon, lat) vertices of a polygon, e.g.
+            [(10, 45), (15, 45), (12, 50)], only sensors in this polygon
+            are returned. Can be combined with bbox.
+        period : tuple, optional (default: None)
+            (start, end) of a period, e.g. ('2015-01-01', '2020-12-31'), only
+            sensors whose time range (timerange_from, timerange_to) overlaps
+            with the period are returned. None means that the period is open
+            on this side. The sensors are found with an interval index over
+            the time ranges in the metadata, see
+            :class:`ismn.meta.TimeRangeIndex`.
+        cover_period : bool, optional (default: False)
+            Only return sensors whose time range contains the whole period.
+            A period that is open on one side is not contained in any time
+            range, i.e. no sensor is returned.
         """
-        if groupby is None:
-            ids = []
-        else:
-            ids = {}
-
         depth = Depth(min_depth, max_depth)
 
-        for id, filehandler in enumerate(
-                self.__file_collection.iter_filehandlers()):
-            eval = filehandler.check_metadata(
-                variable=variable,
-                allowed_depth=depth,
-                filter_meta_dict=filter_meta_dict,
-                check_only_sensor_depth_from=check_only_sensor_depth_from,
-            )
-
-            if eval:
-                if groupby is not None:
-                    groupval = filehandler.metadata[groupby].val
-                    if groupval not in ids.keys():
-                        ids[groupval] = []
-                    ids[groupval].append(id)
-                else:
-                    ids.append(id)
+        ids = self.__file_collection.filter_ids(
+            variable=variable,
+            allowed_depth=depth,
+            filter_meta_dict=filter_meta_dict,
+            check_only_sensor_depth_from=check_only_sensor_depth_from,
+            groupby=groupby,
+            bbox=bbox,
+            polygon=polygon,
+            period=period,
+            cover_period=cover_period,
+        )
 
         return ids
 
+    def aggregate_metadata(
+        self,
+        agg=None,
+        by=None,
+        variable=None,
+        min_depth=-np.inf,
+        max_depth=np.inf,
+        filter_meta_dict=None,
+        check_only_sensor_depth_from=False,
+        **filter_kwargs,
+    ):
+        """
+        Run a groupby / unique / min / max / count query over the metadata
+        of all sensors that match the passed conditions. The values are
+        aggregated on the columns of the metadata frame, without going
+        through Networks, Stations and Sensors.
+
+        e.g. count sensors per network and climate class for soil moisture
+        in 0-0.1 m:
+        >>> ds.aggregate_metadata(by=['network', 'climate_KG'],
+        ...                       variable='soil_moisture', min_depth=0,
+        ...                       max_depth=0.1)
+
+        or the number of stations and the period of each network:
+        >>> ds.aggregate_metadata({'station': 'nunique',
+        ...                        'timerange_from': 'min',
+        ...                        'timerange_to': 'max'}, by='network')
+
+        Parameters
+        ----------
+        agg : dict, optional (default: None)
+            Metadata variable names and the aggregation that is applied to
+            their values ('min', 'max', 'count', 'nunique', 'unique', 'first',
+            a function, or a list of them, see :func:`pandas.DataFrame.agg`).
+            If None is passed, the sensors are counted.
+        by : str or list[str], optional (default: None)
+            Metadata variable name(s) to group the sensors by, e.g. 'network'
+            or ['network', 'climate_KG']. If None is passed, all sensors are
+            aggregated together.
+        variable : str or list[str], optional (default: None)
+            Only use sensors that measure this/these variable(s), None to
+            allow all variables.
+        min_depth : float, optional (default: -np.inf)
+            Min depth of sensors to use.
+        max_depth : float, optional (default: np.inf)
+            Max depth of sensors to use.
+        filter_meta_dict: dict, optional (default: None)
+            Additional metadata keys and values that the sensors must have,
+            see :func:`ismn.interface.ISMN_Interface.get_dataset_ids`
+        check_only_sensor_depth_from : bool, optional (default: False)
+            Ignores the sensors depth_to value and only checks if depth_from of
+            the sensor is in the passed depth (e.g. for cosmic ray probes).
+
+        Other Parameters
+        ----------------
+        filter_kwargs :
+            bbox, polygon, period, cover_period, see
+            :func:`ismn.interface.ISMN_Interface.get_dataset_ids`
+
+        Returns
+        -------
+        result : pd.DataFrame or pd.Series or int
+            Aggregated values for each group (index: group values). Without
+            agg, the number of sensors in each group (or in total, if by is
+            None).
+        """
+        return self.__file_collection.aggregate_metadata(
+            agg=agg,
+            by=by,
+            variable=variable,
+            allowed_depth=Depth(min_depth, max_depth),
+            filter_meta_dict=filter_meta_dict,
+            check_only_sensor_depth_from=check_only_sensor_depth_from,
+            **filter_kwargs,
+        )
+
     def read_metadata(self, idx, format="pandas"):
         """
         Read only metadata by id as pd.DataFrame.
@@ -520,8 +769,8 @@ class ISMN_Interface:
                 )
 
             dfs = []
-            for i in idx:
-                filehandler = self.__file_collection.get_filehandler(i)
+            filehandlers = self.__file_collection.get_filehandlers(idx)
+            for i, filehandler in zip(idx, filehandlers):
                 if len(idx) == 1:
                     return filehandler.metadata.to_pd()
                 else:
@@ -532,7 +781,8 @@ class ISMN_Interface:
 
             return pd.concat(dfs, axis=0).dropna(axis=1, how="all")
 
-    def read_ts(self, idx, return_meta=False):
+    def read_ts(self, idx, return_meta=False, n_workers=1,
+                backend="threading", start=None, end=None):
         """
         Read a time series directly by the filehandler id.
 
@@ -543,6 +793,19 @@ class ISMN_Interface:
             by :func:`ismn.interface.ISMN_Interface.get_dataset_ids`
         return_meta : bool, optional (default: False)
             Also return the metadata for this sensor (as a second return value)
+        n_workers : int, optional (default: 1)
+            If multiple indices are passed, read this many files at the same
+            time.
+        backend : str, optional (default: 'threading')
+            Parallel backend when n_workers > 1, either 'threading' or
+            'multiprocessing', see
+            :func:`ismn.filecollection.IsmnFileCollection.read_data`
+        start : str or datetime, optional (default: None)
+            Only read data from this time stamp on. Lines before are skipped
+            while reading the files, files that end before are not read.
+        end : str or datetime, optional (default: None)
+            Only read data until this time stamp (included). Reading a file
+            stops after it, files that start after it are not read.
 
         Returns
         -------
@@ -557,33 +820,87 @@ class ISMN_Interface:
         """
         if not isinstance(idx, Iterable):
             filehandler = self.__file_collection.get_filehandler(idx)
+            data = self.__read_data([idx], start=start, end=end)[0]
             if return_meta:
-                return filehandler.read_data(), filehandler.metadata.to_pd()
+                return data, filehandler.metadata.to_pd()
             else:
-                return filehandler.read_data()
+                return data
         else:
-            data = []
-            metadata = []
-            for i in idx:
-                filehandler = self.__file_collection.get_filehandler(i)
-                d = filehandler.read_data()
-                d.columns = pd.MultiIndex.from_product(
-                    [[i], list(d.columns)], names=["idx", "variable"])
-                data.append(d)
-                if return_meta:
-                    m = filehandler.metadata.to_pd()
-                    m = pd.DataFrame(data={i: m})
-                    metadata.append(m)
+            idx = list(idx)
+            data = self.__read_data(idx, n_workers=n_workers, backend=backend,
+                                    start=start, end=end)
 
             # would it make more sense to concat along time dimension?
-            data = pd.concat(data, axis=1).sort_index()
+            data = pd.concat(data, axis=1, keys=idx, names=["idx", "variable"])
+            if not data.index.is_monotonic_increasing:
+                data = data.sort_index()
 
             if return_meta:
-                meta = pd.concat(metadata, axis=1)
+                filehandlers = self.__file_collection.get_filehandlers(idx)
+                meta = pd.concat(
+                    [pd.DataFrame(data={i: f.metadata.to_pd()})
+                     for i, f in zip(idx, filehandlers)], axis=1)
                 return data, meta
             else:
                 return data
 
+    def __read_data(self, ids, n_workers=1, backend="threading", start=None,
+                    end=None) -> list:
+        # read time series from the store if possible, otherwise from files
+        if self.ts_store is None:
+            return self.__file_collection.read_data(
+                ids, n_workers=n_workers, backend=backend, start=start,
+                end=end)
+
+        filehandlers = self.__file_collection.get_filehandlers(ids)
+        pos = self.ts_store.positions([f.file_path for f in filehandlers])
+        data = [None] * len(ids)
+        for i in np.flatnonzero(pos >= 0):
+            data[i] = self.ts_store.read(
+                pos[i], compact_dtypes=self.compact_dtypes, start=start,
+                end=end)
+
+        missing = np.flatnonzero(pos < 0)
+        if len(missing) > 0:
+            files_data = self.__file_collection.read_data(
+                [ids[i] for i in missing], n_workers=n_workers,
+                backend=backend, start=start, end=end)
+            for i, d in zip(missing, files_data):
+                data[i] = d
+
+        return data
+
+    def create_ts_store(self, path, ids=None, n_workers=1,
+                        backend="threading") -> TimeSeriesStore:
+        """
+        Convert the time series of the active networks into a binary,
+        columnar store, from which they can be read much faster than from
+        the text files. Pass the store path to `ISMN_Interface(ts_store=...)`
+        to use it in :func:`ismn.interface.ISMN_Interface.read_ts`.
+
+        Parameters
+        ----------
+        path : str or Path
+            Directory where the store is created. An existing store there
+            is replaced.
+        ids : list[int], optional (default: None)
+            Ids in :attr:`.ISMN_Interface.metadata` of the time series to
+            store. By default, all time series are stored.
+        n_workers : int, optional (default: 1)
+            Number of files that are read at the same time.
+        backend : str, optional (default: 'threading')
+            Parallel backend when n_workers > 1, either 'threading' or
+            'multiprocessing'.
+
+        Returns
+        -------
+        store : TimeSeriesStore
+            The created store.
+        """
+        return TimeSeriesStore.create(
+            path, self.__file_collection, ids=ids, n_workers=n_workers,
+            backend=backend)
+
     def read(self, *args, **kwargs):
         # alias of :func:`ismn.interface.ISMN_Interface.read_ts`
         return self.read_ts(*args, **kwargs)
@@ -632,6 +949,102 @@ class ISMN_Interface:
         else:
             return stat
 
+    def find_nearest_stations(self, lons, lats, k=1, max_dist=np.inf):
+        """
+        Find the k nearest stations for many coordinates in one call,
+        see :func:`ismn.components.NetworkCollection.get_nearest_stations`
+
+        Parameters
+        ----------
+        lons : np.ndarray
+            Longitudes of the points
+        lats : np.ndarray
+            Latitudes of the points
+        k : int, optional (default: 1)
+            Number of stations to find for each point.
+        max_dist : float, optional (default: np.inf)
+            Maximum distance (in meters) allowed.
+
+        Returns
+        -------
+        stations : np.ndarray
+            Nearest stations for each point, shape (n,) for k=1 or (n, k).
+            None where no station is within max_dist.
+        distance : np.ndarray
+            Distance to the stations in meters (inf if none was found).
+        """
+        return self.collection.get_nearest_stations(
+            lons, lats, k=k, max_dist=max_dist)
+
+    def stations_within(self, lons, lats, radius, **filter_kwargs):
+        """
+        Find the ids of all sensors within a radius around many points at
+        once (e.g. all cells of a global grid), see
+        :func:`ismn.components.NetworkCollection.stations_within`.
+        The result is returned in compressed sparse row format, i.e. the
+        sensors around point i are ids[offsets[i]:offsets[i+1]] (sorted by
+        distance).
+
+        Parameters
+        ----------
+        lons : np.ndarray
+            Longitudes of the points
+        lats : np.ndarray
+            Latitudes of the points
+        radius : float
+            Search radius in meters.
+
+        Other Parameters
+        ----------------
+        filter_kwargs :
+            Only sensors that comply with these conditions are returned, see
+            :func:`ismn.components.Sensor.eval` (variable, depth,
+            filter_meta_dict, check_only_sensor_depth_from). They are
+            evaluated for all sensors at once, like in
+            :func:`ismn.interface.ISMN_Interface.get_dataset_ids`
+
+        Returns
+        -------
+        offsets : np.ndarray
+            Start of the sensors of each point in ids and dist, and the end
+            of the last one (length: number of points + 1).
+        ids : np.ndarray
+            Dataset ids of the sensors around all points.
+        dist : np.ndarray
+            Distance in meters between each point and sensor.
+        """
+        depth = filter_kwargs.pop("depth", None)
+        if isinstance(depth, (list, tuple)):
+            depth = Depth(depth[0], depth[1])
+        ids = np.array(self.__file_collection.filter_ids(
+            allowed_depth=depth, **filter_kwargs), dtype=np.int64)
+
+        # dataset ids at each station, sorted by gpi
+        meta = self.__file_collection.metadata_df
+        rows = self.__file_collection._metadata_rows()[ids]
+        id_gpis = self.collection.gpis4stations(
+            meta["network"]["val"].values[rows],
+            meta["station"]["val"].values[rows])
+        order = np.argsort(id_gpis, kind="stable")
+        ids, id_gpis = ids[order], id_gpis[order]
+        n_gpi = 0 if self.grid is None else self.grid.n_gpi
+        gpi_start = np.searchsorted(id_gpis, np.arange(n_gpi))
+        gpi_count = np.searchsorted(id_gpis, np.arange(n_gpi),
+                                    side="right") - gpi_start
+
+        offsets, gpis, dist = self.collection.stations_within(
+            lons, lats, radius)
+
+        # one entry for each sensor at the stations around each point
+        count = gpi_count[gpis]
+        station = np.repeat(np.arange(len(gpis)), count)
+        first = np.cumsum(count) - count
+        pos = gpi_start[gpis][station] + np.arange(len(station)) - \
+            first[station]
+        offsets = np.concatenate([[0], np.cumsum(count)])[offsets]
+
+        return offsets, ids[pos], dist[station]
+
     def plot_station_locations(
         self,
         variable=None,
@@ -735,38 +1148,38 @@ class ISMN_Interface:
         all_networks = list(self.networks.keys())
         colorsteps = np.arange(0, 1, 1 / float(len(all_networks)))
 
-        rect = []
-        act_networks = []
-        act_stations = []
-
-        iterator = self.collection.iter_sensors(
+        # location and number of valid sensors of each station
+        stations = self.aggregate_metadata(
+            {"longitude": "first", "latitude": "first", "variable": "count"},
+            by=["network", "station"],
             variable=variable,
-            depth=Depth(min_depth, max_depth),
-            filter_meta_dict=None,
+            min_depth=min_depth,
+            max_depth=max_depth,
             check_only_sensor_depth_from=check_only_sensor_depth_from,
         )
+        n_sens = int(stations["variable"].sum())
+        n_stations = len(stations.index)
 
-        n_sens = 0
-        for nw, stat, sens in iterator:
-            netcolor = colormap(colorsteps[all_networks.index(nw.name)])
-            if nw.name not in act_networks:
-                act_networks.append(nw.name)
-                rect.append(Rectangle((0, 0), 1, 1, fc=netcolor))
-
-            if stat.name not in act_stations:
-                act_stations.append(stat.name)
-                ax.scatter(
-                    stat.lon,
-                    stat.lat,
-                    color=netcolor,
-                    s=markersize,
-                    linewidth=0.5,
-                    marker="s",
-                    transform=data_crs,
-                    edgecolors="black" if markeroutline else None,
-                    zorder=2,
-                )
-            n_sens += 1
+        rect = []
+        act_networks = [
+            nw for nw in all_networks
+            if nw in stations.index.get_level_values(0)
+        ]
+        for nw in act_networks:
+            netcolor = colormap(colorsteps[all_networks.index(nw)])
+            rect.append(Rectangle((0, 0), 1, 1, fc=netcolor))
+            net_stations = stations.loc[nw]
+            ax.scatter(
+                net_stations["longitude"].values,
+                net_stations["latitude"].values,
+                color=netcolor,
+                s=markersize,
+                linewidth=0.5,
+                marker="s",
+                transform=data_crs,
+                edgecolors="black" if markeroutline else None,
+                zorder=2,
+            )
 
         if extent is not None:
             ax.set_extent(extent, crs=data_crs)
@@ -798,7 +1211,7 @@ class ISMN_Interface:
                          if check_only_sensor_depth_from else "")
         depth_text = f"between {min_depth} and {max_depth} m \n {postfix_depth}"
         feedback = (
-            f"{n_sens} valid sensors in {len(act_stations)} stations "
+            f"{n_sens} valid sensors in {n_stations} stations "
             f"in {len(act_networks)} networks (of {len(all_networks)} potential networks) \n"
             f"for {f'variable {variable}' if variable is not None else 'all variables'} "
             f"{depth_text}")
@@ -826,7 +1239,7 @@ class ISMN_Interface:
                 dpi=dpi,
             )
         else:
-            counts = (len(act_networks), len(act_stations), n_sens)
+            counts = (len(act_networks), n_stations, n_sens)
             return fig, ax, counts
 
     def get_min_max_obs_timestamps(
@@ -873,28 +1286,17 @@ class ISMN_Interface:
             Latest time stamp found in all sensors that fulfill the passed
             requirements.
         """
-        t_min = None
-        t_max = None
-
-        for net, stat, sens in self.collection.iter_sensors(
-                variable=variable,
-                depth=Depth(min_depth, max_depth),
-                filter_meta_dict=filter_meta_dict,
-        ):
-            time_from = pd.Timestamp(sens.metadata["timerange_from"].val)
-            time_to = pd.Timestamp(sens.metadata["timerange_to"].val)
-
-            if t_min is None:
-                t_min = time_from
-            if t_max is None:
-                t_max = time_to
-            if time_from < t_min:
-                t_min = time_from
-            if time_to > t_max:
-                t_max = time_to
-
-        t_min = t_min.to_pydatetime() if t_min is not None else None
-        t_max = t_max.to_pydatetime() if t_max is not None else None
+        t = self.aggregate_metadata(
+            {"timerange_from": "min", "timerange_to": "max"},
+            variable=variable,
+            min_depth=min_depth,
+            max_depth=max_depth,
+            filter_meta_dict=filter_meta_dict,
+        )
+
+        t_min, t_max = (
+            None if pd.isnull(v) else pd.Timestamp(v).to_pydatetime()
+            for v in (t["timerange_from"], t["timerange_to"]))
 
         return t_min, t_max
 
@@ -941,18 +1343,15 @@ class ISMN_Interface:
                 f"{static_var_name} is not in the list of supported variables."
                 f"Choose one of {list(CSV_META_TEMPLATE_SURF_VAR.keys())}")
 
-        vals = []
-        for net in self.networks.values():
-            for sta in net.stations.values():
-                for sen in sta.sensors.values():
-                    if sen.eval(
-                            variable=variable,
-                            depth=Depth(min_depth, max_depth)):
-                        vals.append(
-                            sen.filehandler.metadata[static_var_name].val)
+        vals = self.aggregate_metadata(
+            by=static_var_name,
+            variable=variable,
+            min_depth=min_depth,
+            max_depth=max_depth,
+        ).index.values
 
         val_dict = {}
-        for val in np.unique(np.array(vals)):
+        for val in vals:
             if val in self.climate.keys():
                 val_dict[val] = self.climate[val]
             elif val in self.landcover.values():
@@ -992,13 +1391,7 @@ class ISMN_Interface:
         """
         get a list of variables available in the data
         """
-        all_vars = np.array([])
-        for _, station in self.collection.iter_stations():
-            stat_vars = station.get_variables()
-            if not all(np.isin(stat_vars, all_vars)):
-                all_vars = np.union1d(stat_vars, all_vars)
-
-        return all_vars
+        return self.aggregate_metadata(by="variable").index.to_numpy(dtype=str)
 
     def print_landcover_dict(self) -> None:
         """
@@ -47,6 +47,8 @@ class Depth:
         Depth range across surface layer
     """
 
+    __slots__ = ("start", "end", "extent")
+
     def __init__(self, start, end):
         """
         Parameters
@@ -239,6 +241,50 @@ class Depth:
 
         return flag
 
+    def encloses_arrays(self, starts, ends) -> np.ndarray:
+        """
+        Vectorized version of :func:`ismn.meta.Depth.encloses` to test
+        if this Depth encloses multiple other depths at once.
+
+        Parameters
+        ----------
+        starts : np.ndarray
+            Start values of the other depths.
+        ends : np.ndarray
+            End values of the other depths.
+
+        Returns
+        -------
+        flags : np.ndarray
+            True where the other depth is surrounded by given depth.
+            False where the other depth is not, or where start / end is NaN.
+        """
+        starts = np.asarray(starts, dtype=float)
+        ends = np.asarray(ends, dtype=float)
+
+        # same shifting to positive depths as in __temp_pos_depths
+        shift = np.minimum(np.minimum(self.end, ends),
+                           np.minimum(self.start, starts))
+        with np.errstate(invalid="ignore"):
+            shifted = np.isfinite(shift) & (shift < 0)
+            other_flip = shifted & ((starts < 0) | (ends < 0)) & \
+                ~((starts * ends) < 0)
+
+        shift = np.where(shifted, shift, 0.)
+
+        if ((self.start < 0) or (self.end < 0)) and (not self.across0):
+            s1 = np.where(shifted, self.end - shift, self.start)
+            e1 = np.where(shifted, self.start - shift, self.end)
+        else:
+            s1 = np.where(shifted, self.start - shift, self.start)
+            e1 = np.where(shifted, self.end - shift, self.end)
+
+        s2 = np.where(other_flip, ends, starts) - shift
+        e2 = np.where(other_flip, starts, ends) - shift
+
+        with np.errstate(invalid="ignore"):
+            return (s1 <= s2) & (e1 >= e2)
+
     def enclosed(self, other):
         """
         Test if other Depth encloses this Depth.
@@ -264,12 +310,275 @@ class Depth:
         return flag
 
 
+def in_bbox(lons, lats, bbox) -> np.ndarray:
+    """
+    Test which points are within a bounding box (borders included).
+
+    Parameters
+    ----------
+    lons : np.ndarray
+        Longitudes of the points.
+    lats : np.ndarray
+        Latitudes of the points.
+    bbox : tuple
+        (min_lon, min_lat, max_lon, max_lat) of the box. If min_lon is
+        larger than max_lon, the box crosses the antimeridian.
+
+    Returns
+    -------
+    flags : np.ndarray
+        True where the point is in the box, False where it is not or where
+        a coordinate is NaN.
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    min_lon, min_lat, max_lon, max_lat = bbox
+
+    with np.errstate(invalid="ignore"):
+        flags = (lats >= min_lat) & (lats <= max_lat)
+        if min_lon <= max_lon:
+            flags &= (lons >= min_lon) & (lons <= max_lon)
+        else:
+            flags &= (lons >= min_lon) | (lons <= max_lon)
+
+    return flags
+
+
+def in_polygon(lons, lats, polygon) -> np.ndarray:
+    """
+    Test which points are within a polygon (even-odd rule). Only points
+    in the bounding box of the polygon are tested against its edges.
+
+    Parameters
+    ----------
+    lons : np.ndarray
+        Longitudes of the points.
+    lats : np.ndarray
+        Latitudes of the points.
+    polygon : list[tuple]
+        (lon, lat) of the polygon vertices, at least 3. The polygon is
+        closed automatically.
+
+    Returns
+    -------
+    flags : np.ndarray
+        True where the point is in the polygon, False where it is not or
+        where a coordinate is NaN.
+    """
+    vertices = np.asarray(polygon, dtype=float)
+    if (vertices.ndim != 2) or (vertices.shape[1] != 2) or \
+            (len(vertices) < 3):
+        raise ValueError(
+            "A polygon needs at least 3 vertices as (lon, lat) pairs.")
+
+    lons = np.asarray(lons, dtype=float)
+    vx, vy = vertices[:, 0], vertices[:, 1]
+
+    flags = in_bbox(lons, lats, (vx.min(), vy.min(), vx.max(), vy.max()))
+    candidates = np.flatnonzero(flags)
+    x = lons[candidates]
+    y = np.asarray(lats, dtype=float)[candidates]
+
+    inside = np.full(len(candidates), False)
+    for x0, y0, x1, y1 in zip(vx, vy, np.roll(vx, -1), np.roll(vy, -1)):
+        if y0 == y1:  # horizontal edges are never crossed
+            continue
+        crosses = (y0 > y) != (y1 > y)
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (x < x_cross)
+
+    flags[candidates] = inside
+
+    return flags
+
+
+_NAT = np.iinfo(np.int64).min  # NaT as int64 nanoseconds
+_MAX_NS = np.iinfo(np.int64).max
+
+
+def _as_ns(times) -> np.ndarray:
+    # time stamps as int64 nanoseconds, NaT is _NAT
+    return np.asarray(pd.to_datetime(np.asarray(times)),
+                      dtype="datetime64[ns]").view(np.int64)
+
+
+def _period_bounds(period) -> tuple:
+    """
+    Start and end of the period as int64 nanoseconds. Open sides (None)
+    are replaced by values that don't restrict the overlapping ranges.
+    """
+    start, end = period
+    a = _NAT if start is None else pd.Timestamp(start).value
+    b = _MAX_NS if end is None else pd.Timestamp(end).value
+    return a, b
+
+
+def in_period(starts, ends, period, cover=False) -> np.ndarray:
+    """
+    Test which time ranges overlap with (or cover) a period.
+
+    Parameters
+    ----------
+    starts : np.ndarray
+        First time stamp of each range (e.g. timerange_from).
+    ends : np.ndarray
+        Last time stamp of each range (e.g. timerange_to).
+    period : tuple
+        (start, end) of the period, as str or datetime. None means that the
+        period is open on this side.
+    cover : bool, optional (default: False)
+        If True, the ranges must contain the whole period, otherwise
+        they must overlap with it. No (finite) range contains a period that
+        is open on one side.
+
+    Returns
+    -------
+    flags : np.ndarray
+        True where the range overlaps with / covers the period, False where
+        it does not or where start / end is missing.
+    """
+    starts, ends = _as_ns(starts), _as_ns(ends)
+    valid = (starts != _NAT) & (ends != _NAT)
+    if cover and (None in period):
+        return np.full(len(valid), False)
+    a, b = _period_bounds(period)
+    if cover:
+        return valid & (starts <= a) & (ends >= b)
+    else:
+        return valid & (starts <= b) & (ends >= a)
+
+
+class TimeRangeIndex:
+    """
+    Interval tree over many time ranges (e.g. timerange_from / timerange_to
+    of all sensors) to find the ranges that overlap with or cover a period
+    in O(log n + k) instead of comparing all of them.
+
+    Each node keeps the ranges that contain the median of the start and end
+    points of its ranges, sorted by start and by end. Ranges that end before
+    the median go to the left child, ranges that start after it to the right
+    child. Nodes with at most leaf_size ranges are not split further.
+
+    Attributes
+    ----------
+    starts : np.ndarray
+        Start of each range, as int64 nanoseconds.
+    ends : np.ndarray
+        End of each range, as int64 nanoseconds.
+    """
+
+    __slots__ = ("starts", "ends", "__root")
+
+    def __init__(self, starts, ends, leaf_size=64):
+        """
+        Parameters
+        ----------
+        starts : np.ndarray
+            First time stamp of each range.
+        ends : np.ndarray
+            Last time stamp of each range. Ranges where start or end is
+            missing are not in the index.
+        leaf_size : int, optional (default: 64)
+            Nodes with at most this many ranges are leaves.
+        """
+        self.starts = _as_ns(starts)
+        self.ends = _as_ns(ends)
+        ids = np.flatnonzero((self.starts != _NAT) & (self.ends != _NAT))
+        self.__root = self.__build(ids, leaf_size)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __build(self, ids, leaf_size) -> tuple:
+        # nodes are (None, ids) for leaves and (center, ids by start,
+        # sorted starts, ids by end, sorted ends, left, right) otherwise
+        if len(ids) <= leaf_size:
+            return None, ids
+
+        starts, ends = self.starts[ids], self.ends[ids]
+        points = np.concatenate([starts, ends])
+        center = np.partition(points, len(ids))[len(ids)]
+
+        left = ends < center
+        right = starts > center
+        here = ~(left | right)
+
+        by_start = ids[here][np.argsort(starts[here], kind="stable")]
+        by_end = ids[here][np.argsort(ends[here], kind="stable")]
+
+        return (center, by_start, self.starts[by_start], by_end,
+                self.ends[by_end], self.__build(ids[left], leaf_size),
+                self.__build(ids[right], leaf_size))
+
+    def overlapping(self, start=None, end=None) -> np.ndarray:
+        """
+        Find all ranges that overlap with a period.
+
+        Parameters
+        ----------
+        start, end : str or datetime, optional (default: None)
+            First and last time stamp of the period. None means that the
+            period is open on this side.
+
+        Returns
+        -------
+        ids : np.ndarray
+            Sorted positions of the ranges that overlap with the period.
+        """
+        a, b = _period_bounds((start, end))
+        found = []
+        nodes = [self.__root]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            if node[0] is None:
+                ids = node[1]
+                found.append(
+                    ids[(self.starts[ids] <= b) & (self.ends[ids] >= a)])
+                continue
+            center, by_start, starts, by_end, ends, left, right = node
+            # all ranges in the node contain the center
+            if b < center:
+                found.append(
+                    by_start[:np.searchsorted(starts, b, side="right")])
+                nodes.append(left)
+            elif a > center:
+                found.append(by_end[np.searchsorted(ends, a, side="left"):])
+                nodes.append(right)
+            else:
+                found.append(by_start)
+                nodes += [left, right]
+
+        return np.sort(np.concatenate(found))
+
+    def covering(self, start=None, end=None) -> np.ndarray:
+        """
+        Find all ranges that contain a whole period.
+
+        Parameters
+        ----------
+        start, end : str or datetime, optional (default: None)
+            First and last time stamp of the period. None means that the
+            period is open on this side, which no range contains.
+
+        Returns
+        -------
+        ids : np.ndarray
+            Sorted positions of the ranges that contain the period.
+        """
+        if (start is None) or (end is None):
+            return np.array([], dtype=np.intp)
+        ids = self.overlapping(start, start)
+        return ids[self.ends[ids] >= pd.Timestamp(end).value]
+
+
 class MetaVar:
     """
     MetaVar is a simple combination of a name, a value
     and a depth range (optional).
     """
 
+    __slots__ = ("name", "val", "depth")
+
     def __init__(self, name: str, val: Any, depth: Depth = None):
         """
         A named value that can be representative of a depth range.
@@ -352,8 +661,13 @@ class MetaData:
     """
     MetaData contains multiple MetaVars as a list (there can be multiple
     vars with the same name, e.g. for different depths)
+    MetaVars are additionally indexed by their name for fast lookups. Use
+    the methods of this class (or assign a new list) to change the
+    MetaVars, so that the index stays in sync with the list.
     """
 
+    __slots__ = ("__metadata", "__index")
+
     def __init__(self, vars: List[MetaVar] = None):
         """
         Parameters
@@ -367,6 +681,33 @@ class MetaData:
         else:
             self.metadata = vars
 
+    @property
+    def metadata(self) -> List[MetaVar]:
+        # all MetaVars, in order
+        return self.__metadata
+
+    @metadata.setter
+    def metadata(self, vars: Union[List[MetaVar], "MetaData"]):
+        self.__metadata = list(vars)
+        # name -> MetaVar, or list of MetaVars if the name is not unique
+        self.__index = {}
+        for var in self.__metadata:
+            self.__index_var(var)
+
+    def __index_var(self, var: MetaVar):
+        other = self.__index.get(var.name, None)
+        if other is None:
+            self.__index[var.name] = var
+        elif isinstance(other, list):
+            other.append(var)
+        else:
+            self.__index[var.name] = [other, var]
+
+    def __vars_for_name(self, name) -> List[MetaVar]:
+        # all MetaVars of the passed name from the index
+        vars = self.__index.get(name, [])
+        return vars if isinstance(vars, list) else [vars]
+
     def __iter__(self):
         for var in self.metadata:
             yield var
@@ -384,7 +725,7 @@ class MetaData:
             if isinstance(item, int):
                 return self.metadata[item]
             else:
-                items = [v for v in self.metadata if v.name == item]
+                items = self.__vars_for_name(item)
                 if len(items) == 0:
                     return None
                 elif len(items) == 1:
@@ -392,16 +733,17 @@ class MetaData:
                 else:
                     return MetaData(items)
         else:
+            item = set(item)
             items = [v for v in self.metadata if v.name in item]
             return MetaData(items)
 
     def __contains__(self, item: Union[MetaVar, str]):
         if isinstance(item, MetaVar):
-            for var in self.metadata:
+            for var in self.__vars_for_name(item.name):
                 if var == item:
                     return True
         else:
-            if item in self.keys():
+            if item in self.__index:
                 return True
         return False
 
@@ -474,15 +816,10 @@ class MetaData:
         args = ["val", "depth_from", "depth_to"]
 
         var_names, values = [], []
-        for var_name in np.unique(self.keys()):
-            var = self[var_name]
-            if isinstance(var, MetaVar):
-                values.append(tuple(var)[1:])
+        for var_name in sorted(self.__index.keys()):
+            for v in self.__vars_for_name(var_name):
+                values.append(tuple(v)[1:])
                 var_names.append(var_name)
-            else:
-                for v in var:
-                    values.append(tuple(v)[1:])
-                    var_names.append(var_name)
 
         values = list(sum(values, ()))
 
@@ -547,7 +884,9 @@ class MetaData:
         depth : Depth, optional (default: None)
             A depth that is assigned to the variable.
         """
-        self.metadata.append(MetaVar(name, val, depth))
+        var = MetaVar(name, val, depth)
+        self.metadata.append(var)
+        self.__index_var(var)
 
     def replace(self, name, val, depth=None):
         """
@@ -563,9 +902,15 @@ class MetaData:
             New Depth of the variable.
         """
         Var = self.__getitem__(name)
-        if not Var is None:
-            self.metadata.remove(Var)
-            self.metadata.append(MetaVar(name, val, depth))
+        if isinstance(Var, MetaData):
+            raise ValueError(
+                f"There are multiple MetaVars with name '{name}'")
+        elif not Var is None:
+            # remove this exact object, not the first equal one
+            self.metadata.pop(
+                next(i for i, v in enumerate(self.metadata) if v is Var))
+            del self.__index[name]
+            self.add(name, val, depth)
         else:
             raise const.MetadataError(
                 "There is no MetaVar with name '{}'".format(name))
@@ -589,7 +934,7 @@ class MetaData:
             with the passed depth are excluded here!
         """
         best_vars = []
-        for varname in np.unique(self.keys()):
+        for varname in sorted(self.__index.keys()):
             var = self[varname]
             if isinstance(var, MetaData):
                 best_p = -np.inf
@@ -0,0 +1,415 @@
+# The MIT License (MIT)
+#
+# Copyright (c) 2021 TU Wien
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Module that converts the time series of an ISMN archive into a binary,
+columnar store, from which they can be read without parsing the text files
+again.
+
+A store is a directory with one flat binary file per column (time stamps,
+values, flags and original flags of all sensors one after another), that
+are memory mapped when reading, and a json file that contains the position
+of the time series of each data file in the columns and the fingerprint
+(see :func:`ismn.base.IsmnRoot.file_fingerprints`) of the file when it was
+stored.
+"""
+
+import os
+import json
+import warnings
+from pathlib import Path, PurePosixPath
+import numpy as np
+import pandas as pd
+
+from ismn.const import ismnlog
+
+STORE_VERSION = 1
+
+# data type of flag strings in data read from files (str for pandas >= 3)
+_FLAG_DTYPE = pd.Series(["flag"]).dtype
+
+
+class TimeSeriesStore(object):
+    """
+    Read access to a time series store created with
+    :func:`ismn.store.TimeSeriesStore.create`.
+    Time series are identified by the path of their data file in the archive,
+    so that the same store can be used for any network selection or subset
+    of the archive it was created from.
+
+    Attributes
+    ----------
+    path : Path
+        Directory of the store.
+    archive : str
+        Name of the archive that the store was created from.
+    file_paths : list[str]
+        Path (in the archive) of the data file of each time series.
+    fingerprints : list[str]
+        Fingerprint of each data file when it was stored.
+    offsets : np.ndarray
+        Start of each time series in the columns (and end of the last one).
+    """
+
+    _manifest = "store.json"
+    _columns = {"time": np.int64, "value": None,
+                "flag": np.int32, "orig_flag": np.int32}
+
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : str or Path
+            Directory of a store created with
+            :func:`ismn.store.TimeSeriesStore.create`.
+        """
+        self.path = Path(path)
+
+        if not os.path.isfile(self.path / self._manifest):
+            raise IOError(f"No time series store found at {self.path}")
+
+        with open(self.path / self._manifest, "r") as f:
+            manifest = json.load(f)
+
+        if manifest["version"] != STORE_VERSION:
+            raise IOError(f"Store version {manifest['version']} is not "
+                          f"supported, create the store again.")
+
+        self.archive = manifest["archive"]
+        self.file_paths = manifest["file_paths"]
+        self.fingerprints = manifest["fingerprints"]
+        self.offsets = np.load(self.path / "offsets.npy")
+
+        self.__columns = manifest["columns"]
+        self.__dtypes = manifest["dtypes"]
+        self.__value_dtype = np.dtype(manifest["value_dtype"])
+        # flags are stored as codes, -1 (missing) selects the last element
+        self.__categories = np.empty(len(manifest["categories"]) + 1,
+                                     dtype=object)
+        self.__categories[:-1] = manifest["categories"]
+        self.__categories[-1] = np.nan
+        self.__positions = {p: i for i, p in enumerate(self.file_paths)}
+        self.__validated = {}
+        self.__data = None
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__} for {len(self)} time series "
+                f"of {self.archive} at {self.path}")
+
+    @property
+    def value_dtype(self) -> np.dtype:
+        # data type that values are stored with
+        return self.__value_dtype
+
+    def __len__(self):
+        return len(self.file_paths)
+
+    def __contains__(self, file_path) -> bool:
+        return str(PurePosixPath(file_path)) in self.__positions
+
+    @property
+    def data(self) -> dict:
+        # memory mapped columns, opened on first access
+        if self.__data is None:
+            n = int(self.offsets[-1])
+            self.__data = {}
+            for col, dtype in self._columns.items():
+                dtype = self.__value_dtype if dtype is None else dtype
+                if n == 0:  # empty files can't be memory mapped
+                    self.__data[col] = np.empty(0, dtype=dtype)
+                else:
+                    self.__data[col] = np.memmap(
+                        self.path / f"{col}.bin", dtype=dtype, mode="r",
+                        shape=(n,))
+        return self.__data
+
+    def positions(self, file_paths) -> np.ndarray:
+        """
+        Find the position of time series in the store by the path of their
+        data file.
+
+        Parameters
+        ----------
+        file_paths : list
+            Paths of data files in the archive (network/station/filename).
+
+        Returns
+        -------
+        positions : np.ndarray
+            Position of each file in the store, -1 for files that are not
+            in the store.
+        """
+        return np.array([self.__positions.get(str(PurePosixPath(p)), -1)
+                         for p in file_paths], dtype=int)
+
+    def validate(self, root) -> list:
+        """
+        Compare the store to the archive that it is used with. Time series
+        of data files that changed (or are missing) in the archive since
+        they were stored are not read from the store anymore, i.e. they are
+        read from the files again.
+        The fingerprints of the archive are collected once per store and
+        archive (see :func:`ismn.base.IsmnRoot.file_fingerprints`). For zip
+        archives they are taken from the zip directory, for extracted
+        archives all files in the station folders are listed and stat'ed,
+        which can take a while for large archives on slow file systems.
+
+        Parameters
+        ----------
+        root : ismn.base.IsmnRoot
+            Archive that time series are read from.
+
+        Returns
+        -------
+        changed : list[str]
+            Paths of the stored files that changed in the archive.
+        """
+        if str(root.path) in self.__validated:
+            return self.__validated[str(root.path)]
+
+        if root.name != self.archive:
+            warnings.warn(f"Store at {self.path} was created from "
+                          f"{self.archive}, not from {root.name}.")
+
+        fingerprints = root.file_fingerprints()
+        changed = [p for p, fp in zip(self.file_paths, self.fingerprints)
+                   if fingerprints.get(p, None) != fp]
+
+        if len(changed) > 0:
+            warnings.warn(f"{len(changed)} file(s) changed since they were "
+                          f"stored in {self.path}, their time series are "
+                          f"read from the archive instead. Create the store "
+                          f"again to update it.")
+            for p in changed:
+                self.__positions.pop(p, None)
+
+        self.__validated[str(root.path)] = changed
+        return changed
+
+    def __flags(self, codes: np.ndarray, compact_dtypes: bool):
+        # convert flag codes into strings or a categorical
+        if not compact_dtypes:
+            return pd.array(self.__categories[codes], dtype=_FLAG_DTYPE)
+        # the same categories as for data read from the file
+        u, inv = np.unique(codes, return_inverse=True)
+        valid = u >= 0
+        cats = self.__categories[u[valid]]
+        order = np.argsort(cats)
+        new_codes = np.full(len(u), -1)
+        new_codes[np.flatnonzero(valid)[order]] = np.arange(len(cats))
+        return pd.Categorical.from_codes(
+            new_codes[inv], pd.Index(cats[order], dtype=_FLAG_DTYPE))
+
+    def __column(self, name: str, start: int, end: int, dtype: str,
+                 compact_dtypes: bool):
+        # read a column and convert it to the data type of the file data
+        vals = self.data[name][start:end]
+        if name == "value":
+            vals = np.array(vals, dtype=np.float64)
+        elif dtype == "object":
+            return self.__flags(vals, compact_dtypes)
+        else:  # numeric flags, stored as strings
+            vals = self.__categories[vals]
+
+        if dtype == "float64":
+            return vals.astype(np.float32 if compact_dtypes else np.float64)
+        else:
+            return vals.astype(dtype)
+
+    def read(self, pos: int, compact_dtypes: bool = False, start=None,
+             end=None) -> pd.DataFrame:
+        """
+        Read a time series from the store.
+
+        Parameters
+        ----------
+        pos : int
+            Position of the time series in the store,
+            see :func:`ismn.store.TimeSeriesStore.positions`
+        compact_dtypes : bool, optional (default: False)
+            Return values as float32 and flags as categoricals, see
+            :class:`ismn.filehandlers.DataFile`.
+        start, end : str or datetime, optional (default: None)
+            Only read data between these (included) time stamps.
+
+        Returns
+        -------
+        data : pd.DataFrame
+            Time series as returned by
+            :func:`ismn.filehandlers.DataFile.read_data`
+        """
+        if (not compact_dtypes) and (self.__value_dtype != np.float64):
+            warnings.warn(f"Values in {self.path} are stored as "
+                          f"{self.__value_dtype.name} and read with reduced "
+                          f"precision. Create the store without "
+                          f"`compact_dtypes` to read float64 values.")
+
+        first, last = int(self.offsets[pos]), int(self.offsets[pos + 1])
+        if (start is not None) or (end is not None):
+            # time stamps of a series are sorted, find the window
+            times = self.data["time"][first:last]
+            if start is not None:
+                first += int(np.searchsorted(
+                    times, pd.Timestamp(start).value, side="left"))
+            if end is not None:
+                last -= len(times) - int(np.searchsorted(
+                    times, pd.Timestamp(end).value, side="right"))
+            last = max(first, last)
+
+        index = pd.DatetimeIndex(
+            np.array(self.data["time"][first:last]).view("datetime64[ns]"),
+            name="date_time")
+
+        return pd.DataFrame(
+            {
+                name: self.__column(col, first, last, dtype, compact_dtypes)
+                for name, col, dtype in zip(
+                    self.__columns[pos], ["value", "flag", "orig_flag"],
+                    self.__dtypes[pos])
+            },
+            index=index)
+
+    def close(self):
+        # close the memory mapped columns
+        self.__data = None
+
+    @classmethod
+    def create(cls, path, file_collection, ids=None, batch_size=100,
+               n_workers=1, backend="threading"):
+        """
+        Read time series from the files of a file collection and write them
+        to a new store (existing stores in path are replaced).
+        Values are stored as float32 if the filehandlers use
+        `compact_dtypes`, otherwise as float64. Reading a float32 store
+        without `compact_dtypes` raises a warning, as the values don't have
+        the full precision of the files.
+        See also :func:`ismn.interface.ISMN_Interface.create_ts_store`
+
+        Parameters
+        ----------
+        path : str or Path
+            Directory where the store is created.
+        file_collection : ismn.filecollection.IsmnFileCollection
+            File collection to read the time series from.
+        ids : list[int], optional (default: None)
+            Ids of filehandlers in the collection to store. By default, all
+            time series are stored.
+        batch_size : int, optional (default: 100)
+            Number of time series that are read before they are written.
+        n_workers : int, optional (default: 1)
+            Number of files that are read in parallel,
+            see :func:`ismn.filecollection.IsmnFileCollection.read_data`
+        backend : str, optional (default: 'threading')
+            Parallel backend, either 'threading' or 'multiprocessing'.
+
+        Returns
+        -------
+        store : TimeSeriesStore
+            The created store.
+        """
+        path = Path(path)
+        os.makedirs(path, exist_ok=True)
+
+        if ids is None:
+            ids = range(sum(1 for _ in file_collection.iter_filehandlers()))
+        ids = list(ids)
+
+        compact = any(f.compact_dtypes for f in
+                      file_collection.get_filehandlers(ids[:1]))
+        value_dtype = np.float32 if compact else np.float64
+        dtypes = {col: value_dtype if dtype is None else dtype
+                  for col, dtype in cls._columns.items()}
+
+        # fingerprints of the files as they are read now, those of the
+        # collection can be older
+        fingerprints = file_collection.root.file_fingerprints()
+
+        categories = {}
+        file_paths, columns, col_dtypes, offsets = [], [], [], [0]
+
+        def base_dtype(dtype) -> str:
+            # data type of a column when it is read without compact_dtypes
+            if pd.api.types.is_string_dtype(dtype) or \
+                    isinstance(dtype, pd.CategoricalDtype):
+                return "object"
+            elif dtype.kind == "f":
+                return "float64"
+            else:
+                return dtype.name
+
+        def to_codes(flags: pd.Series) -> np.ndarray:
+            # codes of flags in the categories of the whole store
+            if base_dtype(flags.dtype) != "object":
+                flags = flags.astype(str)
+            codes, uniques = pd.factorize(flags)
+            lut = np.array([categories.setdefault(u, len(categories))
+                            for u in uniques] + [-1], dtype=np.int32)
+            return lut[codes]
+
+        files = {col: open(path / f"{col}.bin", "wb") for col in dtypes}
+        try:
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                data = file_collection.read_data(
+                    batch, n_workers=n_workers, backend=backend)
+                filehandlers = file_collection.get_filehandlers(batch)
+                for f, d in zip(filehandlers, data):
+                    if len(d.columns) != 3:
+                        raise ValueError(
+                            f"Unexpected columns in {f.file_path}: "
+                            f"{list(d.columns)}")
+                    cols = {
+                        "time": d.index.values.astype(
+                            "datetime64[ns]").view(np.int64),
+                        "value": d.iloc[:, 0].values,
+                        "flag": to_codes(d.iloc[:, 1]),
+                        "orig_flag": to_codes(d.iloc[:, 2]),
+                    }
+                    for col, vals in cols.items():
+                        files[col].write(
+                            np.ascontiguousarray(vals, dtype=dtypes[col])
+                            .tobytes())
+                    file_paths.append(str(PurePosixPath(f.file_path)))
+                    columns.append([str(c) for c in d.columns])
+                    col_dtypes.append([base_dtype(t) for t in d.dtypes])
+                    offsets.append(offsets[-1] + len(d.index))
+                ismnlog.info(f"Stored {len(file_paths)} of {len(ids)} "
+                             f"time series in {path}")
+        finally:
+            for f in files.values():
+                f.close()
+
+        np.save(path / "offsets.npy", np.array(offsets, dtype=np.int64))
+        manifest = dict(
+            version=STORE_VERSION,
+            archive=file_collection.root.name,
+            value_dtype=np.dtype(value_dtype).name,
+            categories=list(categories.keys()),
+            file_paths=file_paths,
+            fingerprints=[fingerprints.get(p, None) for p in file_paths],
+            columns=columns,
+            dtypes=col_dtypes,
+        )
+        with open(path / cls._manifest, "w") as f:
+            json.dump(manifest, f)
+
+        return cls(path)
@@ -2,6 +2,7 @@
 import os
 from ismn.base import IsmnRoot
 from pathlib import Path
+from tempfile import TemporaryDirectory
 
 testdata_path = os.path.join(os.path.dirname(__file__), "test_data")
 
@@ -18,6 +19,15 @@ def test_root_dir():
     assert "COSMOS/Barrow-ARM/COSMOS_COSMOS_Barrow-ARM_static_variables.csv" in root
     assert len(root.find_files("COSMOS/Barrow-ARM")) == 1
 
+    with root.open_member(
+            "COSMOS/Barrow-ARM/COSMOS_COSMOS_Barrow-ARM_static_variables.csv") as f:
+        assert f.readline().startswith(b"quantity_name")
+
+    fingerprints = root.file_fingerprints()
+    assert "COSMOS/Barrow-ARM/COSMOS_COSMOS_Barrow-ARM_static_variables.csv" \
+        in fingerprints
+    assert "Metadata.xml" not in fingerprints
+
     root.close()
 
     assert root.isopen  # dir is always open
@@ -35,6 +45,22 @@ def test_root_zip():
     assert "COSMOS/Barrow-ARM/COSMOS_COSMOS_Barrow-ARM_static_variables.csv" in root
     assert len(root.find_files("COSMOS/Barrow-ARM")) == 1
 
+    with root.open_member(
+            "COSMOS/Barrow-ARM/COSMOS_COSMOS_Barrow-ARM_static_variables.csv") as f:
+        assert f.readline().startswith(b"quantity_name")
+
+    assert "COSMOS/Barrow-ARM/missing.csv" not in root
+    assert len(root.find_files("COSMOS", "*.stm")) == 2
+    assert len(root.find_files(fn_templ="*.stm")) == 2
+
+    fingerprints = root.file_fingerprints()
+    assert len(fingerprints) == 4  # static meta and data file per station
+    assert all(f in root for f in fingerprints.keys())
+
+    with TemporaryDirectory() as tempdir:
+        extracted = root.extract_dir("COSMOS/ARM-1", tempdir)
+        assert len([f for f in extracted if f.is_file()]) == 2
+
     root.close()
 
     assert not root.isopen
@@ -0,0 +1,787 @@
+# -*- coding: utf-8 -*-
+
+"""
+Performance benchmarks for reading ISMN archives. These are not run by
+default, use `pytest -m benchmark -s` to run them and print the results.
+"""
+
+import os
+import time
+import zipfile
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ismn.base import IsmnRoot
+from ismn.filehandlers import DataFile
+from ismn.interface import ISMN_Interface
+from ismn.components import Network, NetworkCollection
+from ismn.meta import Depth, TimeRangeIndex, in_period
+from ismn.filecollection import (
+    IsmnFileCollection,
+    _load_metadata_df,
+    _load_metadata_parquet,
+    _write_metadata_parquet,
+)
+
+testdata_path = Path(os.path.join(os.path.dirname(__file__), "test_data"))
+
+
+static_csv = (testdata_path / "Data_seperate_files_header_20170810_20180809" /
+              "COSMOS" / "ARM-1" /
+              "COSMOS_COSMOS_ARM-1_static_variables.csv").read_text()
+
+
+def create_synthetic_archive(path, n_stations, n_networks=1, n_sensors=1,
+                             n_obs=24, as_zip=False, fmt="header_values"):
+    """
+    Create an archive in the ISMN 'header values' (or 'ceop_sep') format
+    with the passed number of networks, stations per network, sensors per
+    station and (hourly) observations per sensor.
+    Returns the path to the created archive (folder or zip file).
+    """
+    path = Path(path)
+    rng = np.random.default_rng(42)
+    times = pd.date_range("2000-01-01", periods=n_obs, freq="h")
+    dates = times.strftime("%Y/%m/%d %H:%M").values
+
+    files = {}
+    for n in range(n_networks):
+        net = f"NET{n}"
+        for s in range(n_stations):
+            stat = f"STAT{s}"
+            lon, lat = rng.uniform(-180, 180), rng.uniform(-60, 80)
+            files[f"{net}/{stat}/{net}_{net}_{stat}_static_variables.csv"] = \
+                static_csv
+            for i in range(n_sensors):
+                d = i * 0.05
+                fname = (f"{net}_{net}_{stat}_sm_{d:.6f}_{d:.6f}_Probe_"
+                         f"{times[0]:%Y%m%d}_{times[-1]:%Y%m%d}.stm")
+                vals = rng.uniform(0, 0.5, n_obs)
+                if fmt == "ceop_sep":
+                    lines = [f"{t} {t} {net} {net} {stat} {lat:.5f} "
+                             f"{lon:.5f} 100.00 {d:.2f} {d:.2f} {v:8.4f} G M"
+                             for t, v in zip(dates, vals)]
+                else:
+                    lines = [f"{net} {net} {stat} {lat:.5f} {lon:.5f} "
+                             f"100.00 {d:.2f} {d:.2f} Probe"]
+                    lines += [f"{t} {v:8.4f} G M"
+                              for t, v in zip(dates, vals)]
+                files[f"{net}/{stat}/{fname}"] = "\r\n".join(lines) + "\r\n"
+
+    if as_zip:
+        path = path.with_suffix(".zip")
+        with zipfile.ZipFile(path, "w") as z:
+            for name, content in files.items():
+                z.writestr(name, content)
+    else:
+        for name, content in files.items():
+            os.makedirs(path / os.path.dirname(name), exist_ok=True)
+            (path / name).write_text(content)
+
+    return path
+
+
+def synthetic_metadata_df(n_sensors, n_networks=10):
+    """
+    Create a metadata frame for n sensors by repeating the metadata of the
+    test data (all rows point to existing files) with random locations.
+    """
+    coll = IsmnFileCollection.build_from_scratch(
+        testdata_path / "Data_seperate_files_header_20170810_20180809",
+        parallel=False)
+    df = coll.to_metadata_df()
+    coll.close()
+
+    rng = np.random.default_rng(42)
+    df = df.iloc[np.arange(n_sensors) % len(df.index)]
+    df.index = range(n_sensors)
+    df[("longitude", "val")] = rng.uniform(-180, 180, n_sensors)
+    df[("latitude", "val")] = rng.uniform(-60, 80, n_sensors)
+    df[("network", "val")] = [f"NET{i}" for i in
+                              np.sort(np.arange(n_sensors) % n_networks)]
+    # two sensors (with different depths) per station
+    df[("station", "val")] = [f"STAT{i // 2}" for i in range(n_sensors)]
+
+    return df
+
+
+def timeit(func, n=1):
+    # run func n times and return the mean run time in seconds
+    t0 = time.perf_counter()
+    for _ in range(n):
+        func()
+    return (time.perf_counter() - t0) / n
+
+
+@pytest.mark.benchmark
+def test_benchmark_zip_stream_vs_extract():
+    root = IsmnRoot(testdata_path / "zip_archives" / "ceop" /
+                    "Data_seperate_files_20170810_20180809.zip")
+    file_path = ("COSMOS/Barrow-ARM/COSMOS_COSMOS_Barrow-ARM_sm_0.000000_"
+                 "0.210000_Cosmic-ray-Probe_20170810_20180809.stm")
+    f = DataFile(root, file_path)
+
+    def read_extracted():
+        with TemporaryDirectory(prefix="ismn") as tempdir:
+            extracted = root.extract_file(file_path, tempdir)
+            return pd.read_csv(extracted, sep=r'\s+', header=None,
+                               usecols=[0, 1, 12, 13, 14])
+
+    def read_stream():
+        with root.open_member(file_path) as stream:
+            return pd.read_csv(stream, sep=r'\s+', header=None,
+                               usecols=[0, 1, 12, 13, 14])
+
+    pd.testing.assert_frame_equal(read_extracted(), read_stream())
+
+    t_extract = timeit(read_extracted, 20)
+    t_stream = timeit(read_stream, 20)
+    t_read_data = timeit(f.read_data, 20)
+
+    print(f"\nExtract then read: {t_extract * 1000:.2f} ms/file\n"
+          f"Read from stream:  {t_stream * 1000:.2f} ms/file\n"
+          f"DataFile.read_data: {t_read_data * 1000:.2f} ms/file")
+
+    root.close()
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("as_zip", [False, True])
+def test_benchmark_scan_scales_linearly(as_zip):
+    n_small, n_large = 2000, 8000
+    times = {}
+    with TemporaryDirectory() as tempdir:
+        for n in [n_small, n_large]:
+            path = create_synthetic_archive(
+                Path(tempdir) / f"archive_{n}", n_stations=n, n_obs=1,
+                as_zip=as_zip)
+
+            def scan():
+                with IsmnRoot(path) as root:
+                    assert len(root.cont["NET0"]) == n
+
+            times[n] = timeit(scan, 3)
+            print(f"\nScan {n} stations ({'zip' if as_zip else 'dir'}): "
+                  f"{times[n] * 1000:.1f} ms")
+
+    # 4 times the stations should take ~4 times as long, quadratic would
+    # be ~16 times.
+    assert times[n_large] / times[n_small] < 8
+
+
+@pytest.mark.benchmark
+@pytest.mark.requires_parquet
+def test_benchmark_metadata_csv_vs_parquet():
+    df = synthetic_metadata_df(50000)
+    with TemporaryDirectory() as tempdir:
+        csv_file = Path(tempdir) / "meta.csv"
+        pq_file = Path(tempdir) / "meta.parquet"
+        df.to_csv(csv_file)
+        _write_metadata_parquet(df, pq_file)
+
+        t_csv = timeit(lambda: _load_metadata_df(csv_file), 3)
+        t_pq = timeit(lambda: _load_metadata_parquet(pq_file), 3)
+        t_pq_cols = timeit(lambda: _load_metadata_parquet(
+            pq_file, variables=["network", "latitude", "longitude"]), 3)
+        t_pq_net = timeit(lambda: _load_metadata_parquet(
+            pq_file, network="NET0"), 3)
+
+    print(f"\nLoad metadata for {len(df.index)} sensors:\n"
+          f"csv: {t_csv * 1000:.1f} ms\n"
+          f"parquet: {t_pq * 1000:.1f} ms\n"
+          f"parquet (3 variables): {t_pq_cols * 1000:.1f} ms\n"
+          f"parquet (1 network): {t_pq_net * 1000:.1f} ms")
+
+
+@pytest.mark.benchmark
+def test_benchmark_collection_from_metadata_df():
+    # startup time of the file collection should grow linearly with the
+    # number of sensors
+    path = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    root = IsmnRoot(path)
+    print("\nSet up file collection from metadata frame:")
+    times = {}
+    for n in [10000, 20000, 40000]:
+        df = synthetic_metadata_df(n)
+        times[n] = timeit(
+            lambda: IsmnFileCollection.from_metadata_df(root, df), 3)
+        print(f"{n} sensors: {times[n] * 1000:.1f} ms")
+
+    assert times[40000] / times[10000] < 8
+
+
+@pytest.mark.benchmark
+def test_benchmark_interface_lazy_collection():
+    # index based workflows should not pay for building the components
+    path = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    df = synthetic_metadata_df(40000, n_networks=50)
+    with TemporaryDirectory() as meta_path:
+        df.to_csv(Path(meta_path) / f"{path.name}.csv")
+        t_eager = timeit(lambda: ISMN_Interface(path, meta_path=meta_path))
+        t_lazy = timeit(
+            lambda: ISMN_Interface(path, meta_path=meta_path, lazy=True))
+        ds = ISMN_Interface(path, meta_path=meta_path, lazy=True)
+        t_net = timeit(lambda: ds["NET0"])
+
+    print(f"\nSet up ISMN_Interface for {len(df.index)} sensors:\n"
+          f"default: {t_eager:.2f} s\n"
+          f"lazy: {t_lazy:.2f} s (first access of one network: "
+          f"{t_net * 1000:.1f} ms)")
+
+    assert t_lazy < t_eager
+
+
+@pytest.mark.benchmark
+def test_benchmark_filter_ids_vectorized():
+    # evaluate the metadata frame instead of checking each filehandler
+    path = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    df = synthetic_metadata_df(40000)
+    coll = IsmnFileCollection.from_metadata_df(path, df)
+    queries = [
+        dict(variable="soil_moisture", allowed_depth=Depth(0, 0.1)),
+        dict(variable="soil_moisture", allowed_depth=Depth(0, 0.5),
+             filter_meta_dict={"lc_2010": 130}),
+        dict(allowed_depth=Depth(0, 1),
+             filter_meta_dict={"lc_2010": [130, 210], "climate_KG": "Dfc"}),
+    ]
+
+    def per_object(**kwargs):
+        return [i for i, f in enumerate(coll.iter_filehandlers())
+                if f.check_metadata(**kwargs)]
+
+    _ = per_object()  # create all MetaData objects first
+
+    for q in queries:
+        assert per_object(**q) == coll.filter_ids(**q)
+
+    t_obj = timeit(lambda: [per_object(**q) for q in queries], 3)
+    t_vec = timeit(lambda: [coll.filter_ids(**q) for q in queries], 3)
+
+    print(f"\n{len(queries)} filter queries on {len(df.index)} sensors:\n"
+          f"per filehandler: {t_obj * 1000:.1f} ms\n"
+          f"metadata frame: {t_vec * 1000:.1f} ms")
+
+    assert t_vec < t_obj
+
+
+@pytest.mark.benchmark
+def test_benchmark_get_filehandler():
+    # looking up filehandlers by id should not depend on the number of
+    # networks
+    path = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    df = synthetic_metadata_df(40000, n_networks=500)
+    coll = IsmnFileCollection.from_metadata_df(path, df)
+    ids = list(np.random.default_rng(42).integers(0, 40000, 10000))
+
+    def walk_networks(idx):
+        # lookup as it was done before
+        fs = 0
+        for net, files in coll.filelist.items():
+            if fs + len(files) > idx:
+                return files[idx - fs]
+            fs += len(files)
+
+    assert [walk_networks(i) for i in ids[:100]] == \
+        coll.get_filehandlers(ids[:100])
+
+    t_walk = timeit(lambda: [walk_networks(i) for i in ids])
+    t_flat = timeit(lambda: [coll.get_filehandler(i) for i in ids])
+    t_batch = timeit(lambda: coll.get_filehandlers(ids))
+
+    print(f"\nLook up {len(ids)} ids (40000 sensors, 500 networks):\n"
+          f"walk networks: {t_walk * 1000:.1f} ms\n"
+          f"flat index: {t_flat * 1000:.1f} ms, "
+          f"batch: {t_batch * 1000:.1f} ms")
+
+    assert t_flat < t_walk
+
+
+@pytest.mark.benchmark
+def test_benchmark_memory_per_sensor():
+    # memory of a fully activated interface (all components and metadata)
+    import gc
+    import tracemalloc
+
+    path = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    df = synthetic_metadata_df(20000)
+    with TemporaryDirectory() as meta_path:
+        df.to_csv(Path(meta_path) / f"{path.name}.csv")
+        gc.collect()
+        tracemalloc.start()
+        ds = ISMN_Interface(path, meta_path=meta_path)
+        _ = ds.grid
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    n = len(ds.metadata.index)
+    print(f"\nMemory of ISMN_Interface with {n} sensors: "
+          f"{size / 1e6:.1f} MB ({size / n:.0f} bytes per sensor)")
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("as_zip", [False, True])
+def test_benchmark_metadata_collection_processes(as_zip):
+    # speedup of metadata collection with the number of processes
+    n_cpus = os.cpu_count()
+    n_procs = sorted(set([n for n in [1, 2, 4, 8] if n <= n_cpus] + [n_cpus]))
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 100,
+                                        n_networks=4, n_sensors=3,
+                                        as_zip=as_zip)
+        times = {}
+        for n in n_procs:
+            times[n] = timeit(lambda: IsmnFileCollection.build_from_scratch(
+                path, parallel=n > 1, backend="multiprocessing", n_proc=n))
+
+    print(f"\nMetadata collection for 400 stations "
+          f"({'zip' if as_zip else 'dir'}, {n_cpus} CPUs):")
+    for n, t in times.items():
+        print(f"{n} processes: {t:.2f} s (speedup: {times[1] / t:.2f})")
+
+
+@pytest.mark.benchmark
+def test_benchmark_incremental_metadata_collection():
+    # refresh metadata after a few stations of the archive were updated
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 100,
+                                        n_networks=4, n_sensors=3)
+        previous = IsmnFileCollection.build_from_scratch(path, parallel=False)
+
+        for s in range(4):  # new data for 4 of 400 stations
+            for f in (path / "NET0" / f"STAT{s}").glob("*.stm"):
+                f.write_text(f.read_text() + f.read_text().splitlines()[-1])
+
+        t_full = timeit(lambda: IsmnFileCollection.build_from_scratch(
+            path, parallel=False))
+        t_incr = timeit(lambda: IsmnFileCollection.build_from_scratch(
+            path, parallel=False, previous=previous))
+
+    print(f"\nMetadata collection for 400 stations (4 changed): "
+          f"full: {t_full:.2f} s, incremental: {t_incr:.2f} s "
+          f"(speedup: {t_full / t_incr:.1f})")
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("as_zip", [False, True])
+def test_benchmark_header_lines(as_zip):
+    # metadata from the first and last lines of large (10 years hourly) files
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 5,
+                                        n_obs=24 * 365 * 10, as_zip=as_zip)
+        root = IsmnRoot(path)
+        files = root.find_files(fn_templ="*.stm") if as_zip else \
+            [f for f in Path(path).glob("**/*.stm")]
+        files = [Path(f).relative_to(path) if not as_zip else f
+                 for f in files]
+        size = np.mean([len(root.open_member(f).read()) for f in files])
+
+        def read_all():
+            for f in files:
+                with root.open_member(f) as stream:
+                    stream.read().splitlines()
+
+        def read_header():
+            for f in files:
+                DataFile(root, f, load_metadata=False).get_elements_from_file()
+
+        t_all = timeit(read_all, 3) / len(files)
+        t_header = timeit(read_header, 3) / len(files)
+        root.close()
+
+    print(f"\nMetadata lines of {size / 1e6:.1f} MB file "
+          f"({'zip' if as_zip else 'dir'}): read all lines: "
+          f"{t_all * 1e3:.1f} ms, header and last line only: "
+          f"{t_header * 1e3:.2f} ms (speedup: {t_all / t_header:.0f})")
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("fmt", ["header_values", "ceop_sep"])
+def test_benchmark_parse_data(fmt):
+    # dedicated parser vs. generic pandas csv reader for year-long hourly files
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 1,
+                                        n_obs=24 * 365, fmt=fmt)
+        root = IsmnRoot(path)
+        f = DataFile(root, root.find_files("NET0/STAT0", "*.stm")[0])
+        assert f.file_type == fmt
+
+        def read_pandas():
+            # reader that was used before
+            with root.open_member(f.file_path) as stream:
+                df = pd.read_csv(stream, sep=r"\s+", header=None,
+                                 skiprows=1 if fmt == "header_values" else 0)
+            df.index = pd.to_datetime(df.pop(0) + " " + df.pop(1))
+            return df
+
+        t_pandas = timeit(read_pandas, 5)
+        t_fast = timeit(f.read_data, 5)
+        root.close()
+
+    print(f"\nParse 8760 values ({fmt}): pandas: {t_pandas * 1e3:.1f} ms, "
+          f"ismn parser: {t_fast * 1e3:.1f} ms "
+          f"(speedup: {t_pandas / t_fast:.1f})")
+
+
+@pytest.mark.benchmark
+def test_benchmark_compact_dtypes_memory():
+    # memory of the data for 200 sensors (1 year hourly) returned by read_ts
+    import gc
+    import tracemalloc
+
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 100,
+                                        n_sensors=2, n_obs=24 * 365)
+        results = {}
+        for compact in [False, True]:
+            ds = ISMN_Interface(path, meta_path=Path(tempdir) / "meta",
+                                compact_dtypes=compact)
+            ids = list(ds.metadata.index)
+            t = timeit(lambda: ds.read_ts(ids))
+            gc.collect()
+            tracemalloc.start()
+            data = ds.read_ts(ids)
+            size, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[compact] = (size, data.memory_usage(deep=True).sum(), t)
+            del data
+            ds.close_files()
+
+    print(f"\nread_ts for {len(ids)} sensors (1 year hourly):")
+    for compact, (size, deep, t) in results.items():
+        print(f"compact_dtypes={compact}: {size / 1e6:.1f} MB allocated, "
+              f"{deep / 1e6:.1f} MB memory_usage(deep=True), {t:.2f} s")
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("as_zip", [False, True])
+def test_benchmark_read_ts_parallel(as_zip):
+    # throughput of read_ts for many ids with different numbers of workers
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 100,
+                                        n_sensors=2, n_obs=24 * 365,
+                                        as_zip=as_zip)
+        ds = ISMN_Interface(path, meta_path=Path(tempdir) / "meta")
+        ids = list(ds.metadata.index)
+        should = ds.read_ts(ids)
+        results = {}
+        for backend in ["threading", "multiprocessing"]:
+            for n_workers in [1, 2, 4]:
+                t = timeit(lambda: ds.read_ts(ids, n_workers=n_workers,
+                                              backend=backend))
+                results[(backend, n_workers)] = len(ids) / t
+        pd.testing.assert_frame_equal(
+            ds.read_ts(ids, n_workers=2, backend="multiprocessing"), should)
+        ds.close_files()
+
+    print(f"\nread_ts for {len(ids)} files (zip={as_zip}, "
+          f"{os.cpu_count()} CPUs):")
+    for (backend, n_workers), files_per_s in results.items():
+        print(f"{backend}, {n_workers} workers: {files_per_s:.0f} files/s")
+
+
+@pytest.mark.benchmark
+def test_benchmark_ts_store():
+    # reading time series from the store instead of parsing the files
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 100,
+                                        n_sensors=2, n_obs=24 * 365,
+                                        as_zip=True)
+        meta_path = Path(tempdir) / "meta"
+        ds = ISMN_Interface(path, meta_path=meta_path)
+        ids = list(ds.metadata.index)
+        t_create = timeit(lambda: ds.create_ts_store(Path(tempdir) / "store"))
+        ds_store = ISMN_Interface(path, meta_path=meta_path,
+                                  ts_store=Path(tempdir) / "store")
+        pd.testing.assert_frame_equal(ds_store.read_ts(ids[:5]),
+                                      ds.read_ts(ids[:5]))
+
+        t_files = timeit(lambda: [ds.read_ts(i) for i in ids])
+        t_store = timeit(lambda: [ds_store.read_ts(i) for i in ids])
+        size = sum(f.stat().st_size for f in (Path(tempdir) / "store").iterdir())
+        ds_store.ts_store.close()
+        ds.close_files()
+
+    print(f"\nRead {len(ids)} time series (1 year hourly, zip archive):\n"
+          f"data files: {len(ids) / t_files:.0f} files/s\n"
+          f"store: {len(ids) / t_store:.0f} time series/s "
+          f"(created in {t_create:.2f} s, {size / 1e6:.1f} MB)")
+
+    assert t_store < t_files
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("as_zip", [False, True])
+def test_benchmark_read_ts_window(as_zip):
+    # reading one month of 5 years of hourly data for many sensors
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 50,
+                                        n_sensors=2, n_obs=24 * 365 * 5,
+                                        as_zip=as_zip)
+        ds = ISMN_Interface(path, meta_path=Path(tempdir) / "meta")
+        ids = list(ds.metadata.index)
+        window = dict(start="2002-06-01", end="2002-06-30 23:00")
+
+        t_full = timeit(lambda: ds.read_ts(ids).loc[
+            window["start"]:window["end"]])
+        t_window = timeit(lambda: ds.read_ts(ids, **window))
+        t_outside = timeit(lambda: ds.read_ts(ids, start="2010-01-01"))
+        pd.testing.assert_frame_equal(
+            ds.read_ts(ids, **window),
+            ds.read_ts(ids).loc[window["start"]:window["end"]])
+        ds.close_files()
+
+    print(f"\nRead 1 month of 5 years for {len(ids)} sensors "
+          f"(zip={as_zip}):\n"
+          f"all data: {t_full:.2f} s\n"
+          f"window: {t_window:.2f} s\n"
+          f"window after the time range: {t_outside * 1000:.1f} ms")
+
+    assert t_window < t_full
+
+
+@pytest.mark.benchmark
+def test_benchmark_mmap_read():
+    # files in directories are parsed from a memory map, compared to reading
+    # the file into a buffer and splitting it into tokens (used for zips)
+    with TemporaryDirectory() as tempdir:
+        path = create_synthetic_archive(Path(tempdir) / "archive", 50,
+                                        n_sensors=2, n_obs=24 * 365 * 2)
+        root = IsmnRoot(path)
+        files = [DataFile(root, f.relative_to(path))
+                 for f in sorted(Path(path).glob("**/*.stm"))]
+
+        def read_buffered():
+            # reader that was used before
+            data = []
+            for f in files:
+                var = f.metadata["variable"].val
+                names = ["date", "time", var, f"{var}_flag",
+                         f"{var}_orig_flag"]
+                content = f._DataFile__read_content(skiprows=1)
+                data.append(f._DataFile__read_fast(content, names, ncols=5))
+            return data
+
+        def read_mapped():
+            return [f.read_data() for f in files]
+
+        for buffered, mapped in zip(read_buffered(), read_mapped()):
+            pd.testing.assert_frame_equal(buffered, mapped)
+
+        t_buffered = timeit(read_buffered, 3)
+        t_mapped = timeit(read_mapped, 3)
+        t_window = timeit(lambda: [f.read_data(start="2001-06-01",
+                                               end="2001-06-30 23:00")
+                                   for f in files], 3)
+        root.close()
+
+    print(f"\nRead {len(files)} files (2 years hourly) from a directory:\n"
+          f"buffered: {t_buffered * 1e3:.0f} ms\n"
+          f"memory mapped: {t_mapped * 1e3:.0f} ms "
+          f"(speedup: {t_buffered / t_mapped:.1f})\n"
+          f"memory mapped, 1 month: {t_window * 1e3:.0f} ms")
+
+
+def synthetic_network_collection(n_networks=70, n_stations=43, seed=0):
+    # about as many stations as in the whole ISMN archive
+    rng = np.random.default_rng(seed)
+    networks = []
+    for n in range(n_networks):
+        net = Network(f"NET{n}")
+        for s in range(n_stations):
+            net.add_station(f"STAT{s}", rng.uniform(-180, 180),
+                            rng.uniform(-60, 80), 0)
+            net.stations[f"STAT{s}"].add_sensor(
+                "sensor", "soil_moisture", Depth(0, 0.05), None)
+        networks.append(net)
+    return NetworkCollection(networks)
+
+
+@pytest.mark.benchmark
+def test_benchmark_nearest_stations():
+    # nearest station for 1M points, gpi -> Station lookup by position
+    # compared to comparing the coordinates of all stations
+    collection = synthetic_network_collection()
+    n_stations = collection.grid.n_gpi
+    rng = np.random.default_rng(1)
+    lons = rng.uniform(-180, 180, 10 ** 6)
+    lats = rng.uniform(-90, 90, 10 ** 6)
+
+    def station4gpi_scan(gpis):
+        # lookup that was used before
+        lon, lat = collection.grid.gpi2lonlat(gpis)
+        stations = []
+        for g in range(len(gpis)):
+            for net, stat in collection.iter_stations():
+                if (stat.lon == lon[g]) and (stat.lat == lat[g]):
+                    stations.append(stat)
+                    break
+        return stations
+
+    gpis, _ = collection.grid.find_nearest_gpi(lons[:1000], lats[:1000])
+    t_scan = timeit(lambda: station4gpi_scan(gpis)) * 1000
+    t_batch = timeit(lambda: collection.get_nearest_stations(lons, lats))
+    t_k = timeit(lambda: collection.get_nearest_stations(lons, lats, k=5))
+    stations, dist = collection.get_nearest_stations(lons[:1000],
+                                                     lats[:1000])
+    assert list(stations) == station4gpi_scan(gpis)
+
+    print(f"\nNearest of {n_stations} stations for 1M points:\n"
+          f"scan per point (extrapolated from 1000): {t_scan:.1f} s\n"
+          f"batch query: {t_batch:.2f} s\n"
+          f"batch query, k=5: {t_k:.2f} s")
+
+    assert t_batch < t_scan
+
+
+@pytest.mark.benchmark
+def test_benchmark_stations_within():
+    # stations within 50 km of each cell of a global 0.25 deg grid
+    collection = synthetic_network_collection()
+    lons, lats = np.meshgrid(np.arange(-179.875, 180, 0.25),
+                             np.arange(-89.875, 90, 0.25))
+    lons, lats = lons.ravel(), lats.ravel()
+    radius = 50000
+
+    x, y, z = collection.grid.geodatum.toECEF(collection.grid.activearrlon,
+                                              collection.grid.activearrlat)
+
+    def per_point(point_lons, point_lats):
+        # distance to all stations, one point at a time
+        result = []
+        for lon, lat in zip(point_lons, point_lats):
+            px, py, pz = collection.grid.geodatum.toECEF(lon, lat)
+            d = np.sqrt((x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2)
+            result.append(np.flatnonzero(d <= radius))
+        return result
+
+    sample = slice(500000, 510000)
+    offsets, gpis, dist = collection.stations_within(
+        lons[sample], lats[sample], radius)
+    for i, should in enumerate(per_point(lons[sample], lats[sample])):
+        assert sorted(gpis[offsets[i]:offsets[i + 1]]) == sorted(should)
+
+    t_point = timeit(lambda: per_point(lons[sample], lats[sample])) * \
+        len(lons) / 10000
+    t_batch = timeit(lambda: collection.stations_within(lons, lats, radius))
+    offsets, gpis, dist = collection.stations_within(lons, lats, radius)
+
+    print(f"\nStations (of {collection.grid.n_gpi}) within {radius / 1000} km "
+          f"of {len(lons)} points ({len(gpis)} pairs):\n"
+          f"per point (extrapolated from 10000): {t_point:.1f} s\n"
+          f"batch query: {t_batch:.2f} s")
+
+    assert t_batch < t_point
+
+
+@pytest.mark.benchmark
+def test_benchmark_spatial_filter():
+    # regional id queries on the coordinate columns instead of checking the
+    # metadata of each sensor
+    path = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    df = synthetic_metadata_df(100000)
+    coll = IsmnFileCollection.from_metadata_df(path, df)
+    europe = [(-10, 36), (30, 36), (40, 60), (25, 71), (-10, 60)]
+    queries = [
+        dict(variable="soil_moisture", bbox=(-10, 35, 40, 71)),
+        dict(variable="soil_moisture", polygon=europe),
+        dict(bbox=(170, -50, -170, 10)),
+    ]
+
+    def per_object(**kwargs):
+        return [i for i, f in enumerate(coll.iter_filehandlers())
+                if f.check_metadata(**kwargs)]
+
+    _ = per_object()  # create all MetaData objects first
+
+    for q in queries:
+        assert per_object(**q) == coll.filter_ids(**q)
+
+    t_obj = timeit(lambda: [per_object(**q) for q in queries])
+    t_vec = timeit(lambda: [coll.filter_ids(**q) for q in queries], 10)
+
+    print(f"\n{len(queries)} spatial queries on {len(df.index)} sensors:\n"
+          f"per filehandler: {t_obj * 1000:.1f} ms\n"
+          f"metadata frame: {t_vec * 1000:.1f} ms")
+
+    assert t_vec < t_obj
+
+
+@pytest.mark.benchmark
+def test_benchmark_time_range_index():
+    # sensors with data in a period, 100k synthetic time ranges
+    n = 100000
+    rng = np.random.default_rng(42)
+    starts = pd.Timestamp("1950-01-01") + pd.to_timedelta(
+        rng.integers(0, 70 * 365, n), unit="D")
+    ends = starts + pd.to_timedelta(rng.integers(1, 3 * 365, n), unit="D")
+    # time ranges as in the MetaData of each sensor
+    ranges = list(zip(starts, ends))
+    periods = [("2015-01-01", "2020-12-31"), ("1990-06-01", "1990-06-02"),
+               ("2018-03-01", "2018-04-01")]
+
+    def per_sensor(start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        return [i for i, (t_from, t_to) in enumerate(ranges)
+                if (t_from <= end) and (t_to >= start)]
+
+    t_build = timeit(lambda: TimeRangeIndex(starts, ends))
+    index = TimeRangeIndex(starts, ends)
+
+    for p in periods:
+        assert per_sensor(*p) == index.overlapping(*p).tolist()
+
+    t_obj = timeit(lambda: [per_sensor(*p) for p in periods]) / len(periods)
+    t_scan = timeit(lambda: [np.flatnonzero(in_period(starts, ends, p))
+                             for p in periods], 10) / len(periods)
+    t_index = timeit(lambda: [index.overlapping(*p) for p in periods],
+                     100) / len(periods)
+
+    print(f"\nOverlap query on {n} time ranges:\n"
+          f"per sensor: {t_obj * 1000:.1f} ms\n"
+          f"vectorized scan: {t_scan * 1000:.2f} ms\n"
+          f"interval index: {t_index * 1000:.3f} ms "
+          f"(built in {t_build * 1000:.0f} ms)")
+
+    assert t_index < t_obj
+
+
+@pytest.mark.benchmark
+def test_benchmark_aggregate_metadata():
+    # aggregate the metadata frame instead of walking through the sensors
+    path = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    df = synthetic_metadata_df(40000, n_networks=50)
+    with TemporaryDirectory() as meta_path:
+        df.to_csv(Path(meta_path) / f"{path.name}.csv")
+        ds = ISMN_Interface(path, meta_path=meta_path)
+
+    def per_sensor():
+        counts = {}
+        for nw, stat, sens in ds.collection.iter_sensors(
+                variable="soil_moisture", depth=Depth(0, 0.1)):
+            key = (nw.name, sens.metadata["climate_KG"].val)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def aggregated():
+        return ds.aggregate_metadata(
+            by=["network", "climate_KG"], variable="soil_moisture",
+            min_depth=0, max_depth=0.1).to_dict()
+
+    assert per_sensor() == aggregated()
+
+    t_obj = timeit(per_sensor)
+    t_agg = timeit(aggregated, 10)
+    t_minmax = timeit(lambda: ds.get_min_max_obs_timestamps(), 10)
+
+    print(f"\nCount sensors per network and climate class "
+          f"({len(df.index)} sensors):\n"
+          f"per sensor: {t_obj * 1000:.1f} ms\n"
+          f"metadata frame: {t_agg * 1000:.1f} ms\n"
+          f"get_min_max_obs_timestamps: {t_minmax * 1000:.1f} ms")
+
+    assert t_agg < t_obj
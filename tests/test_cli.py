@@ -1,6 +1,6 @@
 import os
 from click.testing import CliRunner
-from ismn.cli import collect_metadata, export_geojson
+from ismn.cli import collect_metadata, export_geojson, create_ts_store
 from tempfile import TemporaryDirectory
 
 testdata_root = os.path.join(os.path.dirname(__file__), "test_data")
@@ -41,3 +41,17 @@ def test_cli_export_geojson():
             assert "lc_2010" in content[0]
             assert 'soil_moisture' in content[0]
             assert "precipitation" not in content[0]
+
+def test_cli_create_ts_store():
+    with TemporaryDirectory() as tempdir:
+        data_path = os.path.join(
+            testdata_root, "zip_archives", "ceop",
+            "Data_seperate_files_20170810_20180809.zip")
+        runner = CliRunner()
+        result = runner.invoke(create_ts_store,
+                               [data_path, os.path.join(tempdir, "store"),
+                                "--meta_path", os.path.join(tempdir, "meta"),
+                                "-n", "COSMOS"])
+        assert result.exit_code == 0
+        assert os.path.isfile(os.path.join(tempdir, "store", "store.json"))
+        assert "2 time series" in result.output
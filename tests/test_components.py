@@ -74,6 +74,33 @@ class NetCollTest(unittest.TestCase):
         assert self.netcol.get_nearest_station(0.1, 0.1)[0].name == "station_1_1"
         assert self.netcol.get_nearest_station(1, 1)[0].name == "station_2_1"
 
+    def test_get_nearest_stations(self):
+        stations, dist = self.netcol.get_nearest_stations(
+            np.array([0.1, 1, 50]), np.array([0.1, 1, 50]), max_dist=50000)
+        assert [s.name if s else s for s in stations] == \
+            ["station_1_1", "station_2_1", None]
+        assert dist[1] == 0 and np.isinf(dist[2])
+        stations, dist = self.netcol.get_nearest_stations(
+            [0.9, 0.1], [0.9, 0.1], k=3)
+        assert stations.shape == dist.shape == (2, 3)
+        assert [s.name for s in stations[0, :2]] == \
+            ["station_2_1", "station_1_1"]
+        assert stations[0, 2] is None and np.isinf(dist[0, 2])
+        assert self.netcol.station4gpi([1, 0, 1])[2].name == "station_2_1"
+
+    def test_stations_within(self):
+        offsets, gpis, dist = self.netcol.stations_within(
+            [0.4, 0, 10], [0.4, 0, 10], 200000)
+        assert offsets.tolist() == [0, 2, 4, 4]
+        assert gpis.tolist() == [0, 1, 0, 1]  # sorted by distance
+        assert dist[0] < dist[1] and dist[2] == 0
+        offsets, gpis, dist = self.netcol.stations_within(
+            [0.4], [0.4], 200000, depth=[1, 2])
+        assert gpis.tolist() == [0, 1]
+        offsets, gpis, dist = self.netcol.stations_within(
+            [0.5], [0.5], 200000, variable="var2")
+        assert offsets.tolist() == [0, 0] and len(gpis) == 0
+
     def test_references(self):
         refs = self.netcol.export_citations(out_file=None)
         assert len(refs.keys()) == 2
@@ -314,6 +341,13 @@ class SensorTest(unittest.TestCase):
         assert not self.sensor.eval(
             "soil_moisture", [0, 0.05], check_only_sensor_depth_from=False
         )
+        # time range is 2017-08-10 00:00 to 2018-08-09 08:00
+        assert self.sensor.eval("soil_moisture", period=("2018-01-01", None))
+        assert not self.sensor.eval(period=(None, "2017-08-09"))
+        assert self.sensor.eval(
+            period=("2017-09-01", "2018-08-01"), cover_period=True)
+        assert not self.sensor.eval(
+            period=("2017-09-01", "2018-08-09 12:00"), cover_period=True)
 
     def test_read_data(self):
         """Test reading the actual data"""
@@ -11,8 +11,13 @@ import shutil
 import pytest
 from tempfile import TemporaryDirectory
 
+import pickle
+import numpy as np
+import pandas as pd
+from tempfile import gettempdir
 from pathlib import Path
-from ismn.filecollection import IsmnFileCollection
+from ismn.filecollection import IsmnFileCollection, _read_station_dir
+from ismn.meta import Depth
 
 testdata_root = os.path.join(os.path.dirname(__file__), "test_data")
 
@@ -114,6 +119,181 @@ class Test_FileCollectionCeopSepUnzipped(unittest.TestCase):
             assert thisfile.metadata == otherfile.metadata
             "Meta dont match"
 
+    def test_from_metadata_df_lazy(self):
+        # metadata is only created from the frame when it is accessed
+        df = self.coll.to_metadata_df()
+        other = IsmnFileCollection.from_metadata_df(self.coll.root.path, df)
+
+        assert other.metadata_df is df
+        for thisfile, otherfile in zip(
+            self.coll.iter_filehandlers(), other.iter_filehandlers()
+        ):
+            assert otherfile._metadata is None
+            assert thisfile.file_type == otherfile.file_type
+            assert thisfile.metadata == otherfile.metadata
+            assert otherfile._metadata is not None
+            # setting the metadata replaces the loader
+            otherfile.metadata = None
+            assert otherfile.metadata is None
+
+    def test_build_with_process_pool(self):
+        # process pool must give the same metadata as the sequential run
+        other = IsmnFileCollection.build_from_scratch(
+            self.coll.root.path, parallel=True, backend="multiprocessing",
+            n_proc=2)
+        pd.testing.assert_frame_equal(self.coll.to_metadata_df(),
+                                      other.to_metadata_df())
+
+        # results for a station are sent between processes
+        stat_dir = list(self.coll.root.cont.values())[0][0]
+        res = _read_station_dir(str(self.coll.root.path), stat_dir,
+                                gettempdir(), None)
+        assert len(res[0]) > 0
+        assert len(pickle.loads(pickle.dumps(res))[0]) == len(res[0])
+
+    def test_build_incremental(self):
+        # unchanged station dirs are taken from the previous collection
+        previous = IsmnFileCollection.build_from_scratch(
+            self.coll.root.path, parallel=False)
+        assert len(previous.fingerprints) > 0
+
+        with TemporaryDirectory() as temp:
+            previous.to_fingerprints_csv(os.path.join(temp, "fp.csv"))
+            fingerprints = previous.fingerprints
+            previous.fingerprints = None
+            previous.load_fingerprints_csv(os.path.join(temp, "fp.csv"))
+            assert previous.fingerprints == fingerprints
+
+        files = list(previous.iter_filehandlers())
+        for f in files:
+            f.metadata["instrument"].val = "reused"
+
+        other = IsmnFileCollection.build_from_scratch(
+            self.coll.root.path, parallel=False, previous=previous)
+        assert all(f.metadata["instrument"].val == "reused"
+                   for f in other.iter_filehandlers())
+
+        # a changed file in a station dir, only this station is read again
+        changed = str(Path(files[0].file_path).as_posix())
+        previous.fingerprints[changed] = "changed"
+        other = IsmnFileCollection.build_from_scratch(
+            self.coll.root.path, parallel=False, previous=previous)
+
+        pd.testing.assert_index_equal(
+            other.to_metadata_df().columns, self.coll.to_metadata_df().columns)
+        for thisfile, otherfile in zip(
+            self.coll.iter_filehandlers(), other.iter_filehandlers()
+        ):
+            assert Path(thisfile.file_path) == Path(otherfile.file_path)
+            if Path(otherfile.file_path).parent == Path(changed).parent:
+                assert thisfile.metadata == otherfile.metadata
+            else:
+                assert otherfile.metadata["instrument"].val == "reused"
+
+    def test_get_filehandler(self):
+        # ids are positions in the flat index, networks have consecutive ids
+        files = list(self.coll.iter_filehandlers())
+        for i in [0, len(files) - 1]:
+            assert self.coll.get_filehandler(i) is files[i]
+        assert self.coll.get_filehandlers([1, 0]) == [files[1], files[0]]
+        assert self.coll.get_filehandlers([]) == []
+        assert self.coll.get_filehandler(len(files)) is None
+        assert self.coll.get_filehandler(-1) is None
+        with pytest.raises(TypeError):  # the flat index must stay valid
+            self.coll.filelist["COSMOS"] = []
+
+        start = 0
+        for net, net_files in self.coll.filelist.items():
+            ids = self.coll.network_ids(net)
+            assert ids == range(start, start + len(net_files))
+            assert tuple(self.coll.iter_filehandlers([net])) == net_files
+            start += len(net_files)
+        assert self.coll.network_ids("novar") == range(0)
+        assert list(self.coll.iter_filehandlers([])) == []
+
+    def test_filter_ids(self):
+        # evaluating the metadata frame must give the same ids as checking
+        # each filehandler
+        other = IsmnFileCollection.from_metadata_df(
+            self.coll.root.path, self.coll.to_metadata_df())
+        assert self.coll.metadata_df is None
+
+        for kwargs in [
+            dict(),
+            dict(variable="soil_moisture", allowed_depth=Depth(0, 0.1)),
+            dict(variable=["soil_moisture", "novar"],
+                 allowed_depth=Depth(0, 0.19)),
+            dict(allowed_depth=Depth(0.05, 0.05),
+                 check_only_sensor_depth_from=True),
+            dict(allowed_depth=Depth(-np.inf, np.inf),
+                 filter_meta_dict={"lc_2010": [130, 210],
+                                   "network": "COSMOS"}),
+            dict(filter_meta_dict={"station": "Barrow-ARM"},
+                 groupby="variable"),
+            dict(variable="soil_moisture", groupby="network"),
+            dict(bbox=(-100, 30, -90, 40)),
+            dict(variable="soil_moisture", bbox=(170, 60, -150, 80),
+                 polygon=[(-160, 70), (-150, 70), (-155, 75)]),
+            dict(variable="soil_moisture",
+                 period=("2018-08-09 12:00", "2019-01-01")),
+            dict(period=("2017-09-01", "2018-08-09"), cover_period=True,
+                 groupby="network"),
+        ]:
+            assert self.coll.filter_ids(**kwargs) == \
+                other.filter_ids(**kwargs)
+
+        assert other.filter_ids(filter_meta_dict={"novar": 1}) == []
+
+    def test_aggregate_metadata(self):
+        # same aggregation with and without the metadata frame
+        other = IsmnFileCollection.from_metadata_df(
+            self.coll.root.path, self.coll.to_metadata_df())
+
+        for coll in [self.coll, other]:
+            counts = coll.aggregate_metadata(by="network",
+                                             variable="soil_moisture")
+            grouped = coll.filter_ids(variable="soil_moisture",
+                                      groupby="network")
+            assert counts.to_dict() == {n: len(ids)
+                                        for n, ids in grouped.items()}
+            assert coll.aggregate_metadata() == \
+                len(list(coll.iter_filehandlers()))
+
+        pd.testing.assert_frame_equal(
+            self.coll.aggregate_metadata({"timerange_from": "min"},
+                                         by=["network", "station"]),
+            other.aggregate_metadata({"timerange_from": "min"},
+                                     by=["network", "station"]))
+
+        with pytest.raises(ValueError):
+            other.aggregate_metadata(by="network", groupby="network")
+
+    @pytest.mark.requires_parquet
+    def test_from_parquet(self):
+        # binary metadata format should get the same result as csv
+        with TemporaryDirectory() as temp:
+            self.coll.to_metadata_parquet(os.path.join(temp, "meta.parquet"))
+
+            other = IsmnFileCollection.from_metadata_parquet(
+                self.coll.root.path, os.path.join(temp, "meta.parquet")
+            )
+
+            assert other.metadata_df["timerange_from", "val"].dtype.kind == "M"
+
+            empty = IsmnFileCollection.from_metadata_parquet(
+                self.coll.root.path, os.path.join(temp, "meta.parquet"),
+                network=[]
+            )
+            assert len(list(empty.iter_filehandlers())) == 0
+
+        for thisfile, otherfile in zip(
+            self.coll.iter_filehandlers(), other.iter_filehandlers()
+        ):
+            assert Path(thisfile.file_path) == Path(otherfile.file_path)
+            assert thisfile.file_type == otherfile.file_type
+            assert thisfile.metadata == otherfile.metadata
+
+
 
 class Test_FileCollectionHeaderValuesUnzipped(Test_FileCollectionCeopSepUnzipped):
     # same tests as for ceop sep format,
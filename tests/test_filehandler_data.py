@@ -5,9 +5,14 @@ Module that tests filehandler classes for reading ismn data.
 """
 
 import os
+import shutil
 import unittest
+import zipfile
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
 
-from ismn.filehandlers import DataFile
+from ismn.filehandlers import DataFile, DataCache
 from ismn.meta import MetaData, Depth
 
 from pathlib import Path
@@ -102,6 +107,41 @@ class Test_DataFileCeopSepUnzipped(unittest.TestCase):
             == self.data_should_201708113[f"{self.variable}_orig_flag"]
         )
 
+    def test_data_cache(self):
+        """test keeping data in a cache after reading"""
+        cache = DataCache()
+        self.file.data_cache = cache
+
+        data = self.file.read_data()
+        assert cache.stats["misses"] == 1
+        data.iloc[0, 0] = -9999  # changing data must not affect the cache
+        data_cached = self.file.read_data()
+        assert cache.stats["hits"] == 1
+        assert data_cached.iloc[0, 0] != -9999
+        assert len(cache) == 1
+        assert cache.size_bytes > 0
+
+        self.file.data_cache = None
+        pd.testing.assert_frame_equal(data_cached, self.file.read_data())
+
+    def test_data_window(self):
+        """test reading only the data in a time window"""
+        data = self.file.read_data()
+        for start, end in [
+            (None, "2017-08-11 13:00"),
+            ("2017-08-11 13:00", None),
+            (datetime(2017, 9, 1, 0, 30), datetime(2017, 9, 3, 12)),
+        ]:
+            pd.testing.assert_frame_equal(
+                self.file.read_data(start=start, end=end),
+                data.loc[start:end])
+        # files outside the window are not read
+        assert not self.file.overlaps(start="2019-01-01")
+        empty = self.file.read_data(start="2019-01-01")
+        assert empty.empty
+        assert list(empty.columns) == list(data.columns)
+        assert empty.index.name == "date_time"
+
     def test_metadata_for_depth(self):
         """Check finding best matching metadata for file"""
         bestmeta = self.file.read_metadata(best_meta_for_sensor=True)
@@ -170,3 +210,137 @@ class Test_DataFileHeaderValuesZipped(Test_DataFileCeopSepUnzipped):
 # todo: test from zip, _load_data
 if __name__ == "__main__":
     unittest.main()
+
+
+def test_data_cache_lru():
+    # least recently used data is removed when the cache is full
+    df = pd.DataFrame({"a": range(100)})
+    size = df.memory_usage(index=True, deep=True).sum()
+    cache = DataCache(max_bytes=2 * size)
+    cache.put("first", df)
+    cache.put("second", df)
+    assert cache.get("first") is not None  # second is now least recently used
+    cache.put("third", df)
+    assert "second" not in cache
+    assert "first" in cache and "third" in cache
+    assert cache.get("second") is None
+    cache.put("large", pd.concat([df] * 3))  # larger than the cache
+    assert "large" not in cache
+
+    assert cache.stats == dict(hits=1, misses=1, evictions=1, n_items=2,
+                               size_bytes=2 * size, max_bytes=2 * size)
+    cache.clear()
+    assert len(cache) == 0 and cache.size_bytes == 0
+
+
+def test_metadata_from_header_and_last_line():
+    # only the start and end of the file are read, empty lines at the end
+    # must be skipped for files in dirs and in zip archives
+    root = testdata_path / "Data_seperate_files_header_20170810_20180809"
+    filepath = Path("COSMOS", "ARM-1",
+                    "COSMOS_COSMOS_ARM-1_sm_0.000000_0.190000_"
+                    "Cosmic-ray-Probe_20170810_20180809.stm")
+    should = DataFile(root, filepath).metadata
+
+    with TemporaryDirectory() as tempdir:
+        os.makedirs(Path(tempdir, "dir", filepath.parent))
+        shutil.copy(root / filepath, Path(tempdir, "dir", filepath))
+        with open(Path(tempdir, "dir", filepath), "ab") as f:
+            f.write(b"\r\n  \r\n\r\n")
+        with zipfile.ZipFile(Path(tempdir, "archive.zip"), "w",
+                             zipfile.ZIP_DEFLATED) as z:
+            z.write(Path(tempdir, "dir", filepath), filepath.as_posix())
+
+        for archive in [Path(tempdir, "dir"), Path(tempdir, "archive.zip")]:
+            file = DataFile(archive, filepath)
+            for var in ["timerange_from", "timerange_to", "latitude"]:
+                assert file.metadata[var].val == should[var].val
+            file.close()
+
+
+def test_parse_irregular_data():
+    # files that don't match the fixed layout are read with pandas
+    filepath = Path("NET", "STAT", "NET_NET_STAT_sm_0.050000_0.050000_"
+                                   "Probe_20000228_20000301.stm")
+    header = "NET NET STAT 43.15 2.95 112.00 0.05 0.05 Probe\r\n"
+    with TemporaryDirectory() as tempdir:
+        os.makedirs(Path(tempdir, filepath.parent))
+        for lines in [
+            ["2000/02/28 23:00 NaN D03,D05 M", "2000/02/29 00:30 0.1 G M"],
+            ["2000/02/29 23:00 0.2 G M", "2000/03/01 00:00 0.1 G"],
+        ]:
+            Path(tempdir, filepath).write_text(header + "\r\n".join(lines))
+            data = DataFile(tempdir, filepath).read_data()
+            assert data.index.dtype == "datetime64[ns]"
+            assert data.index[1] == pd.Timestamp(lines[1][:16])
+            assert data["soil_moisture"].dtype == "float64"
+            assert data["soil_moisture_flag"].iloc[0] == lines[0].split()[3]
+            compact = DataFile(tempdir, filepath,
+                               compact_dtypes=True).read_data()
+            assert compact["soil_moisture"].dtype == "float32"
+            assert compact["soil_moisture_orig_flag"].dtype == "category"
+        assert pd.isnull(data["soil_moisture_orig_flag"].iloc[1])
+
+
+def test_parse_missing_flags():
+    # missing flag tokens are NaN like in pandas, for the fixed layout
+    # parser and for files read with pandas
+    filepath = Path("NET", "STAT", "NET_NET_STAT_sm_0.050000_0.050000_"
+                                   "Probe_20000228_20000301.stm")
+    header = "NET NET STAT 43.15 2.95 112.00 0.05 0.05 Probe\r\n"
+    dtypes = []
+    with TemporaryDirectory() as tempdir:
+        os.makedirs(Path(tempdir, filepath.parent))
+        for lines in [
+            ["2000/02/28 23:00 0.2 G NA", "2000/02/29 00:30 0.1 NaN M"],
+            ["2000/02/28 23:00 0.2 G NA", "2000/02/29 00:30 0.1 NaN M",
+             "2000/03/01 00:00 0.1 G"],
+        ]:
+            Path(tempdir, filepath).write_text(header + "\r\n".join(lines))
+            data = DataFile(tempdir, filepath).read_data()
+            dtypes.append(data.dtypes)
+            assert data.index.dtype == "datetime64[ns]"
+            assert data["soil_moisture_flag"].iloc[0] == "G"
+            assert pd.isnull(data["soil_moisture_flag"].iloc[1])
+            assert pd.isnull(data["soil_moisture_orig_flag"].iloc[0])
+            compact = DataFile(tempdir, filepath,
+                               compact_dtypes=True).read_data()
+            assert pd.isnull(compact["soil_moisture_flag"].iloc[1])
+    pd.testing.assert_series_equal(dtypes[0], dtypes[1])
+
+
+def test_read_mapped_same_as_zip():
+    # files in dirs are parsed from a memory map, data must be the same as
+    # for the same file in a zip archive
+    filepath = Path("COSMOS", "Barrow-ARM",
+                    "COSMOS_COSMOS_Barrow-ARM_sm_0.000000_0.210000_"
+                    "Cosmic-ray-Probe_20170810_20180809.stm")
+    for name, archive in [
+        ("Data_seperate_files_20170810_20180809", "ceop"),
+        ("Data_seperate_files_header_20170810_20180809", "header"),
+    ]:
+        for compact in [False, True]:
+            mapped = DataFile(testdata_path / name, filepath,
+                              compact_dtypes=compact)
+            zipped = DataFile(testdata_path / "zip_archives" / archive /
+                              f"{name}.zip", filepath, compact_dtypes=compact)
+            for window in [{}, dict(start="2017-09-01", end="2017-09-03")]:
+                pd.testing.assert_frame_equal(mapped.read_data(**window),
+                                              zipped.read_data(**window))
+            zipped.close()
+
+
+def test_read_mapped_error(monkeypatch):
+    # errors while parsing a memory mapped file are not masked by closing
+    # the map
+    def read_buffer(self, content, names, ncols=5):
+        raise ValueError("parse error")
+
+    monkeypatch.setattr(DataFile, "_DataFile__read_buffer", read_buffer)
+    filepath = Path("COSMOS", "Barrow-ARM",
+                    "COSMOS_COSMOS_Barrow-ARM_sm_0.000000_0.210000_"
+                    "Cosmic-ray-Probe_20170810_20180809.stm")
+    f = DataFile(testdata_path / "Data_seperate_files_20170810_20180809",
+                 filepath)
+    with pytest.raises(ValueError, match="parse error"):
+        f.read_data()
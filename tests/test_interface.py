@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import unittest
 import os
+import warnings
 from tempfile import TemporaryDirectory
 from datetime import datetime
 
@@ -13,6 +14,7 @@ from collections import OrderedDict
 from tests.test_filecollection import cleanup
 from ismn.interface import ISMN_Interface
 from ismn.meta import Depth
+from ismn.custom import CustomMetaReader
 
 testdata_root = os.path.join(os.path.dirname(__file__), "test_data")
 
@@ -30,6 +32,174 @@ def test_metadata_dataframe():
     assert ds_one.metadata.loc[ids[0], 'network']['val'] == 'FR_Aqui'
     ds_one.close_files()
 
+@pytest.mark.requires_parquet
+def test_metadata_parquet():
+    # parquet metadata must contain the same information as csv metadata
+    testdata = os.path.join(testdata_root, "Data_seperate_files_20170810_20180809")
+    with TemporaryDirectory() as metadata_path:
+        ds_csv = ISMN_Interface(testdata, meta_path=metadata_path,
+                                network='COSMOS')
+        ds_pq = ISMN_Interface(testdata, meta_path=metadata_path,
+                               network='COSMOS', meta_format='parquet')
+        assert os.path.isfile(os.path.join(
+            metadata_path, "Data_seperate_files_20170810_20180809.parquet"))
+
+    pd.testing.assert_frame_equal(ds_csv.metadata, ds_pq.metadata,
+                                  check_dtype=False)
+    assert ds_pq.metadata['lc_2010', 'val'].dtype == np.int32
+    assert ds_csv.get_dataset_ids('soil_moisture') == \
+        ds_pq.get_dataset_ids('soil_moisture')
+    pd.testing.assert_frame_equal(ds_csv.read_ts(0), ds_pq.read_ts(0))
+
+    with pytest.raises(ValueError):
+        ISMN_Interface(testdata, meta_format='xlsx')
+
+def test_incremental_metadata_collection():
+    # repeated collection reuses the metadata of unchanged station dirs
+    testdata = os.path.join(testdata_root, "Data_seperate_files_header_20170810_20180809")
+    with TemporaryDirectory() as metadata_path:
+        ds = ISMN_Interface(testdata, meta_path=metadata_path)
+        assert os.path.isfile(os.path.join(
+            metadata_path,
+            "Data_seperate_files_header_20170810_20180809_fingerprints.csv"))
+        ds_again = ISMN_Interface(testdata, meta_path=metadata_path,
+                                  force_metadata_collection=True,
+                                  incremental=True)
+
+    pd.testing.assert_frame_equal(ds.metadata, ds_again.metadata)
+
+
+def test_force_metadata_collection_reads_all_files():
+    # without incremental, forced collection reads all files again
+    class ConstReader(CustomMetaReader):
+        def read_metadata(self, meta):
+            return {"const_var": 1}
+
+    testdata = os.path.join(testdata_root, "Data_seperate_files_header_20170810_20180809")
+    with TemporaryDirectory() as metadata_path:
+        ISMN_Interface(testdata, meta_path=metadata_path)
+        ds = ISMN_Interface(testdata, meta_path=metadata_path,
+                            custom_meta_reader=[ConstReader()],
+                            force_metadata_collection=True)
+        assert ("const_var", "val") in ds.metadata.columns
+
+        ds = ISMN_Interface(testdata, meta_path=metadata_path,
+                            force_metadata_collection=True, incremental=True)
+        assert ("const_var", "val") in ds.metadata.columns
+
+
+def test_compact_dtypes():
+    # compact data types must give the same data, but use less memory
+    testdata = os.path.join(testdata_root, "Data_seperate_files_header_20170810_20180809")
+    with TemporaryDirectory() as metadata_path:
+        ds = ISMN_Interface(testdata, meta_path=metadata_path)
+        ds_compact = ISMN_Interface(testdata, meta_path=metadata_path,
+                                    compact_dtypes=True, cache_size=10**8)
+
+    ids = ds.get_dataset_ids("soil_moisture", max_depth=1)
+    data = ds.read_ts(ids)
+    data_compact = ds_compact.read_ts(ids)
+    assert data_compact[ids[0], "soil_moisture"].dtype == np.float32
+    assert data_compact[ids[0], "soil_moisture_flag"].dtype == "category"
+    assert data_compact.memory_usage(deep=True).sum() < \
+        data.memory_usage(deep=True).sum() / 2
+    pd.testing.assert_frame_equal(
+        data_compact.astype(data.dtypes.to_dict()), data, atol=1e-6)
+    # compact data is also returned from the cache and by the sensors
+    pd.testing.assert_frame_equal(ds_compact.read_ts(ids), data_compact)
+    sensor = next(ds_compact.collection.iter_sensors())[2]
+    assert sensor.read_data()["soil_moisture"].dtype == np.float32
+
+
+@pytest.mark.parametrize("backend", ["threading", "multiprocessing"])
+def test_read_ts_parallel(backend):
+    # reading many ids in parallel gives the same result as sequential reading
+    testdata = os.path.join(testdata_root, "zip_archives", "header",
+                            "Data_seperate_files_header_20170810_20180809.zip")
+    with TemporaryDirectory() as metadata_path:
+        ds = ISMN_Interface(testdata, meta_path=metadata_path,
+                            cache_size=10**8)
+
+    ids = list(ds.metadata.index)[::-1]
+    data, meta = ds.read_ts(ids, return_meta=True)
+    data_par, meta_par = ds.read_ts(ids, return_meta=True, n_workers=2,
+                                    backend=backend)
+    pd.testing.assert_frame_equal(data_par, data)
+    pd.testing.assert_frame_equal(meta_par, meta)
+    assert list(data_par.columns.get_level_values("idx").unique()) == ids
+    data_window = ds.read_ts(ids, n_workers=2, backend=backend,
+                             start="2017-10-01", end="2017-11-01 12:00")
+    pd.testing.assert_frame_equal(
+        data_window, data.loc["2017-10-01":"2017-11-01 12:00"])
+    with pytest.raises(ValueError):
+        ds.read_ts(ids, n_workers=2, backend="unknown")
+    ds.close_files()
+
+
+def test_lazy_collection():
+    # lazy mode only creates the networks when they are accessed, but must
+    # give the same components and grid as the default mode
+    testdata = os.path.join(testdata_root, "Data_seperate_files_20170810_20180809")
+    with TemporaryDirectory() as metadata_path:
+        ds = ISMN_Interface(testdata, meta_path=metadata_path,
+                            network=['COSMOS'])
+        ds_lazy = ISMN_Interface(testdata, meta_path=metadata_path,
+                                 network=['COSMOS'], lazy=True)
+
+    assert list(ds_lazy.networks.keys()) == list(ds.networks.keys())
+    assert not ds_lazy.networks.is_loaded('COSMOS')
+    pd.testing.assert_frame_equal(ds_lazy.read_ts(0), ds.read_ts(0))
+    np.testing.assert_equal(ds_lazy.grid.arrlon, ds.grid.arrlon)
+    np.testing.assert_equal(ds_lazy.grid.arrlat, ds.grid.arrlat)
+    assert not ds_lazy.networks.is_loaded('COSMOS')
+
+    assert list(ds_lazy['COSMOS'].stations.keys()) == \
+        list(ds['COSMOS'].stations.keys())
+    assert ds_lazy.networks.is_loaded('COSMOS')
+    for (_, stat, sens), (_, stat_lazy, sens_lazy) in zip(
+            ds.collection.iter_sensors(), ds_lazy.collection.iter_sensors()):
+        assert stat.name == stat_lazy.name
+        assert sens.name == sens_lazy.name
+    station, _ = ds_lazy.collection.get_nearest_station(-97.5, 36.6)
+    assert station.name == 'ARM-1'
+
+    subset = ds_lazy.subset_from_ids([1])
+    assert subset.lazy
+    assert list(subset.networks.keys()) == ['COSMOS']
+    assert subset.grid.n_gpi == 1
+
+
+def test_data_cache():
+    # all sensors share one data cache
+    testdata = os.path.join(testdata_root, "Data_seperate_files_20170810_20180809")
+    with TemporaryDirectory() as metadata_path:
+        ds = ISMN_Interface(testdata, meta_path=metadata_path,
+                            network=['COSMOS'], cache_size=10 * 1024 ** 2)
+
+    data = ds.read_ts(0)
+    sensor_data = ds['COSMOS']['ARM-1'][0].read_data()
+    pd.testing.assert_frame_equal(data, sensor_data)
+    assert ds.data_cache.stats['hits'] == 1
+    assert ds.data_cache.stats['misses'] == 1
+    assert ds.data_cache.size_bytes <= 10 * 1024 ** 2
+
+    subset = ds.subset_from_ids([0])
+    subset.read_ts(0)
+    assert ds.data_cache.stats['hits'] == 2
+
+    with pytest.warns(DeprecationWarning):
+        ds = ISMN_Interface(testdata, network=['COSMOS'],
+                            keep_loaded_data=True)
+    assert ds.data_cache.max_bytes is None
+
+    # the subset shares the cache, it doesn't warn again
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        subset = ds.subset_from_ids([0])
+    assert subset.data_cache is ds.data_cache
+    assert subset.keep_loaded_data
+
+
 class Test_ISMN_Interface_CeopUnzipped(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -117,6 +287,43 @@ class Test_ISMN_Interface_CeopUnzipped(unittest.TestCase):
         ids = self.ds.get_dataset_ids("nonexisting")  # should get 0
         assert len(ids) == 0
 
+    def test_get_dataset_ids_spatial(self):
+        # ARM-1 (36.6N, 97.5W) and Barrow-ARM (71.3N, 156.6W)
+        ids = self.ds.get_dataset_ids(
+            "soil_moisture", max_depth=1, bbox=(-100, 30, -90, 40))
+        assert ids == [0]
+        ids = self.ds.get_dataset_ids(
+            "soil_moisture", max_depth=1, bbox=(170, 60, -150, 80))
+        assert ids == [1]
+        ids = self.ds.get_dataset_ids(
+            None, max_depth=1, polygon=[(-160, 70), (-150, 70), (-155, 75)],
+            groupby="station")
+        assert ids == {"Barrow-ARM": [1]}
+        ids = self.ds.get_dataset_ids(
+            "soil_moisture", max_depth=1, bbox=(-100, 30, -90, 40),
+            polygon=[(-160, 70), (-150, 70), (-155, 75)])
+        assert ids == []
+
+    def test_get_dataset_ids_period(self):
+        # ARM-1 until 2018-08-09 23:00, Barrow-ARM until 2018-08-09 08:00
+        ids = self.ds.get_dataset_ids(
+            "soil_moisture", max_depth=1, period=("2015-01-01", "2017-09-01"))
+        assert ids == [0, 1]
+        ids = self.ds.get_dataset_ids(
+            "soil_moisture", max_depth=1, period=("2018-08-09 12:00", None))
+        assert ids == [0]
+        ids = self.ds.get_dataset_ids(
+            "soil_moisture", max_depth=1, period=("2018-08-09 12:00", None),
+            cover_period=True)
+        assert ids == []
+        ids = self.ds.get_dataset_ids(
+            "soil_moisture", max_depth=1, period=("2018-01-01", "2018-08-09"),
+            cover_period=True, groupby="station")
+        assert ids == {"ARM-1": [0], "Barrow-ARM": [1]}
+        ids = self.ds.get_dataset_ids(None, max_depth=1,
+                                      period=(None, "2017-01-01"))
+        assert ids == []
+
     def test_read_multiple_ids(self):
         ts, meta = self.ds.read([0, 1], return_meta=True)
         assert not ts.empty
@@ -157,6 +364,18 @@ class Test_ISMN_Interface_CeopUnzipped(unittest.TestCase):
         assert station.lon == should_lon
         assert station.lat == should_lat
 
+    def test_stations_within(self):
+        lons, lats = [-156.62870, -156.6, 0], [71.32980, 71.3, 0]
+        offsets, ids, dist = self.ds.stations_within(lons, lats, 10000)
+        should = self.ds.get_dataset_ids(None, -np.inf, np.inf,
+                                         filter_meta_dict={"station": "Barrow-ARM"})
+        assert offsets.tolist() == [0, len(should), 2 * len(should), 2 * len(should)]
+        assert sorted(ids[:offsets[1]]) == sorted(should)
+        assert np.all(dist[:offsets[1]] == 0) and np.all(dist[offsets[1]:] > 0)
+        offsets, ids, dist = self.ds.stations_within(
+            lons, lats, 10000, variable="soil_moisture", depth=[0, 0.1])
+        assert len(ids) == 0 and offsets.tolist() == [0, 0, 0, 0]
+
     @pytest.mark.requires_plot
     def test_plot_station_locations(self):
         with TemporaryDirectory() as out_dir:
@@ -177,6 +396,27 @@ class Test_ISMN_Interface_CeopUnzipped(unittest.TestCase):
         assert tmin == datetime(2017, 8, 10, 0)
         assert tmax == datetime(2018, 8, 9, 23)
 
+    def test_aggregate_metadata(self):
+        counts = self.ds.aggregate_metadata(
+            by=["network", "climate_KG"], variable="soil_moisture")
+        assert counts.to_dict() == {("COSMOS", "Cfa"): 1, ("COSMOS", "ET"): 1}
+        assert self.ds.aggregate_metadata(
+            variable="soil_moisture", min_depth=0, max_depth=0.19) == 1
+
+        t = self.ds.aggregate_metadata(
+            {"timerange_from": "min", "timerange_to": "max",
+             "station": "nunique"}, by="network")
+        assert t.loc["COSMOS", "timerange_from"] == datetime(2017, 8, 10, 0)
+        assert t.loc["COSMOS", "timerange_to"] == datetime(2018, 8, 9, 23)
+        assert t.loc["COSMOS", "station"] == 2
+
+        with pytest.raises(ValueError):
+            self.ds.aggregate_metadata(by="novar")
+
+        # no matching sensors
+        assert self.ds.get_min_max_obs_timestamps("novar") == (None, None)
+        assert self.ds.get_static_var_vals("novar") == {}
+
     def test_get_static_var_val(self):
         vals = self.ds.get_static_var_vals("soil_moisture", max_depth=0.19)
         assert vals == {130: "Grassland"}
@@ -198,6 +438,7 @@ class Test_ISMN_Interface_CeopUnzipped(unittest.TestCase):
     def test_get_var(self):
         vars = self.ds.get_variables()
         assert vars == ["soil_moisture"]
+        assert vars.dtype.kind == "U"
 
     def test_get_sensors(self):
         i = 0
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 
-from ismn.meta import MetaVar, MetaData
+from ismn.meta import (MetaVar, MetaData, TimeRangeIndex, in_bbox,
+                       in_polygon, in_period)
 from ismn.components import Depth
 import pytest
 import unittest
 import numpy as np
+import pandas as pd
 
 # todo: test negative depth
 class Test_MetaVar(unittest.TestCase):
@@ -64,6 +66,30 @@ class Test_MetaData(unittest.TestCase):
             == self.dat[["first"]]
         )
 
+    def test_index_in_sync(self):
+        # lookups by name must reflect changes made with add / replace / merge
+        self.dat.add("dup", "4th", Depth(3, 4))
+        assert isinstance(self.dat["dup"], MetaData)
+        assert len(self.dat["dup"]) == 2
+        with pytest.raises(ValueError):
+            self.dat.replace("dup", "5th")
+
+        self.dat.replace("second", 2)
+        assert self.dat["second"].val == 2
+        assert self.dat.keys() == ["first", "neg", "dup", "dup", "second"]
+        assert MetaVar("second", 0) not in self.dat
+        assert MetaVar("second", 2) in self.dat
+
+        self.dat.merge(self.other, inplace=True)
+        assert isinstance(self.dat.metadata, list)
+        assert len(self.dat["dup"]) == 3
+        assert self.dat["4"].val == 4
+        assert self.dat["missing"] is None
+
+        self.dat.metadata = [MetaVar("new", 1)]
+        assert "first" not in self.dat
+        assert self.dat["new"].val == 1
+
     def test_best_meta(self):
         self.dat.merge(self.other, inplace=True)
 
@@ -126,5 +152,82 @@ class Test_MetaData(unittest.TestCase):
         assert best_meta_only_neg["neg"].depth.end == -1
 
 
+def test_in_bbox():
+    lons = np.array([10., 20., 179., -179., np.nan])
+    lats = np.array([45., 45., 0., 0., 45.])
+    np.testing.assert_array_equal(
+        in_bbox(lons, lats, (5, 40, 15, 50)),
+        [True, False, False, False, False])
+    # crossing the antimeridian
+    np.testing.assert_array_equal(
+        in_bbox(lons, lats, (170, -10, -170, 10)),
+        [False, False, True, True, False])
+
+
+def test_in_polygon():
+    # L-shaped polygon, the point at (15, 15) is in its bbox but not inside
+    polygon = [(0, 0), (20, 0), (20, 10), (10, 10), (10, 20), (0, 20)]
+    lons = np.array([5., 15., 15., 5., 25., np.nan])
+    lats = np.array([5., 5., 15., 15., 5., 5.])
+    np.testing.assert_array_equal(
+        in_polygon(lons, lats, polygon),
+        [True, True, False, True, False, False])
+    # closed polygon gives the same result
+    np.testing.assert_array_equal(
+        in_polygon(lons, lats, polygon + [(0, 0)]),
+        in_polygon(lons, lats, polygon))
+
+    with pytest.raises(ValueError):
+        in_polygon(lons, lats, [(0, 0), (1, 1)])
+
+
+def test_in_period():
+    starts = pd.to_datetime(["2010-01-01", "2016-01-01", "2019-06-01", None])
+    ends = pd.to_datetime(["2014-12-31", "2021-01-01", "2022-01-01",
+                           "2022-01-01"])
+    np.testing.assert_array_equal(
+        in_period(starts, ends, ("2015-01-01", "2020-12-31")),
+        [False, True, True, False])
+    np.testing.assert_array_equal(
+        in_period(starts, ends, ("2015-01-01", "2020-12-31"), cover=True),
+        [False, False, False, False])
+    np.testing.assert_array_equal(
+        in_period(starts, ends, ("2016-06-01", "2017-01-01"), cover=True),
+        [False, True, False, False])
+    # no range contains a period that is open on one side
+    np.testing.assert_array_equal(
+        in_period(starts, ends, (None, "2017-01-01"), cover=True),
+        [False, False, False, False])
+    np.testing.assert_array_equal(
+        in_period(starts, ends, ("2020-01-01", None), cover=True),
+        [False, False, False, False])
+    np.testing.assert_array_equal(
+        in_period(starts, ends, (None, None)), [True, True, True, False])
+
+
+def test_time_range_index():
+    # the index must find the same ranges as comparing all of them
+    rng = np.random.default_rng(0)
+    starts = pd.Timestamp("2000-01-01") + pd.to_timedelta(
+        rng.integers(0, 20 * 365, 5000), unit="D")
+    ends = starts + pd.to_timedelta(rng.integers(0, 5 * 365, 5000), unit="D")
+    starts = starts.values.copy()
+    starts[::100] = np.datetime64("NaT")
+    index = TimeRangeIndex(starts, ends, leaf_size=8)
+
+    for period in [("2005-01-01", "2006-01-01"), ("2010-03-04", "2010-03-04"),
+                   (None, "2001-01-01"), ("2022-01-01", None),
+                   (None, None), ("1990-01-01", "1991-01-01")]:
+        np.testing.assert_array_equal(
+            index.overlapping(*period),
+            np.flatnonzero(in_period(starts, ends, period)))
+        np.testing.assert_array_equal(
+            index.covering(*period),
+            np.flatnonzero(in_period(starts, ends, period, cover=True)))
+
+    assert len(index.covering(None, "2001-01-01")) == 0
+    assert len(TimeRangeIndex([], []).overlapping()) == 0
+
+
 if __name__ == "__main__":
     unittest.main()
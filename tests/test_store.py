@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Module that tests converting time series into a binary store and reading
+them from there.
+"""
+
+import os
+import json
+import warnings
+import pandas as pd
+import pytest
+from tempfile import TemporaryDirectory
+
+from ismn.interface import ISMN_Interface
+from ismn.filecollection import IsmnFileCollection
+from ismn.store import TimeSeriesStore
+
+testdata_root = os.path.join(os.path.dirname(__file__), "test_data")
+
+
+@pytest.mark.parametrize("compact_dtypes", [False, True])
+def test_store_read_ts(compact_dtypes):
+    # data from the store must be the same as data from the files
+    testdata = os.path.join(testdata_root, "zip_archives", "multinetwork",
+                            "header_values", "Data_header_values.zip")
+    with TemporaryDirectory() as tempdir:
+        meta_path = os.path.join(tempdir, "meta")
+        ds = ISMN_Interface(testdata, meta_path=meta_path,
+                            compact_dtypes=compact_dtypes)
+        ids = list(ds.metadata.index)
+        store = ds.create_ts_store(os.path.join(tempdir, "store"),
+                                   ids=ids[1:])
+        assert len(store) == len(ids) - 1
+        assert store.archive == ds.root.name
+
+        ds_store = ISMN_Interface(testdata, meta_path=meta_path,
+                                  compact_dtypes=compact_dtypes,
+                                  ts_store=os.path.join(tempdir, "store"))
+        for i in ids:
+            pd.testing.assert_frame_equal(ds_store.read_ts(i), ds.read_ts(i))
+            pd.testing.assert_frame_equal(
+                ds_store.read_ts(i, start="2010-01-01", end="2013-01-31"),
+                ds.read_ts(i, start="2010-01-01", end="2013-01-31"))
+            # no data in the window, but the same columns as for all data
+            empty = ds.read_ts(i, start="2030-01-01")
+            assert len(empty.index) == 0
+            pd.testing.assert_series_equal(empty.dtypes.astype(str),
+                                           ds.read_ts(i).dtypes.astype(str))
+            pd.testing.assert_frame_equal(
+                ds_store.read_ts(i, start="2030-01-01"), empty)
+        pd.testing.assert_frame_equal(ds_store.read_ts(ids[-2:]),
+                                      ds.read_ts(ids[-2:]))
+        assert list(ds_store.ts_store.positions(
+            [ds.read_metadata(ids[1], format="obj")["network"].val])) == [-1]
+
+        # ids of a network selection or subset are mapped via the file path
+        ds_net = ISMN_Interface(testdata, meta_path=meta_path,
+                                network=["SOILSCAPE"], ts_store=store,
+                                compact_dtypes=compact_dtypes)
+        subset = ds_store.subset_from_ids(ids[-2:])
+        assert subset.ts_store is ds_store.ts_store
+        pd.testing.assert_frame_equal(subset.read_ts(1), ds.read_ts(ids[-1]))
+        net_ids = ds.metadata.index[
+            ds.metadata["network"]["val"] == "SOILSCAPE"]
+        pd.testing.assert_frame_equal(ds_net.read_ts(0),
+                                      ds.read_ts(net_ids[0]))
+
+        ds_store.ts_store.close()
+        ds_net.ts_store.close()
+        store.close()
+
+        with pytest.raises(IOError):
+            TimeSeriesStore(meta_path)
+
+
+def test_store_validate():
+    # time series of changed files are read from the archive again
+    testdata = os.path.join(testdata_root, "zip_archives", "multinetwork",
+                            "header_values", "Data_header_values.zip")
+    with TemporaryDirectory() as tempdir:
+        meta_path = os.path.join(tempdir, "meta")
+        store_path = os.path.join(tempdir, "store")
+        ds = ISMN_Interface(testdata, meta_path=meta_path,
+                            compact_dtypes=True)
+        store = ds.create_ts_store(store_path)
+        assert None not in store.fingerprints
+        assert store.validate(ds.root) == []
+        fingerprints = store.fingerprints
+        store.close()
+
+        # fingerprints are taken from the archive, not from the collection
+        coll = IsmnFileCollection.from_metadata_csv(
+            ds.root, os.path.join(meta_path, "Data_header_values.csv"),
+            compact_dtypes=True)
+        coll.fingerprints = {p: "outdated" for p in fingerprints}
+        store = TimeSeriesStore.create(store_path, coll)
+        assert store.fingerprints == fingerprints
+        store.close()
+
+        manifest_file = os.path.join(store_path, "store.json")
+        with open(manifest_file, "r") as f:
+            manifest = json.load(f)
+        changed = manifest["file_paths"][0]
+        manifest["fingerprints"][0] = "0-00000000"
+        with open(manifest_file, "w") as f:
+            json.dump(manifest, f)
+
+        with pytest.warns(UserWarning, match="changed"):
+            ds_store = ISMN_Interface(testdata, meta_path=meta_path,
+                                      compact_dtypes=True,
+                                      ts_store=store_path)
+        assert changed not in ds_store.ts_store
+        assert list(ds_store.ts_store.positions([changed])) == [-1]
+        with warnings.catch_warnings():  # the archive is only checked once
+            warnings.simplefilter("error")
+            assert ds_store.ts_store.validate(ds.root) == [changed]
+        pd.testing.assert_frame_equal(ds_store.read_ts(0), ds.read_ts(0))
+
+        # float32 values in the store don't have the precision of the files
+        with pytest.warns(UserWarning, match="float32"):
+            ds_store.ts_store.read(1, compact_dtypes=False)
+        ds_store.ts_store.close()